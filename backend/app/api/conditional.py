@@ -0,0 +1,72 @@
+import hashlib
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import Request, Response, status
+
+from app.core.config import settings
+
+# Clients may keep responses but must check them with If-None-Match before
+# reuse; shared caches must not keep them at all
+PRIVATE_REVALIDATE = "private, no-cache"
+
+
+def strong_etag(*parts: Any) -> str:
+    """A strong entity tag for a representation identified by `parts`."""
+    digest = hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def transcription_etag(transcription: Dict[str, Any], media_type: str) -> str:
+    """
+    Entity tag of a transcription, as returned by GET /transcriptions/{id}
+    in `media_type`. Every update of the row moves updated_at, so the pair
+    identifies its content.
+    """
+    return strong_etag("transcription", media_type, transcription["id"], transcription["updated_at"])
+
+
+def listing_etag(query: str, rows: Iterable[Dict[str, Any]], media_type: str) -> str:
+    """
+    Entity tag of one page of GET /transcriptions in `media_type`: the query
+    that produced it and the id and updated_at of every row on it.
+    """
+    return strong_etag(
+        "transcriptions", media_type, query, *(f"{row['id']}@{row['updated_at']}" for row in rows)
+    )
+
+
+def if_none_match(request: Request) -> Optional[str]:
+    return request.headers.get("if-none-match")
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches `etag`. The comparison is weak,
+    as the header requires, so W/ prefixes are ignored.
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": PRIVATE_REVALIDATE}
+
+
+def not_modified(etag: str, validator: Optional[str] = None) -> Response:
+    """
+    304 Not Modified for a copy that If-None-Match `validator` matched. It
+    carries the headers of the 200 the client holds: CompressionMiddleware
+    sends a compressed 200 with a weak ETag and Vary: Accept-Encoding, but
+    leaves the empty 304 alone.
+    """
+    if validator and f"W/{etag}" in (candidate.strip() for candidate in validator.split(",")):
+        etag = f"W/{etag}"
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
+    # Responses to the same URL differ by Accept (JSON or MessagePack)
+    response.headers.add_vary_header("Accept")
+    if settings.COMPRESSION_ENABLED:
+        response.headers.add_vary_header("Accept-Encoding")
+    return response
@@ -0,0 +1,269 @@
+import math
+import time
+from typing import Callable, Optional
+
+import anyio
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.compression import compress, negotiate_encoding, stream_compressor
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.ratelimit import RateLimiter, get_rate_limiter
+from app.services.jobs import job_queue
+from app.services.user import token_claims_cache
+
+requests_rate_limited = metrics.counter(
+    "http_requests_rate_limited_total", "Requests refused with 429 by the per-client rate limits"
+)
+requests_shed_in_flight = metrics.counter(
+    "http_requests_shed_in_flight_total", "Requests refused with 503 because too many were in flight"
+)
+requests_shed_backlog = metrics.counter(
+    "http_requests_shed_backlog_total", "Transcription submissions refused with 503 because the job backlog was full"
+)
+response_bytes_uncompressed = metrics.counter(
+    "http_response_bytes_uncompressed_total", "Size of compressed response bodies before compression"
+)
+response_bytes_compressed = metrics.counter(
+    "http_response_bytes_compressed_total", "Size of compressed response bodies as sent"
+)
+
+# Media types worth compressing. Event streams are left alone so each event
+# goes out as soon as it is written.
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "application/x-subrip", "application/javascript")
+
+
+def route_group(path: str) -> Optional[str]:
+    """
+    The rate limit group of an API path: auth, transcriptions, files, or
+    api for the rest. Paths outside the API (health, metrics, docs) have none.
+    """
+    prefix = settings.API_V1_STR + "/"
+    if not path.startswith(prefix) or path.startswith(settings.API_V1_STR + "/docs") or path.endswith("/openapi.json"):
+        return None
+    group = path[len(prefix):].split("/", 1)[0]
+    return group if group in ("auth", "transcriptions", "files") else "api"
+
+
+def client_key(scope: Scope) -> str:
+    """
+    Who a request counts against: its user, once their access token has
+    been verified (and cached) by an earlier request, or else the client's
+    address. Unverified tokens are not trusted, so made-up ones cannot
+    spread a client over many buckets.
+    """
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                claims = token_claims_cache.peek(token)
+                if claims and claims.get("sub"):
+                    return f"user:{claims['sub']}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+def too_busy(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class RateLimitMiddleware:
+    """
+    Refuses API requests with 429 and Retry-After once a client has used up
+    its token bucket for the route group (see RATE_LIMIT_* settings).
+    """
+
+    def __init__(self, app: ASGIApp, limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        group = route_group(scope["path"]) if scope["type"] == "http" else None
+        if group is None or not settings.RATE_LIMIT_ENABLED or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiter or get_rate_limiter()
+        retry_after = await limiter.check(client_key(scope), group)
+        if retry_after > 0:
+            requests_rate_limited.inc()
+            response = too_busy(429, "Too many requests, retry later", retry_after)
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+class LoadSheddingMiddleware:
+    """
+    Refuses work with 503 and Retry-After instead of letting it queue up and
+    time out:
+    - any API request while LOAD_SHED_MAX_IN_FLIGHT requests in this process
+      are still waiting for their response to start
+    - new transcriptions while LOAD_SHED_MAX_BACKLOG jobs are queued
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.in_flight = 0
+        self._backlog = 0
+        self._backlog_checked_at = 0.0
+
+    async def backlog(self) -> int:
+        """Queued jobs, counted at most every LOAD_SHED_BACKLOG_CHECK_SECONDS."""
+        now = time.monotonic()
+        if now - self._backlog_checked_at >= settings.LOAD_SHED_BACKLOG_CHECK_SECONDS:
+            # Claim the check first so concurrent requests use the last count
+            self._backlog_checked_at = now
+            try:
+                self._backlog = await job_queue.backlog()
+            except Exception as e:
+                print(f"Could not count the job backlog: {e}")
+        return self._backlog
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        group = route_group(scope["path"]) if scope["type"] == "http" else None
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        max_in_flight = settings.LOAD_SHED_MAX_IN_FLIGHT
+        if max_in_flight is not None and self.in_flight >= max_in_flight:
+            requests_shed_in_flight.inc()
+            response = too_busy(503, "Server is busy, retry later", settings.LOAD_SHED_RETRY_AFTER_SECONDS)
+            await response(scope, receive, send)
+            return
+
+        max_backlog = settings.LOAD_SHED_MAX_BACKLOG
+        if max_backlog is not None and group == "transcriptions" and scope["method"] == "POST":
+            if await self.backlog() >= max_backlog:
+                requests_shed_backlog.inc()
+                response = too_busy(
+                    503, "Too many transcriptions are waiting, retry later",
+                    settings.LOAD_SHED_BACKLOG_RETRY_AFTER_SECONDS,
+                )
+                await response(scope, receive, send)
+                return
+
+        # A request stops counting once its response starts, so long-lived
+        # streams (progress events, downloads) do not hold a slot
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self.in_flight -= 1
+
+        async def send_and_release(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                release()
+            await send(message)
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send_and_release)
+        finally:
+            release()
+
+
+def _compressible(status_code: int, headers: Headers) -> bool:
+    if status_code < 200 or status_code in (204, 304) or "content-encoding" in headers:
+        return False
+    media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type == "text/event-stream":
+        return False
+    return media_type.startswith("text/") or media_type.endswith("+json") or media_type in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the best encoding the client accepts (see
+    negotiate_encoding). A response sent in one piece is compressed only
+    from COMPRESSION_MIN_BYTES; streamed responses (exports) are compressed
+    as they are sent.
+
+    A compressed response is a different representation from the
+    uncompressed one, so a strong ETag on it is made weak. If-None-Match
+    compares weakly, so revalidation works the same either way.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = None
+        if scope["type"] == "http" and settings.COMPRESSION_ENABLED:
+            encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        passthrough = False
+        compress_part: Optional[Callable[[bytes], bytes]] = None
+        finish: Optional[Callable[[], bytes]] = None
+
+        def encode_headers(message: Message) -> MutableHeaders:
+            headers = MutableHeaders(scope=message)
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = f"W/{etag}"
+            return headers
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, passthrough, compress_part, finish
+            if message["type"] == "http.response.start":
+                # Hold the headers until the first part of the body shows whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                first, start = start, None
+                if not _compressible(first["status"], Headers(raw=first["headers"])) or (
+                    not more_body and len(body) < settings.COMPRESSION_MIN_BYTES
+                ):
+                    passthrough = True
+                    await send(first)
+                    await send(message)
+                    return
+
+                headers = encode_headers(first)
+                if not more_body:
+                    if len(body) >= settings.COMPRESSION_THREAD_MIN_BYTES:
+                        compressed = await anyio.to_thread.run_sync(compress, encoding, body)
+                    else:
+                        compressed = compress(encoding, body)
+                    response_bytes_uncompressed.inc(len(body))
+                    response_bytes_compressed.inc(len(compressed))
+                    headers["Content-Length"] = str(len(compressed))
+                    await send(first)
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+
+                # Streamed: the compressed length is not known up front
+                del headers["Content-Length"]
+                compress_part, finish = stream_compressor(encoding)
+                await send(first)
+
+            chunk = compress_part(body)
+            if not more_body:
+                chunk += finish()
+            response_bytes_uncompressed.inc(len(body))
+            response_bytes_compressed.inc(len(chunk))
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,75 @@
+from typing import Any, Dict, Optional
+
+import msgpack
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Names clients use for MessagePack
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+
+def _default(value: Any) -> Any:
+    """Values orjson and msgpack cannot encode themselves, such as pydantic models."""
+    return jsonable_encoder(value)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON encoded with orjson, several times faster than the json module."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class MsgPackResponse(Response):
+    """MessagePack, for clients that ask for it in Accept."""
+
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_default, use_bin_type=True)
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """
+    MessagePack if the Accept header rates it at least as high as JSON,
+    and JSON otherwise. Wildcards only ever select JSON, so browsers keep
+    getting JSON.
+    """
+    if not accept:
+        return JSON_MEDIA_TYPE
+    msgpack_quality = json_quality = 0.0
+    for item in accept.split(","):
+        media_type, *params = item.split(";")
+        media_type = media_type.strip().lower()
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type in MSGPACK_MEDIA_TYPES:
+            msgpack_quality = max(msgpack_quality, quality)
+        elif media_type in (JSON_MEDIA_TYPE, "application/*", "*/*"):
+            json_quality = max(json_quality, quality)
+    if msgpack_quality > 0 and msgpack_quality >= json_quality:
+        return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def negotiated_response(
+    media_type: str, content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Render `content` as `media_type` (from negotiate_media_type). Returning
+    the response directly also skips FastAPI's jsonable_encoder pass, which
+    costs more than the encoding itself for long segment lists.
+    """
+    response_class = MsgPackResponse if media_type == MSGPACK_MEDIA_TYPE else FastJSONResponse
+    response = response_class(content, status_code=status_code, headers=headers)
+    response.headers.add_vary_header("Accept")
+    return response
@@ -7,12 +7,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
 from app.core.config import settings
-from app.core.supabase import get_supabase_client
+from app.core.supabase import get_supabase_client, run_blocking
 from app.db.session import get_db_session
 from app.schemas.token import Token
 from app.schemas.user import UserCreate, UserResponse
 from app.services.user import authenticate_supabase_user, get_supabase_user_by_email
-from app.core.supabase import ensure_user_profile
+from app.core.supabase import ensure_user_profile, save_user_profile
 
 router = APIRouter()
 
@@ -73,7 +73,7 @@ async def register_new_user(
             }
         
         # Create new user in Supabase Auth
-        auth_response = supabase.auth.admin.create_user({
+        auth_response = await run_blocking(supabase.auth.admin.create_user, {
             "email": user_in.email,
             "password": user_in.password,
             "email_confirm": True  # Auto-confirm email for now
@@ -89,11 +89,11 @@ async def register_new_user(
         
         # Create user profile with default values
         # Use upsert to prevent duplicate key errors
-        profile_response = supabase.table("user_profiles").upsert({
+        await save_user_profile({
             "id": user_id,
             "quota_minutes": settings.DEFAULT_FREE_MINUTES,
             "is_admin": False
-        }).execute()
+        })
         
         # Return user data
         return {
@@ -1,20 +1,258 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.ext.asyncio import AsyncSession
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Optional
 
-from app.db.session import get_db_session
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status, UploadFile, File
+
+from app.core.config import settings
+from app.core.storage import StorageError, get_object_info, get_upload_offset
+from app.schemas.file import SignedUploadResponse, UploadSessionCreate, UploadSessionResponse
+from app.services.file import file_repository
+from app.services.uploads import hash_chunks, upload_session_repository, write_upload_chunks
 from app.services.user import get_current_user
 from app.models.user import User
 
 router = APIRouter()
 
+
+def _storage_exception(e: StorageError) -> HTTPException:
+    if e.status_code in (404, 410):
+        return HTTPException(status_code=status.HTTP_410_GONE, detail="Upload not found or expired")
+    return HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Storage error: {str(e)}")
+
+
+def _session_response(session: Dict[str, Any], offset: int) -> Dict[str, Any]:
+    return {
+        "id": session["id"],
+        "filename": session["original_filename"],
+        "size": session["size"],
+        "offset": offset,
+        "chunk_size": settings.STORAGE_UPLOAD_CHUNK_SIZE,
+        "status": session["status"],
+        "expires_at": session["expires_at"],
+    }
+
+
+async def _get_upload_session(upload_id: str, user_id: str, upload_method: str = "resumable") -> Dict[str, Any]:
+    session = await upload_session_repository.get_session(upload_id, user_id)
+    if not session or session["upload_method"] != upload_method:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+    expires_at = datetime.fromisoformat(session["expires_at"])
+    if session["status"] != "completed" and expires_at < datetime.now(timezone.utc):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Upload expired"
+        )
+    return session
+
+
 @router.post("/")
 async def upload_file(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db_session),
 ):
     """
-    Upload a file for transcription.
+    Upload a whole file for transcription in a single request.
+
+    Large files should use the resumable /uploads endpoints instead.
+    """
+    file.file.seek(0, 2)
+    size = file.file.tell()
+    await file.seek(0)
+    if size == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File is empty"
+        )
+
+    async def chunks() -> AsyncIterator[bytes]:
+        while data := await file.read(settings.MEDIA_CHUNK_SIZE):
+            yield data
+
+    try:
+        session = await upload_session_repository.create_session(
+            current_user["id"], file.filename, size, file.content_type
+        )
+        # Hash the file on its way through, for duplicate detection
+        digest = hashlib.sha256()
+        await write_upload_chunks(session["upload_url"], 0, hash_chunks(chunks(), digest))
+        return await upload_session_repository.complete_session(session, content_sha256=digest.hexdigest())
+    except StorageError as e:
+        raise _storage_exception(e)
+
+
+@router.post("/uploads", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+async def create_upload(
+    upload_in: UploadSessionCreate,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Start a resumable upload. Send the file with PATCH requests to
+    /uploads/{id}, then call /uploads/{id}/complete.
+    """
+    try:
+        session = await upload_session_repository.create_session(
+            current_user["id"], upload_in.filename, upload_in.size, upload_in.content_type
+        )
+    except StorageError as e:
+        raise _storage_exception(e)
+    return _session_response(session, offset=0)
+
+
+@router.api_route("/uploads/{upload_id}", methods=["GET", "HEAD"], response_model=UploadSessionResponse)
+async def get_upload(
+    upload_id: str,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Get the current offset of an upload, to resume it after a failure.
     """
-    # Placeholder implementation - in a real implementation we would save the file
-    return {"filename": file.filename, "status": "uploaded", "message": "File upload endpoint placeholder"}
+    session = await _get_upload_session(upload_id, current_user["id"])
+    if session["status"] == "completed":
+        offset = session["size"]
+    else:
+        try:
+            offset = await get_upload_offset(session["upload_url"])
+        except StorageError as e:
+            raise _storage_exception(e)
+
+    response.headers["Upload-Offset"] = str(offset)
+    response.headers["Upload-Length"] = str(session["size"])
+    return _session_response(session, offset)
+
+
+@router.patch("/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(...),
+    content_length: Optional[int] = Header(None),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Append a chunk at `Upload-Offset`. The body is streamed to storage as
+    it arrives rather than being buffered whole.
+    """
+    session = await _get_upload_session(upload_id, current_user["id"])
+    if session["status"] == "completed":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Upload already completed"
+        )
+    if content_length is None:
+        raise HTTPException(
+            status_code=status.HTTP_411_LENGTH_REQUIRED,
+            detail="Content-Length is required"
+        )
+
+    end = upload_offset + content_length
+    if end > session["size"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Chunk extends past the end of the file"
+        )
+    if content_length % settings.STORAGE_UPLOAD_CHUNK_SIZE and end != session["size"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Chunks must be a multiple of {settings.STORAGE_UPLOAD_CHUNK_SIZE} bytes, except the last"
+        )
+
+    try:
+        offset = await get_upload_offset(session["upload_url"])
+        if offset != upload_offset:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Upload-Offset does not match the current offset ({offset})",
+                headers={"Upload-Offset": str(offset)},
+            )
+        offset = await write_upload_chunks(session["upload_url"], offset, request.stream())
+    except StorageError as e:
+        raise _storage_exception(e)
+
+    response.headers["Upload-Offset"] = str(offset)
+    return _session_response(session, offset)
+
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Finish an upload once every byte has been received and create its file record.
+    """
+    session = await _get_upload_session(upload_id, current_user["id"])
+    if session["status"] == "completed":
+        return await file_repository.get_file(session["file_id"], user_id=current_user["id"])
+
+    try:
+        offset = await get_upload_offset(session["upload_url"])
+    except StorageError as e:
+        raise _storage_exception(e)
+    if offset != session["size"]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload is incomplete ({offset} of {session['size']} bytes received)",
+            headers={"Upload-Offset": str(offset)},
+        )
+
+    try:
+        return await upload_session_repository.complete_session(session)
+    except StorageError as e:
+        raise _storage_exception(e)
+
+
+@router.post("/signed-uploads", response_model=SignedUploadResponse, status_code=status.HTTP_201_CREATED)
+async def create_signed_upload(
+    upload_in: UploadSessionCreate,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Get a pre-signed URL to PUT a file straight to storage, bypassing the
+    API. Call /signed-uploads/{id}/complete once the upload has finished.
+    """
+    try:
+        session = await upload_session_repository.create_session(
+            current_user["id"], upload_in.filename, upload_in.size, upload_in.content_type, signed=True
+        )
+    except StorageError as e:
+        raise _storage_exception(e)
+    return {
+        "id": session["id"],
+        "upload_url": session["upload_url"],
+        "storage_path": session["storage_path"],
+        "expires_at": session["expires_at"],
+    }
+
+
+@router.post("/signed-uploads/{upload_id}/complete")
+async def complete_signed_upload(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Verify that a signed upload reached storage and create its file record.
+    """
+    session = await _get_upload_session(upload_id, current_user["id"], upload_method="signed")
+    if session["status"] == "completed":
+        return await file_repository.get_file(session["file_id"], user_id=current_user["id"])
+
+    try:
+        info = await get_object_info(session["storage_path"])
+    except StorageError as e:
+        raise _storage_exception(e)
+    if not info:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="File has not been uploaded yet"
+        )
+
+    try:
+        return await upload_session_repository.complete_session(session, size=info["size"])
+    except StorageError as e:
+        raise _storage_exception(e)
@@ -1,69 +1,231 @@
-import os
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+import asyncio
+import uuid
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional, Dict, Any
-import httpx
-import tempfile
-import json
+from typing import AsyncIterator, List, Optional, Dict, Any
 
+from app.api.conditional import (
+    cache_headers,
+    etag_matches,
+    if_none_match,
+    listing_etag,
+    not_modified,
+    transcription_etag,
+)
+from app.api.responses import FastJSONResponse, negotiate_media_type, negotiated_response
+from app.core.config import settings
+from app.core.events import progress_broker
 from app.db.session import get_db_session
 from app.services.user import get_current_user
+from app.services.file import file_repository
+from app.services.export import EXPORT_FORMATS, content_disposition, export_cache, stream_export
+from app.services.jobs import job_queue, user_weight
+from app.services.quota import QuotaExceededError, check_quota, files_within_quota
+from app.services.search import search_transcriptions
+from app.services.segments import segment_repository
+from app.schemas.transcription import (
+    TranscriptPatch,
+    TranscriptPatchResult,
+    TranscriptionBatchCreate,
+    TranscriptionBatchItem,
+    TranscriptionStatus,
+)
+from app.services.transcription import (
+    VersionConflictError,
+    find_cached_result,
+    find_cached_results,
+    transcription_repository,
+)
 from app.models.user import User
-from app.core.supabase import get_supabase_client
 
-router = APIRouter()
+# Transcript payloads are large, so JSON is encoded with orjson
+router = APIRouter(default_response_class=FastJSONResponse)
+
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
+
+
+# Statuses after which a transcription's progress stream ends
+FINAL_STATUSES = ("completed", "failed")
 
-# Configuration for external transcription API
-TRANSCRIPTION_API_KEY = os.environ.get("TRANSCRIPTION_API_KEY", "")
-TRANSCRIPTION_API_URL = os.environ.get("TRANSCRIPTION_API_URL", "")
+
+async def _progress_events(
+    request: Request, transcription: Dict[str, Any], queue: asyncio.Queue, user_id: str
+) -> AsyncIterator[str]:
+    """
+    Server-sent events for one transcription: its current state, then each
+    change until it completes or fails. Changes are pushed by the progress
+    broker; while the broker is not relaying other processes' events, the
+    row is polled instead.
+    """
+    transcription_id = transcription["id"]
+    last = None
+    event: Optional[Dict[str, Any]] = transcription
+    try:
+        while True:
+            if event is not None:
+                state = TranscriptionStatus(
+                    id=transcription_id, status=event["status"], progress=event.get("progress")
+                )
+                if (state.status, state.progress) != last:
+                    last = (state.status, state.progress)
+                    yield f"event: status\ndata: {state.json()}\n\n"
+                if state.status in FINAL_STATUSES:
+                    return
+
+            if await request.is_disconnected():
+                return
+            connected = progress_broker.fanout_connected
+            timeout = settings.PROGRESS_KEEPALIVE_SECONDS if connected else settings.PROGRESS_POLL_SECONDS
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                if connected:
+                    event = None
+                    yield ": keepalive\n\n"
+                else:
+                    event = await transcription_repository.get_summary(transcription_id, user_id)
+                    if event is None:
+                        return
+    finally:
+        progress_broker.unsubscribe(transcription_id, queue)
 
 @router.get("/")
 async def get_transcriptions(
+    request: Request,
+    limit: int = Query(settings.TRANSCRIPTION_PAGE_SIZE, ge=1, le=settings.TRANSCRIPTION_PAGE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
     current_user: User = Depends(get_current_user),
 ):
     """
-    Get all transcriptions for the current user.
+    Get the current user's transcriptions, newest first, one page at a time.
+
+    Pass the returned `next_cursor` as `cursor` to get the following page.
+    `fields` is a comma-separated list of fields to return; by default the
+    transcript text is left out. Segments are read through
+    /transcriptions/{id}/segments.
+
+    Pages carry an ETag; send it back in If-None-Match to get 304 Not
+    Modified while no transcription on the page has changed. Send
+    `Accept: application/msgpack` to get MessagePack instead of JSON.
     """
     try:
-        # Use Supabase client to get transcriptions for the current user
-        supabase = get_supabase_client()
-        response = supabase.table("transcriptions") \
-            .select("*, files(original_filename, duration_seconds)") \
-            .eq("user_id", current_user.id) \
-            .execute()
-            
-        return {"transcriptions": response.data}
+        media_type = negotiate_media_type(request.headers.get("accept"))
+        page = dict(
+            limit=limit,
+            cursor=cursor,
+            status=status_filter,
+            created_after=created_after,
+            created_before=created_before,
+        )
+        
+        # Check a cached page against ids and timestamps alone
+        validator = if_none_match(request)
+        if validator:
+            stamps, _ = await transcription_repository.list_transcriptions(
+                current_user["id"], fields=["updated_at"], **page
+            )
+            etag = listing_etag(request.url.query, stamps, media_type)
+            if etag_matches(validator, etag):
+                return not_modified(etag, validator)
+        
+        transcriptions, next_cursor = await transcription_repository.list_transcriptions(
+            current_user["id"],
+            fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+            **page,
+        )
+        
+        return negotiated_response(
+            media_type,
+            {"transcriptions": transcriptions, "next_cursor": next_cursor},
+            headers=cache_headers(listing_etag(request.url.query, transcriptions, media_type)),
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error retrieving transcriptions: {str(e)}"
         )
 
+@router.get("/search")
+async def search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(settings.SEARCH_PAGE_SIZE, ge=1, le=settings.SEARCH_PAGE_MAX),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Search the current user's transcripts, best match first.
+
+    `q` takes web-search syntax ("quoted phrases", -excluded, or). Each
+    result has a highlighted `snippet` and the `matches` segments to seek
+    to. Pass the returned `next_offset` as `offset` for the next page.
+    """
+    try:
+        results, next_offset = await search_transcriptions(current_user["id"], q, limit=limit, offset=offset)
+        
+        return negotiated_response(
+            negotiate_media_type(request.headers.get("accept")),
+            {"results": results, "next_offset": next_offset},
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error searching transcriptions: {str(e)}"
+        )
+
 @router.get("/{transcription_id}")
 async def get_transcription(
     transcription_id: str,
+    request: Request,
     current_user: User = Depends(get_current_user),
 ):
     """
     Get a specific transcription by ID.
+
+    The response carries an ETag; send it back in If-None-Match to get 304
+    Not Modified, without the text and segments, while it is unchanged.
+    Send `Accept: application/msgpack` to get MessagePack instead of JSON.
     """
     try:
-        # Use Supabase client to get a specific transcription
-        supabase = get_supabase_client()
-        response = supabase.table("transcriptions") \
-            .select("*, files(original_filename, duration_seconds)") \
-            .eq("id", transcription_id) \
-            .eq("user_id", current_user.id) \
-            .single() \
-            .execute()
+        media_type = negotiate_media_type(request.headers.get("accept"))
+        
+        # Check a cached copy against updated_at alone
+        validator = if_none_match(request)
+        if validator:
+            stamp = await transcription_repository.get_updated_at(transcription_id, current_user["id"])
+            if stamp is not None and etag_matches(validator, transcription_etag(stamp, media_type)):
+                return not_modified(transcription_etag(stamp, media_type), validator)
+        
+        transcription = await transcription_repository.get_transcription(transcription_id, current_user["id"])
             
-        if not response.data:
+        if not transcription:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Transcription not found"
             )
-            
-        return response.data
+        
+        return negotiated_response(
+            media_type, transcription, headers=cache_headers(transcription_etag(transcription, media_type))
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         if "not found" in str(e).lower():
             raise HTTPException(
@@ -75,213 +237,355 @@ async def get_transcription(
             detail=f"Error retrieving transcription: {str(e)}"
         )
 
+@router.get("/{transcription_id}/segments")
+async def get_transcription_segments(
+    transcription_id: str,
+    request: Request,
+    start: Optional[float] = Query(None, ge=0),
+    end: Optional[float] = Query(None, ge=0),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Get the segments of a transcription that overlap the time window
+    [start, end), in seconds. Either bound can be left out.
+    """
+    if start is not None and end is not None and end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must not be before start"
+        )
+    try:
+        segments = await transcription_repository.get_segments(
+            transcription_id, current_user["id"], start=start, end=end
+        )
+        
+        if segments is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Transcription not found"
+            )
+        
+        return negotiated_response(
+            negotiate_media_type(request.headers.get("accept")),
+            {"transcription_id": transcription_id, "start": start, "end": end, "segments": segments},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving segments: {str(e)}"
+        )
+
+@router.get("/{transcription_id}/events")
+async def stream_transcription_events(
+    transcription_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Stream a transcription's status and progress as server-sent events,
+    instead of polling GET /transcriptions/{id}. Each `status` event carries
+    a TranscriptionStatus; the stream ends once the transcription completes
+    or fails.
+    """
+    # Subscribe before reading the current state, so no change is missed
+    queue = progress_broker.subscribe(transcription_id)
+    try:
+        transcription = await transcription_repository.get_summary(transcription_id, current_user["id"])
+    except Exception as e:
+        progress_broker.unsubscribe(transcription_id, queue)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving transcription: {str(e)}"
+        )
+    if not transcription:
+        progress_broker.unsubscribe(transcription_id, queue)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Transcription not found"
+        )
+    
+    return StreamingResponse(
+        _progress_events(request, transcription, queue, current_user["id"]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/{transcription_id}/export")
+async def export_transcription(
+    transcription_id: str,
+    format: str = Query("txt", regex="^(srt|vtt|txt|json)$"),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Download a transcription as SRT or WebVTT subtitles, plain text, or
+    JSON segments. The export is streamed as it is rendered.
+    """
+    try:
+        transcription = await transcription_repository.get_summary(transcription_id, current_user["id"])
+        
+        if not transcription:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Transcription not found"
+            )
+        if transcription["status"] != "completed":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Transcription has not completed yet"
+            )
+        
+        _, media_type, extension = EXPORT_FORMATS[format]
+        original_filename = (transcription.get("files") or {}).get("original_filename") or "transcript"
+        headers = {"Content-Disposition": content_disposition(original_filename, extension)}
+        # Starlette adds the charset to text/* types itself
+        if not media_type.startswith("text/"):
+            media_type = f"{media_type}; charset=utf-8"
+        
+        # Edits change updated_at, so cached exports are never stale
+        cache_key = (transcription_id, transcription["updated_at"], format)
+        cached = export_cache.get(cache_key)
+        if cached is not None:
+            return Response(content=cached, media_type=media_type, headers=headers)
+        
+        packed = await segment_repository.get(transcription_id, version=transcription["version"])
+        if packed is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Transcription has no segments"
+            )
+        return StreamingResponse(stream_export(cache_key, packed), media_type=media_type, headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error exporting transcription: {str(e)}"
+        )
+
 @router.post("/")
 async def create_transcription(
-    background_tasks: BackgroundTasks,
     file_id: str,
+    force: bool = False,
     current_user: User = Depends(get_current_user),
 ):
     """
     Create a new transcription job for a file.
+
+    If identical media was already transcribed with the current settings,
+    that result is reused and no job is queued. Pass `force=true` to
+    transcribe the file again regardless.
     """
     try:
-        supabase = get_supabase_client()
-        
         # First, check if the file exists and belongs to this user
-        file_response = supabase.table("files") \
-            .select("*") \
-            .eq("id", file_id) \
-            .eq("user_id", current_user.id) \
-            .single() \
-            .execute()
+        file = await file_repository.get_file(file_id, user_id=current_user["id"])
         
-        if not file_response.data:
+        if not file:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="File not found or doesn't belong to the current user"
             )
         
+        # Refuse media that would go over the user's quota before queueing it
+        await check_quota(current_user, [file])
+        
+        # Reuse an earlier transcription of the same media when possible
+        cached = None if force else await find_cached_result(file)
+        if cached is not None:
+            transcription = await transcription_repository.create_transcription(
+                file_id, current_user["id"], result=cached
+            )
+            return {
+                "message": "Transcription reused from an identical earlier upload",
+                "transcription": transcription
+            }
+        
         # Create a new transcription entry
-        transcription_response = supabase.table("transcriptions") \
-            .insert({
-                "file_id": file_id,
-                "user_id": current_user.id,
-                "status": "pending"
-            }) \
-            .select() \
-            .single() \
-            .execute()
+        transcription = await transcription_repository.create_transcription(file_id, current_user["id"])
         
-        # Start the transcription process in the background
-        transcription_id = transcription_response.data["id"]
-        background_tasks.add_task(
-            process_transcription, 
-            transcription_id=transcription_id,
+        # Queue the job for the transcription workers
+        await job_queue.enqueue(
+            transcription_id=transcription["id"],
             file_id=file_id,
-            user_id=current_user.id
+            user_id=current_user["id"],
+            weight=user_weight(current_user),
+            duration_seconds=file.get("duration_seconds"),
+            reuse_result=not force,
         )
         
         return {
-            "message": "Transcription job created and processing started", 
-            "transcription": transcription_response.data
+            "message": "Transcription job created and queued for processing", 
+            "transcription": transcription
         }
+    except HTTPException:
+        raise
+    except QuotaExceededError as e:
+        raise HTTPException(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error creating transcription: {str(e)}"
         )
 
-@router.put("/{transcription_id}/text")
-async def update_transcription_text(
+@router.patch("/{transcription_id}/segments", response_model=TranscriptPatchResult)
+async def patch_transcription_segments(
     transcription_id: str,
-    transcript_text: str,
+    patch: TranscriptPatch,
     current_user: User = Depends(get_current_user),
 ):
     """
-    Update the text of a transcription.
+    Apply a batch of segment edits to a transcription.
+
+    `version` must be the version the edits were made against; if the
+    transcript has changed since, nothing is saved and 409 is returned with
+    the current version. The transcript text is rebuilt from the segments.
     """
     try:
-        supabase = get_supabase_client()
-        
-        # Check if the transcription exists and belongs to this user
-        existing = supabase.table("transcriptions") \
-            .select("id") \
-            .eq("id", transcription_id) \
-            .eq("user_id", current_user.id) \
-            .single() \
-            .execute()
+        result = await transcription_repository.apply_edits(
+            transcription_id, current_user["id"], patch.version, patch.operations
+        )
         
-        if not existing.data:
+        if not result:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Transcription not found or doesn't belong to the current user"
             )
         
-        # Update the transcription text
-        response = supabase.table("transcriptions") \
-            .update({"text": transcript_text}) \
-            .eq("id", transcription_id) \
-            .select() \
-            .single() \
-            .execute()
-        
-        return response.data
+        return result
+    except HTTPException:
+        raise
+    except VersionConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": str(e), "current_version": e.current_version}
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
-        if "not found" in str(e).lower():
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Transcription not found"
-            )
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error updating transcription: {str(e)}"
         )
 
-async def process_transcription(transcription_id: str, file_id: str, user_id: str):
+@router.post("/batch")
+async def create_transcriptions_batch(
+    batch: TranscriptionBatchCreate,
+    current_user: User = Depends(get_current_user),
+):
     """
-    Background task to process a transcription.
+    Create transcription jobs for many files at once.
+
+    Ownership is checked, transcriptions are created and jobs are queued in
+    a few bulk queries, whatever the number of files. Each file gets an
+    item in `results`: `queued`, `reused` (an identical earlier upload was
+    already transcribed; pass `force` to transcribe again), `not_found`,
+    `over_quota` (too long for the quota left once earlier files in the
+    batch are counted), or `duplicate` (listed more than once; only the
+    first counts).
     """
-    supabase = get_supabase_client()
-    
     try:
-        # Update status to processing
-        supabase.table("transcriptions") \
-            .update({"status": "processing"}) \
-            .eq("id", transcription_id) \
-            .execute()
-        
-        # Get file path from storage
-        file_info = supabase.table("files") \
-            .select("storage_path") \
-            .eq("id", file_id) \
-            .single() \
-            .execute()
+        # IDs that are not UUIDs cannot match a file, and would fail the query
+        file_ids = [file_id for file_id in dict.fromkeys(batch.file_ids) if _is_uuid(file_id)]
+        files = await file_repository.get_files(
+            file_ids, current_user["id"], columns="id, size, content_sha256, duration_seconds"
+        )
+        owned = {file["id"]: file for file in files}
+        files = await files_within_quota(current_user, [owned[file_id] for file_id in file_ids if file_id in owned])
+        accepted = [file["id"] for file in files]
         
-        if not file_info.data:
-            raise Exception("File not found")
+        cached = {} if batch.force else await find_cached_results(files)
+        transcriptions = (
+            await transcription_repository.create_transcriptions(current_user["id"], accepted, cached)
+            if accepted else []
+        )
+        by_file = {transcription["file_id"]: transcription for transcription in transcriptions}
         
-        storage_path = file_info.data["storage_path"]
+        # Queue every transcription that was not served from the cache
+        weight = user_weight(current_user)
+        jobs = [
+            {
+                "transcription_id": transcription["id"],
+                "file_id": file_id,
+                "user_id": current_user["id"],
+                "weight": weight,
+                "duration_seconds": owned[file_id].get("duration_seconds"),
+                "reuse_result": not batch.force,
+            }
+            for file_id, transcription in by_file.items()
+            if file_id not in cached
+        ]
+        if jobs:
+            await job_queue.enqueue_many(jobs)
         
-        # Get file content from Supabase Storage
-        file_content = supabase.storage \
-            .from_("transcriptpro-files") \
-            .download(storage_path)
+        results = []
+        seen = set()
+        for file_id in batch.file_ids:
+            if file_id in seen:
+                results.append(TranscriptionBatchItem(file_id=file_id, status="duplicate"))
+                continue
+            seen.add(file_id)
+            if file_id not in by_file:
+                results.append(TranscriptionBatchItem(
+                    file_id=file_id, status="over_quota" if file_id in owned else "not_found"
+                ))
+                continue
+            results.append(TranscriptionBatchItem(
+                file_id=file_id,
+                status="reused" if file_id in cached else "queued",
+                transcription_id=by_file[file_id]["id"],
+            ))
         
-        # Save to a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(storage_path)[1]) as temp_file:
-            temp_file.write(file_content)
-            temp_file_path = temp_file.name
+        return {
+            "message": f"{len(jobs)} transcription job(s) queued, {len(by_file) - len(jobs)} reused",
+            "results": results
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error creating transcriptions: {str(e)}"
+        )
+
+@router.put("/{transcription_id}/text")
+async def update_transcription_text(
+    transcription_id: str,
+    transcript_text: str,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Update the text of a transcription.
+
+    Replaces the whole text without touching segments or checking the
+    version; editors should use PATCH /transcriptions/{id}/segments.
+    """
+    try:
+        # The update only matches rows owned by this user
+        transcription = await transcription_repository.update_text(
+            transcription_id, current_user["id"], transcript_text
+        )
         
-        try:
-            # Call external transcription API
-            # This is a placeholder - replace with your actual transcription service
-            if TRANSCRIPTION_API_URL and TRANSCRIPTION_API_KEY:
-                async with httpx.AsyncClient() as client:
-                    with open(temp_file_path, "rb") as f:
-                        files = {"file": f}
-                        headers = {"Authorization": f"Bearer {TRANSCRIPTION_API_KEY}"}
-                        
-                        response = await client.post(
-                            TRANSCRIPTION_API_URL,
-                            files=files,
-                            headers=headers,
-                            timeout=300  # 5 minutes timeout
-                        )
-                        
-                        if response.status_code != 200:
-                            raise Exception(f"Transcription API error: {response.text}")
-                        
-                        result = response.json()
-                        
-                        # Update transcription with results
-                        supabase.table("transcriptions") \
-                            .update({
-                                "text": result.get("text", ""),
-                                "segments": result.get("segments", []),
-                                "status": "completed"
-                            }) \
-                            .eq("id", transcription_id) \
-                            .execute()
-            else:
-                # For demo/development: generate a fake transcription
-                fake_text = "This is a placeholder transcription. The real transcription would be generated by an AI service."
-                fake_segments = [
-                    {"start": 0, "end": 5, "text": "This is a placeholder transcription."},
-                    {"start": 5, "end": 10, "text": "The real transcription would be generated by an AI service."}
-                ]
-                
-                # Update with fake results
-                supabase.table("transcriptions") \
-                    .update({
-                        "text": fake_text,
-                        "segments": fake_segments,
-                        "status": "completed"
-                    }) \
-                    .eq("id", transcription_id) \
-                    .execute()
-                    
-        except Exception as e:
-            # Set status to failed if an error occurs during transcription
-            supabase.table("transcriptions") \
-                .update({
-                    "status": "failed",
-                    "text": f"Error: {str(e)}"
-                }) \
-                .eq("id", transcription_id) \
-                .execute()
-            raise e
+        if not transcription:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Transcription not found or doesn't belong to the current user"
+            )
         
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
-                
+        return transcription
+    except HTTPException:
+        raise
     except Exception as e:
-        # Set status to failed if an error occurs
-        supabase.table("transcriptions") \
-            .update({
-                "status": "failed",
-                "text": f"Error: {str(e)}"
-            }) \
-            .eq("id", transcription_id) \
-            .execute()
+        if "not found" in str(e).lower():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Transcription not found"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error updating transcription: {str(e)}"
+        )
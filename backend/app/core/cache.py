@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+from app.core.metrics import metrics
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+cache_hits = metrics.counter("cache_hits_total", "Lookups answered from an in-process cache", labels=("cache",))
+cache_misses = metrics.counter("cache_misses_total", "Lookups not found in an in-process cache", labels=("cache",))
+
+
+class TTLCache(Generic[V]):
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire after a TTL.
+
+    Entries can override the default TTL with an absolute expiry (e.g. a
+    token's `exp` claim). Hit and miss counters are kept for monitoring and,
+    for caches given a `name`, reported on /metrics.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, name: Optional[str] = None):
+        self.name = name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] <= time.monotonic():
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                if self.name:
+                    cache_misses.inc(cache=self.name)
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            if self.name:
+                cache_hits.inc(cache=self.name)
+            return entry[1]
+
+    def peek(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        """Get a live entry without counting a hit or miss or refreshing it."""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING or entry[0] <= time.monotonic():
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: V, expires_at: Optional[float] = None) -> None:
+        """
+        Store a value. `expires_at` is a wall-clock timestamp; the entry is
+        dropped at whichever comes first, it or the default TTL.
+        """
+        ttl = self.ttl_seconds
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,61 @@
+import zlib
+from typing import Callable, Dict, Optional, Tuple
+
+import brotli
+import zstandard
+
+from app.core.config import settings
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    The encoding to compress a response with, given the request's
+    Accept-Encoding: the one the client rates highest among
+    COMPRESSION_ENCODINGS, ties going to the earlier in that list. None when
+    the client accepts none of them.
+    """
+    if not accept_encoding:
+        return None
+    ratings: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        ratings[coding.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in settings.COMPRESSION_ENCODINGS.split(","):
+        encoding = encoding.strip()
+        quality = ratings.get(encoding, ratings.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(encoding: str, data: bytes) -> bytes:
+    """Compress a whole body."""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compress(data)
+    if encoding == "br":
+        return brotli.compress(data, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def stream_compressor(encoding: str) -> Tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    """
+    Compress a body sent in parts: returns a function to compress each part
+    and one that returns the remaining output once the body is complete.
+    """
+    if encoding == "zstd":
+        zstd = zstandard.ZstdCompressor(level=settings.COMPRESSION_ZSTD_LEVEL).compressobj()
+        return zstd.compress, zstd.flush
+    if encoding == "br":
+        br = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        return br.process, br.finish
+    gzip = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return gzip.compress, gzip.flush
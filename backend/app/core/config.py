@@ -1,3 +1,4 @@
+import importlib.util
 import os
 import secrets
 from typing import Any, Dict, List, Optional, Union
@@ -42,6 +43,182 @@ class Settings(BaseSettings):
             path=f"/{values.get('POSTGRES_DB') or ''}",
         )
 
+    # Supabase HTTP connection pool (shared by every request in a process)
+    SUPABASE_POOL_MAX_CONNECTIONS: int = 100
+    SUPABASE_POOL_MAX_KEEPALIVE: int = 20
+    SUPABASE_POOL_KEEPALIVE_EXPIRY: float = 30.0  # seconds an idle connection is kept
+    SUPABASE_HTTP_TIMEOUT: float = 30.0
+    # Worker threads running blocking supabase-py calls off the event loop
+    SUPABASE_QUERY_CONCURRENCY: int = 40
+
+    # Supabase access-token verification
+    # "remote" asks Supabase Auth about every uncached token; "local" checks the
+    # signature and expiry in-process and only falls back to Supabase Auth when
+    # no verification key is available for the token.
+    SUPABASE_AUTH_VERIFY_MODE: str = "remote"
+    SUPABASE_JWT_SECRET: Optional[str] = None  # HS256 secret from the project's API settings
+    SUPABASE_JWKS_CACHE_SECONDS: int = 600
+    # Verified tokens are cached until expiry, capped by this TTL so that
+    # revocations are picked up within this window.
+    SUPABASE_TOKEN_CACHE_SECONDS: int = 60
+    SUPABASE_TOKEN_CACHE_SIZE: int = 10000
+
+    @validator("SUPABASE_AUTH_VERIFY_MODE")
+    def check_verify_mode(cls, v: str) -> str:
+        if v not in ("remote", "local"):
+            raise ValueError("SUPABASE_AUTH_VERIFY_MODE must be 'remote' or 'local'")
+        return v
+
+    # In-process user profile cache
+    USER_PROFILE_CACHE_SECONDS: int = 300
+    USER_PROFILE_CACHE_SIZE: int = 10000
+
+    # Transcription worker and job queue
+    WORKER_CONCURRENCY: int = 4  # jobs processed at once per worker process
+    WORKER_POLL_INTERVAL: float = 2.0  # seconds between claims when idle
+    JOB_LEASE_SECONDS: int = 300
+    JOB_HEARTBEAT_SECONDS: int = 60
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BASE_SECONDS: float = 30.0
+    JOB_RETRY_MAX_SECONDS: float = 1800.0
+    # Serve worker metrics (queue wait per user, backend retries) on this port
+    WORKER_METRICS_PORT: Optional[int] = None
+
+    # Fair sharing of workers between users (see claim_transcription_jobs)
+    SCHEDULER_USER_MAX_RUNNING: Optional[int] = None  # jobs one user may have running across all workers (None: no limit)
+    SCHEDULER_SHORT_FILE_SECONDS: float = 300.0  # a user's files up to this long run before their longer ones
+    SCHEDULER_PAID_WEIGHT: float = 2.0  # share of users with more than the free quota, relative to free users
+
+    # Request rate limits: each client gets a token bucket per route group
+    # (auth, transcriptions, files, and the rest of the API) holding up to
+    # _BURST requests and refilling at _PER_MINUTE. Clients are counted by
+    # user once their token is verified and by address otherwise. "memory"
+    # keeps the buckets per process; "postgres" shares them between API
+    # processes at the cost of a database round trip per request.
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_STORE: str = "memory"
+    RATE_LIMIT_MAX_KEYS: int = 100000  # buckets kept by the memory store
+    RATE_LIMIT_AUTH_PER_MINUTE: float = 10.0
+    RATE_LIMIT_AUTH_BURST: int = 10
+    RATE_LIMIT_TRANSCRIPTIONS_PER_MINUTE: float = 300.0
+    RATE_LIMIT_TRANSCRIPTIONS_BURST: int = 100
+    RATE_LIMIT_FILES_PER_MINUTE: float = 300.0  # resumable uploads send one request per chunk
+    RATE_LIMIT_FILES_BURST: int = 100
+    RATE_LIMIT_DEFAULT_PER_MINUTE: float = 300.0
+    RATE_LIMIT_DEFAULT_BURST: int = 100
+
+    @validator("RATE_LIMIT_STORE")
+    def check_rate_limit_store(cls, v: str) -> str:
+        if v not in ("memory", "postgres"):
+            raise ValueError("RATE_LIMIT_STORE must be 'memory' or 'postgres'")
+        return v
+
+    # Load shedding: answer 503 with Retry-After rather than queue work that
+    # would time out. None disables a check.
+    LOAD_SHED_MAX_IN_FLIGHT: Optional[int] = 500  # API requests per process waiting for a response
+    LOAD_SHED_RETRY_AFTER_SECONDS: int = 1
+    LOAD_SHED_MAX_BACKLOG: Optional[int] = 50000  # queued jobs before new transcriptions are refused
+    LOAD_SHED_BACKLOG_CHECK_SECONDS: float = 5.0
+    LOAD_SHED_BACKLOG_RETRY_AFTER_SECONDS: int = 60
+
+    # Response compression, negotiated with Accept-Encoding between the
+    # comma-separated COMPRESSION_ENCODINGS (zstd, br, gzip; ties go to the
+    # earlier one). Bodies under COMPRESSION_MIN_BYTES are sent as they are,
+    # and those of COMPRESSION_THREAD_MIN_BYTES or more are compressed off
+    # the event loop.
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_ENCODINGS: str = "zstd,br,gzip"
+    COMPRESSION_MIN_BYTES: int = 1024
+    COMPRESSION_THREAD_MIN_BYTES: int = 256 * 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+    COMPRESSION_ZSTD_LEVEL: int = 3
+
+    @validator("COMPRESSION_ENCODINGS")
+    def check_compression_encodings(cls, v: str) -> str:
+        if any(i.strip() not in ("zstd", "br", "gzip") for i in v.split(",") if i.strip()):
+            raise ValueError("COMPRESSION_ENCODINGS may only list zstd, br and gzip")
+        return v
+
+    # Media streaming between storage and the transcription API
+    MEDIA_CHUNK_SIZE: int = 1024 * 1024
+    # Spool media to a temporary file (kept in memory up to MEDIA_SPOOL_MAX_MEMORY)
+    # so the upload has a known length; otherwise pipe chunks straight through.
+    TRANSCRIPTION_SPOOL_MEDIA: bool = True
+    MEDIA_SPOOL_MAX_MEMORY: int = 8 * 1024 * 1024
+
+    # Resumable uploads (Supabase Storage requires 6 MiB chunks)
+    STORAGE_UPLOAD_CHUNK_SIZE: int = 6 * 1024 * 1024
+    UPLOAD_SESSION_TTL_HOURS: int = 24
+    # How long Supabase Storage accepts a pre-signed upload URL
+    SIGNED_UPLOAD_EXPIRES_SECONDS: int = 2 * 60 * 60
+
+    # Silence-aware chunking of long media (requires ffmpeg/ffprobe)
+    TRANSCRIPTION_CHUNKING: bool = True
+    TRANSCRIPTION_CHUNK_SECONDS: float = 600.0
+    TRANSCRIPTION_CHUNK_SEARCH_SECONDS: float = 60.0  # how far before a target cut to look for silence
+    TRANSCRIPTION_CHUNK_OVERLAP_SECONDS: float = 1.0
+    TRANSCRIPTION_CHUNK_PARALLELISM: int = 4
+    SILENCE_THRESHOLD_DB: float = -35.0
+    SILENCE_MIN_SECONDS: float = 0.3
+    FFMPEG_PATH: str = "ffmpeg"
+    FFPROBE_PATH: str = "ffprobe"
+
+    # Audio sent to the transcription API is reduced to what the recognizer
+    # uses: video is dropped and the audio downmixed, resampled and encoded
+    # in the backend's format (flac, opus, mp3 or wav; requires ffmpeg).
+    # Leave a backend's format empty to send it the original media.
+    TRANSCRIPTION_HTTP_AUDIO_FORMAT: Optional[str] = "flac"
+    TRANSCRIPTION_AUDIO_SAMPLE_RATE: int = 16000
+    TRANSCRIPTION_AUDIO_CHANNELS: int = 1
+    TRANSCRIPTION_AUDIO_BITRATE: str = "32k"  # lossy formats only
+
+    @validator("TRANSCRIPTION_HTTP_AUDIO_FORMAT", pre=True)
+    def check_audio_format(cls, v: Optional[str]) -> Optional[str]:
+        if not v:
+            return None
+        if v not in ("flac", "opus", "mp3", "wav"):
+            raise ValueError("Audio formats must be flac, opus, mp3, wav or empty")
+        return v
+
+    # Read media headers at upload for duration and audio format
+    MEDIA_PROBE: bool = True
+
+    # Reuse results for media whose content hash was transcribed before.
+    # Bump TRANSCRIPTION_SETTINGS_VERSION after changing the transcription
+    # model or its options so old results are not reused.
+    TRANSCRIPTION_DEDUP: bool = True
+    TRANSCRIPTION_SETTINGS_VERSION: str = "1"
+
+    # Decoded transcript segments cached per process for time-range reads
+    SEGMENT_CACHE_SECONDS: int = 600
+    SEGMENT_CACHE_SIZE: int = 256
+
+    # Rendered transcript exports cached per process; larger ones are only streamed
+    EXPORT_CACHE_SECONDS: int = 600
+    EXPORT_CACHE_SIZE: int = 128
+    EXPORT_CACHE_MAX_BYTES: int = 2 * 1024 * 1024
+
+    # Most files accepted by one POST /transcriptions/batch
+    TRANSCRIPTION_BATCH_MAX_FILES: int = 1000
+
+    # Pagination of GET /transcriptions
+    TRANSCRIPTION_PAGE_SIZE: int = 50
+    TRANSCRIPTION_PAGE_MAX: int = 200
+
+    # Full-text search of transcripts
+    SEARCH_PAGE_SIZE: int = 20
+    SEARCH_PAGE_MAX: int = 100
+    SEARCH_MATCHES_PER_RESULT: int = 5  # matching segment timestamps returned per transcript
+
+    # Live transcription progress. PROGRESS_DATABASE_URL is a direct (session
+    # mode) Postgres connection string used to LISTEN for progress from the
+    # workers; without it, progress streams poll the database instead.
+    PROGRESS_DATABASE_URL: Optional[str] = None
+    PROGRESS_POLL_SECONDS: float = 2.0
+    PROGRESS_KEEPALIVE_SECONDS: float = 15.0
+    PROGRESS_QUEUE_SIZE: int = 16
+
     # AWS or Cloud Storage Configuration
     STORAGE_BUCKET_NAME: str = "transcriptpro-files"
     AWS_ACCESS_KEY_ID: Optional[str] = None
@@ -50,11 +227,53 @@ class Settings(BaseSettings):
 
     # Freemium Model Settings
     DEFAULT_FREE_MINUTES: int = 60  # 60 minutes free per month
+    # Files the probe could not time are charged as if encoded at this
+    # bitrate until a worker measures them; lower is stricter
+    QUOTA_UNKNOWN_BITRATE_KBPS: float = 32.0
 
     # AI Transcription Service Configuration
     TRANSCRIPTION_API_KEY: Optional[str] = None
     TRANSCRIPTION_API_URL: Optional[str] = None
 
+    # Transcription backend: "http" sends media to TRANSCRIPTION_API_URL,
+    # "mock" returns placeholder transcripts. When unset, the API is used if
+    # it is configured and the mock otherwise.
+    TRANSCRIPTION_BACKEND: Optional[str] = None
+    # Pooled HTTP client shared by every job in a process
+    TRANSCRIPTION_HTTP_TIMEOUT: float = 300.0
+    TRANSCRIPTION_HTTP2: bool = False  # requires the h2 package (httpx[http2])
+    TRANSCRIPTION_POOL_MAX_CONNECTIONS: int = 20
+    TRANSCRIPTION_POOL_MAX_KEEPALIVE: int = 10
+
+    @validator("TRANSCRIPTION_HTTP2")
+    def check_http2(cls, v: bool) -> bool:
+        # httpx only fails on the first request without h2; fail at startup
+        if v and importlib.util.find_spec("h2") is None:
+            raise ValueError("TRANSCRIPTION_HTTP2 requires the h2 package: pip install 'httpx[http2]'")
+        return v
+
+    # Requests a process has in flight to one backend, across all jobs and chunks
+    TRANSCRIPTION_MAX_CONCURRENCY: int = 8
+    # Retries of 429, 5xx and connection errors, with jittered backoff
+    TRANSCRIPTION_RETRY_ATTEMPTS: int = 4
+    TRANSCRIPTION_RETRY_BASE_SECONDS: float = 1.0
+    TRANSCRIPTION_RETRY_MAX_SECONDS: float = 30.0
+    # Consecutive failures that open the circuit, and how long it stays open
+    TRANSCRIPTION_BREAKER_THRESHOLD: int = 5
+    TRANSCRIPTION_BREAKER_RESET_SECONDS: float = 30.0
+    # Simulated latency and failures of the mock backend and the mock API
+    # server (python -m app.mock_transcription_api)
+    MOCK_TRANSCRIPTION_LATENCY_SECONDS: float = 0.0
+    MOCK_TRANSCRIPTION_FAILURE_RATE: float = 0.0
+
+    @validator("TRANSCRIPTION_BACKEND", pre=True)
+    def check_transcription_backend(cls, v: Optional[str]) -> Optional[str]:
+        if not v:
+            return None
+        if v not in ("http", "mock"):
+            raise ValueError("TRANSCRIPTION_BACKEND must be 'http', 'mock' or empty")
+        return v
+
     class Config:
         case_sensitive = True
         env_file = ".env"
@@ -0,0 +1,113 @@
+import asyncio
+import json
+from collections import defaultdict
+from typing import Any, Dict, Optional, Set
+
+import asyncpg
+
+from app.core.config import settings
+
+# Postgres channel the transcriptions trigger notifies on
+PROGRESS_CHANNEL = "transcription_progress"
+
+
+class ProgressBroker:
+    """
+    In-process pub/sub of transcription progress events, keyed by
+    transcription id.
+
+    Events published in this process reach its subscribers directly. When a
+    database URL is configured, events notified on PROGRESS_CHANNEL by any
+    process (such as the transcription workers) are relayed here as well;
+    `fanout_connected` says whether that relay is currently up.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[asyncio.Task] = None
+        self.fanout_connected = False
+
+    def subscribe(self, transcription_id: str) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.PROGRESS_QUEUE_SIZE)
+        self._subscribers[transcription_id].add(queue)
+        return queue
+
+    def unsubscribe(self, transcription_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(transcription_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[transcription_id]
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        """
+        Deliver an event with at least `id` and `status` to the subscribers
+        of that transcription. Safe to call from any thread.
+        """
+        if event["id"] not in self._subscribers or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._deliver(event)
+        else:
+            self._loop.call_soon_threadsafe(self._deliver, event)
+
+    def _deliver(self, event: Dict[str, Any]) -> None:
+        for queue in list(self._subscribers.get(event["id"], ())):
+            if queue.full():
+                # A slow subscriber only needs the latest state
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def start_fanout(self) -> None:
+        """Start relaying Postgres notifications, if configured."""
+        if settings.PROGRESS_DATABASE_URL and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop_fanout(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self) -> None:
+        """Hold a LISTEN connection open, reconnecting after failures."""
+        self._loop = asyncio.get_running_loop()
+
+        def on_notify(connection: Any, pid: int, channel: str, payload: str) -> None:
+            try:
+                self.publish(json.loads(payload))
+            except (ValueError, KeyError) as e:
+                print(f"Ignoring malformed progress notification: {e}")
+
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(settings.PROGRESS_DATABASE_URL)
+                await connection.add_listener(PROGRESS_CHANNEL, on_notify)
+                self.fanout_connected = True
+                # asyncpg delivers notifications in the background; just
+                # check now and then that the connection is still alive
+                while not connection.is_closed():
+                    await asyncio.sleep(settings.PROGRESS_POLL_SECONDS)
+                    await connection.execute("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Progress listener disconnected: {e}")
+            finally:
+                self.fanout_connected = False
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(settings.PROGRESS_POLL_SECONDS)
+
+
+progress_broker = ProgressBroker()
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+# Label values beyond this many per metric are reported together as "other",
+# so per-user series cannot grow without bound
+MAX_LABEL_SETS = 1000
+
+
+class Counter:
+    """
+    A monotonically increasing, thread-safe counter, kept separately for
+    each combination of its label values.
+    """
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], int] = {} if self.labels else {(): 0}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            if key not in self._values and len(self._values) >= MAX_LABEL_SETS:
+                key = tuple("other" for _ in self.labels)
+            self._values[key] = self._values.get(key, 0) + amount
+
+    @property
+    def value(self) -> int:
+        """The total over all label values."""
+        return sum(self._values.values())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            series = list(self._values.items())
+        for key, value in series:
+            labels = ",".join(f'{name}="{label}"' for name, label in zip(self.labels, key))
+            suffix = "{" + labels + "}" if labels else ""
+            lines.append(f"{self.name}{suffix} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    A thread-safe histogram of observed values, kept separately for each
+    combination of its label values.
+    """
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.buckets = sorted(buckets)
+        self.labels = tuple(labels)
+        # Per label values: observations in each bucket (the last is +Inf), and their sum
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            if key not in self._counts and len(self._counts) >= MAX_LABEL_SETS:
+                key = tuple("other" for _ in self.labels)
+            if key not in self._counts:
+                self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            self._counts[key][bisect_left(self.buckets, value)] += 1
+            self._sums[key] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        for key, counts, total in series:
+            labels = [f'{name}="{value}"' for name, value in zip(self.labels, key)]
+            cumulative = 0
+            for bound, count in zip([*self.buckets, "+Inf"], counts):
+                cumulative += count
+                bucket_labels = ",".join([*labels, f'le="{bound}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    In-process metrics, rendered in the Prometheus text format by /metrics.
+
+    Values are per process; the API and each worker report their own.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, description: str, labels: Sequence[str] = ()) -> Counter:
+        """Get the counter called `name`, creating it on first use."""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, description, labels)
+            return self._metrics[name]
+
+    def histogram(
+        self, name: str, description: str, buckets: Sequence[float], labels: Sequence[str] = ()
+    ) -> Histogram:
+        """Get the histogram called `name`, creating it on first use."""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, description, buckets, labels)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+async def serve_metrics(port: int) -> asyncio.AbstractServer:
+    """
+    Serve the metrics on `port` for processes without an HTTP API, such as
+    the workers. Every request gets the metrics, whatever its path.
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = metrics.render().encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4\r\n"
+                + f"Content-Length: {len(body)}\r\n".encode()
+                + b"Connection: close\r\n\r\n"
+                + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, port=port)
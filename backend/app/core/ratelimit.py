@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.supabase import execute, get_supabase_client
+
+rate_limit_store_errors = metrics.counter(
+    "rate_limit_store_errors_total", "Rate limit checks let through because the bucket store failed"
+)
+
+
+def group_limit(group: str) -> Tuple[float, int]:
+    """Requests per minute and burst allowed per client in a route group."""
+    return {
+        "auth": (settings.RATE_LIMIT_AUTH_PER_MINUTE, settings.RATE_LIMIT_AUTH_BURST),
+        "transcriptions": (settings.RATE_LIMIT_TRANSCRIPTIONS_PER_MINUTE, settings.RATE_LIMIT_TRANSCRIPTIONS_BURST),
+        "files": (settings.RATE_LIMIT_FILES_PER_MINUTE, settings.RATE_LIMIT_FILES_BURST),
+    }.get(group, (settings.RATE_LIMIT_DEFAULT_PER_MINUTE, settings.RATE_LIMIT_DEFAULT_BURST))
+
+
+class RateLimitStore:
+    """
+    Token buckets, one per key. A bucket holds up to `burst` tokens and
+    refills at `rate` tokens per second; each request takes one.
+    """
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        """
+        Take a token from the bucket `key`. Returns 0 if one was taken, or
+        else the seconds until one will be available.
+        """
+        raise NotImplementedError
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """
+    Buckets kept in this process. The least recently used buckets beyond
+    `max_keys` are dropped, which refills them.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # key -> (tokens, monotonic time they were counted)
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class PostgresRateLimitStore(RateLimitStore):
+    """
+    Buckets in the rate_limit_buckets table, shared by every API process.
+    Each check is a round trip to the database (take_rate_limit_token).
+    """
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        response = await execute(get_supabase_client().rpc("take_rate_limit_token", {
+            "p_key": key,
+            "p_rate": rate,
+            "p_burst": burst,
+        }))
+        return float(response.data or 0)
+
+
+class RateLimiter:
+    """Per-client request limits for each route group."""
+
+    def __init__(self, store: RateLimitStore):
+        self.store = store
+
+    async def check(self, client: str, group: str) -> float:
+        """
+        Count a request by `client` to `group`. Returns 0 if it is allowed,
+        or else the seconds the client should wait before retrying.
+
+        Requests are let through when the store fails, so an unavailable
+        database does not also take down routes that do not need it.
+        """
+        per_minute, burst = group_limit(group)
+        if per_minute <= 0:
+            return 0.0
+        try:
+            return await self.store.take(f"{group}:{client}", per_minute / 60, max(burst, 1))
+        except Exception as e:
+            rate_limit_store_errors.inc()
+            print(f"Rate limit store unavailable, allowing request: {e}")
+            return 0.0
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """The process-wide rate limiter, using the RATE_LIMIT_STORE buckets."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        if settings.RATE_LIMIT_STORE == "postgres":
+            store: RateLimitStore = PostgresRateLimitStore()
+        else:
+            store = MemoryRateLimitStore(settings.RATE_LIMIT_MAX_KEYS)
+        _rate_limiter = RateLimiter(store)
+    return _rate_limiter
@@ -1,10 +1,13 @@
 from datetime import datetime, timedelta
-from typing import Any, Optional, Union
+from typing import Any, Dict, Optional, Union
 
-from jose import jwt
+import httpx
+from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.supabase import SUPABASE_URL
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -38,3 +41,75 @@ def get_password_hash(password: str) -> str:
     Hash a password.
     """
     return pwd_context.hash(password)
+
+
+class TokenVerificationUnavailable(Exception):
+    """Raised when a token cannot be checked locally and must be verified remotely."""
+
+
+_jwks_cache: TTLCache[Dict[str, Dict[str, Any]]] = TTLCache(
+    max_size=1, ttl_seconds=settings.SUPABASE_JWKS_CACHE_SECONDS, name="jwks"
+)
+
+
+# Algorithm for JWKs that do not state one, by key type and curve
+_JWK_ALGORITHMS = {("RSA", None): "RS256", ("EC", "P-256"): "ES256", ("EC", "P-384"): "ES384", ("EC", "P-521"): "ES512"}
+
+
+async def _get_supabase_jwks() -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch the Supabase Auth signing keys, keyed by `kid`.
+    """
+    keys = _jwks_cache.get("jwks")
+    if keys is None:
+        async with httpx.AsyncClient(timeout=settings.SUPABASE_HTTP_TIMEOUT) as client:
+            response = await client.get(f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json")
+        response.raise_for_status()
+        keys = {key["kid"]: key for key in response.json().get("keys", []) if "kid" in key}
+        _jwks_cache.set("jwks", keys)
+    return keys
+
+
+def _jwk_algorithm(key: Dict[str, Any]) -> Optional[str]:
+    """The algorithm a JWK is for: its own `alg`, or the usual one for its key type."""
+    if key.get("alg"):
+        return key["alg"]
+    return _JWK_ALGORITHMS.get((key.get("kty"), key.get("crv")))
+
+
+async def verify_supabase_token(token: str) -> Dict[str, Any]:
+    """
+    Verify a Supabase access token's signature and expiry without calling
+    Supabase Auth.
+
+    HS256 tokens are checked against SUPABASE_JWT_SECRET; asymmetric tokens
+    against the project's cached JWKS, with the algorithm the key is for
+    rather than the one the token names. Raises JWTError for invalid tokens and
+    TokenVerificationUnavailable when no key is available to check them.
+    """
+    header = jwt.get_unverified_header(token)
+
+    if header.get("alg") == "HS256":
+        if not settings.SUPABASE_JWT_SECRET:
+            raise TokenVerificationUnavailable("SUPABASE_JWT_SECRET is not set")
+        key: Any = settings.SUPABASE_JWT_SECRET
+        algorithm = "HS256"
+    else:
+        if not SUPABASE_URL:
+            raise TokenVerificationUnavailable("SUPABASE_URL is not set")
+        try:
+            key = (await _get_supabase_jwks()).get(header.get("kid"))
+        except httpx.HTTPError as e:
+            raise TokenVerificationUnavailable(f"Could not fetch JWKS: {e}")
+        if key is None:
+            # Unknown key id, possibly a rotation; let Supabase Auth decide
+            _jwks_cache.clear()
+            raise TokenVerificationUnavailable("Signing key not found")
+        algorithm = _jwk_algorithm(key)
+        if algorithm is None or algorithm.startswith("HS"):
+            raise JWTError("Signing key has no usable algorithm")
+
+    claims = jwt.decode(token, key, algorithms=[algorithm], audience="authenticated")
+    if not claims.get("sub"):
+        raise JWTError("Token has no subject")
+    return claims
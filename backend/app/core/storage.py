@@ -0,0 +1,205 @@
+import base64
+from typing import AsyncIterator, Optional
+from urllib.parse import quote
+
+import httpx
+
+from app.core.config import settings
+from app.core.supabase import SUPABASE_KEY, SUPABASE_URL, get_pool_limits
+
+STORAGE_BUCKET = settings.STORAGE_BUCKET_NAME
+
+
+class StorageError(Exception):
+    """Raised when Supabase Storage rejects a request."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        self.status_code = status_code
+        super().__init__(message)
+
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_storage_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared async HTTP client for the Supabase Storage REST API.
+
+    supabase-py's storage client only returns whole objects as bytes; this
+    client is used where media has to be streamed instead.
+    """
+    global _http_client
+    if _http_client is None:
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            raise ValueError(
+                "Supabase configuration missing. "
+                "Please set SUPABASE_URL and SUPABASE_SERVICE_KEY environment variables."
+            )
+        _http_client = httpx.AsyncClient(
+            base_url=f"{SUPABASE_URL}/storage/v1",
+            headers={"apikey": SUPABASE_KEY, "Authorization": f"Bearer {SUPABASE_KEY}"},
+            limits=get_pool_limits(),
+            timeout=httpx.Timeout(settings.SUPABASE_HTTP_TIMEOUT),
+        )
+    return _http_client
+
+
+async def close_storage_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        client, _http_client = _http_client, None
+        await client.aclose()
+
+
+def object_url(path: str, bucket: str = STORAGE_BUCKET) -> str:
+    return f"/object/{bucket}/{quote(path)}"
+
+
+async def iter_object(path: str, chunk_size: Optional[int] = None, bucket: str = STORAGE_BUCKET) -> AsyncIterator[bytes]:
+    """
+    Download a storage object as a stream of chunks, never holding more than
+    one chunk in memory.
+    """
+    client = get_storage_http_client()
+    async with client.stream("GET", object_url(path, bucket)) as response:
+        if response.status_code != 200:
+            await response.aread()
+            raise StorageError(f"Error downloading {path}: {response.text}", response.status_code)
+        async for chunk in response.aiter_bytes(chunk_size or settings.MEDIA_CHUNK_SIZE):
+            yield chunk
+
+
+async def read_object_range(path: str, start: int, length: int, bucket: str = STORAGE_BUCKET) -> bytes:
+    """
+    Read `length` bytes of a storage object from offset `start` with an HTTP
+    range request. Fewer bytes come back if the object ends first.
+    """
+    client = get_storage_http_client()
+    end = start + length
+    async with client.stream(
+        "GET", object_url(path, bucket), headers={"Range": f"bytes={start}-{end - 1}"}
+    ) as response:
+        if response.status_code == 416:
+            return b""
+        if response.status_code not in (200, 206):
+            await response.aread()
+            raise StorageError(f"Error reading {path}: {response.text}", response.status_code)
+        if response.status_code == 206:
+            return await response.aread()
+
+        # Range ignored: the whole object is coming back. Skip to `start` and
+        # hang up once the range has arrived, keeping only the range itself.
+        kept = []
+        received = 0
+        async for chunk in response.aiter_bytes():
+            chunk_start, received = received, received + len(chunk)
+            if received > start:
+                kept.append(chunk[max(0, start - chunk_start):end - chunk_start])
+            if received >= end:
+                break
+        return b"".join(kept)
+
+
+# Resumable uploads use the TUS protocol supported by Supabase Storage
+TUS_HEADERS = {"Tus-Resumable": "1.0.0"}
+
+
+def _tus_metadata(values: dict) -> str:
+    return ",".join(
+        f"{key} {base64.b64encode(value.encode()).decode()}" for key, value in values.items()
+    )
+
+
+async def create_resumable_upload(
+    path: str, size: int, content_type: str, bucket: str = STORAGE_BUCKET
+) -> str:
+    """Start a resumable upload of `size` bytes to `path` and return its upload URL."""
+    client = get_storage_http_client()
+    response = await client.post(
+        "/upload/resumable",
+        headers={
+            **TUS_HEADERS,
+            "Upload-Length": str(size),
+            "Upload-Metadata": _tus_metadata({
+                "bucketName": bucket,
+                "objectName": path,
+                "contentType": content_type,
+            }),
+        },
+    )
+    if response.status_code != 201:
+        raise StorageError(f"Error creating upload for {path}: {response.text}", response.status_code)
+    return response.headers["Location"]
+
+
+async def get_upload_offset(upload_url: str) -> int:
+    """Return how many bytes of a resumable upload storage has received."""
+    client = get_storage_http_client()
+    response = await client.head(upload_url, headers=TUS_HEADERS)
+    if response.status_code != 200:
+        raise StorageError("Upload not found or expired", response.status_code)
+    return int(response.headers["Upload-Offset"])
+
+
+async def append_to_upload(upload_url: str, offset: int, data: bytes) -> int:
+    """Append `data` at `offset` of a resumable upload and return the new offset."""
+    async def body() -> AsyncIterator[bytes]:
+        yield data
+
+    # httpx keeps each request in a reference cycle with its response until
+    # the garbage collector runs, so bytes passed as content would pile up
+    # across pieces; a spent generator holds nothing
+    client = get_storage_http_client()
+    response = await client.patch(
+        upload_url,
+        content=body(),
+        headers={
+            **TUS_HEADERS,
+            "Upload-Offset": str(offset),
+            "Content-Length": str(len(data)),
+            "Content-Type": "application/offset+octet-stream",
+        },
+    )
+    if response.status_code != 204:
+        raise StorageError(f"Error uploading chunk: {response.text}", response.status_code)
+    return int(response.headers["Upload-Offset"])
+
+
+async def create_signed_upload_url(path: str, bucket: str = STORAGE_BUCKET) -> str:
+    """
+    Create a pre-signed URL that lets a client PUT an object directly to
+    storage without credentials.
+    """
+    client = get_storage_http_client()
+    response = await client.post(f"/object/upload/sign/{bucket}/{quote(path)}")
+    if response.status_code != 200:
+        raise StorageError(f"Error signing upload for {path}: {response.text}", response.status_code)
+    return str(client.base_url).rstrip("/") + response.json()["url"]
+
+
+async def create_signed_download_url(path: str, expires_in: int, bucket: str = STORAGE_BUCKET) -> str:
+    """
+    Create a pre-signed URL that reads an object for `expires_in` seconds,
+    for tools such as ffmpeg that fetch media themselves.
+    """
+    client = get_storage_http_client()
+    response = await client.post(f"/object/sign/{bucket}/{quote(path)}", json={"expiresIn": expires_in})
+    if response.status_code != 200:
+        raise StorageError(f"Error signing download of {path}: {response.text}", response.status_code)
+    return str(client.base_url).rstrip("/") + response.json()["signedURL"]
+
+
+async def get_object_info(path: str, bucket: str = STORAGE_BUCKET) -> Optional[dict]:
+    """Return the metadata of a storage object (size, mimetype, ...), or None if it does not exist."""
+    folder, _, name = path.rpartition("/")
+    client = get_storage_http_client()
+    response = await client.post(
+        f"/object/list/{bucket}",
+        json={"prefix": folder, "search": name, "limit": 1, "offset": 0},
+    )
+    if response.status_code != 200:
+        raise StorageError(f"Error looking up {path}: {response.text}", response.status_code)
+    for item in response.json():
+        if item["name"] == name and item.get("metadata"):
+            return item["metadata"]
+    return None
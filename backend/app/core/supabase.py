@@ -1,41 +1,225 @@
 import os
-from supabase import create_client
+import threading
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+import anyio
+import httpx
+from postgrest import SyncPostgrestClient
+from supabase import Client
+from supabase.lib.client_options import ClientOptions
+from supabase.lib.auth_client import SupabaseAuthClient, SyncClient
+from supabase.lib.storage_client import SupabaseStorageClient
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+T = TypeVar("T")
 
 # Load Supabase configuration from environment variables
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "")
 SUPABASE_KEY = os.environ.get("SUPABASE_SERVICE_KEY", "")
 
-# Create Supabase client (this will be lazily initialized when needed)
-def get_supabase_client():
+
+def get_pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.SUPABASE_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.SUPABASE_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=settings.SUPABASE_POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+class PooledSupabaseClient(Client):
+    """
+    Supabase client whose Auth, PostgREST and Storage sub-clients share
+    a single set of keep-alive pool limits.
+
+    supabase-py builds each sub-client with httpx defaults; the hooks below
+    rebuild their sessions with the configured limits so connections stay warm
+    for the lifetime of the process.
+    """
+
+    def __init__(self, supabase_url: str, supabase_key: str, options: ClientOptions, limits: httpx.Limits):
+        self.limits = limits
+        super().__init__(supabase_url, supabase_key, options)
+
+    def _init_supabase_auth_client(self, auth_url: str, client_options: ClientOptions) -> SupabaseAuthClient:
+        return SupabaseAuthClient(
+            url=auth_url,
+            auto_refresh_token=client_options.auto_refresh_token,
+            persist_session=client_options.persist_session,
+            storage=client_options.storage,
+            headers=client_options.headers,
+            flow_type=client_options.flow_type,
+            http_client=SyncClient(limits=self.limits, timeout=settings.SUPABASE_HTTP_TIMEOUT),
+        )
+
+    def _init_postgrest_client(self, rest_url, headers, schema, timeout) -> SyncPostgrestClient:
+        client = SyncPostgrestClient(rest_url, headers=headers, schema=schema, timeout=timeout)
+        client.session = self._pooled(client.session)
+        return client
+
+    def _init_storage_client(self, storage_url, headers, storage_client_timeout) -> SupabaseStorageClient:
+        client = SupabaseStorageClient(storage_url, headers, storage_client_timeout)
+        client.session = client._client = self._pooled(client.session)
+        return client
+
+    def _pooled(self, session: httpx.Client) -> httpx.Client:
+        pooled = type(session)(
+            base_url=session.base_url,
+            headers=session.headers,
+            timeout=session.timeout,
+            limits=self.limits,
+        )
+        session.close()
+        return pooled
+
+    def close(self) -> None:
+        """Close every HTTP session opened by this client."""
+        self.auth.close()
+        if self._postgrest is not None:
+            self._postgrest.aclose()
+        if self._storage is not None:
+            self._storage.aclose()
+
+
+class SupabaseClientRegistry:
+    """
+    Process-wide registry of pooled Supabase clients.
+
+    Clients are created lazily on first use and reused by every request,
+    so routes and background jobs share warm connections instead of paying
+    a TLS handshake per call. `close()` is called on application shutdown.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, PooledSupabaseClient] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str = "service") -> PooledSupabaseClient:
+        client = self._clients.get(name)
+        if client is not None:
+            return client
+
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            raise ValueError(
+                "Supabase configuration missing. "
+                "Please set SUPABASE_URL and SUPABASE_SERVICE_KEY environment variables."
+            )
+
+        with self._lock:
+            client = self._clients.get(name)
+            if client is None:
+                # Sessions are never persisted or refreshed server-side; a fresh
+                # ClientOptions avoids supabase-py's shared mutable default.
+                options = ClientOptions(
+                    auto_refresh_token=False,
+                    persist_session=False,
+                    postgrest_client_timeout=settings.SUPABASE_HTTP_TIMEOUT,
+                    storage_client_timeout=settings.SUPABASE_HTTP_TIMEOUT,
+                )
+                client = PooledSupabaseClient(SUPABASE_URL, SUPABASE_KEY, options, get_pool_limits())
+                self._clients[name] = client
+        return client
+
+    def close(self) -> None:
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
+
+
+supabase_clients = SupabaseClientRegistry()
+
+
+def get_supabase_client() -> PooledSupabaseClient:
     """
-    Create and return a Supabase client using environment variables.
+    Return the shared Supabase client using environment variables.
     
     The service key (not anon key) should be used for backend operations
     to have full database access rights.
     """
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        raise ValueError(
-            "Supabase configuration missing. "
-            "Please set SUPABASE_URL and SUPABASE_SERVICE_KEY environment variables."
-        )
-    
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    return supabase_clients.get("service")
+
+
+def get_supabase_auth_client() -> PooledSupabaseClient:
+    """
+    Return the shared client used for password sign-ins.
+
+    Signing in switches a client's PostgREST and Storage sessions over to
+    the user's token, so it must never happen on the service client.
+    """
+    return supabase_clients.get("auth")
+
+_query_limiter: Optional[anyio.CapacityLimiter] = None
+
+
+def _get_query_limiter() -> anyio.CapacityLimiter:
+    # Created lazily because anyio limiters need a running event loop
+    global _query_limiter
+    if _query_limiter is None:
+        _query_limiter = anyio.CapacityLimiter(settings.SUPABASE_QUERY_CONCURRENCY)
+    return _query_limiter
+
+
+async def run_blocking(func: Callable[..., T], *args: Any) -> T:
+    """
+    Run a blocking supabase-py call on a bounded worker thread so it does not
+    stall the event loop for the length of the HTTP round trip.
+    """
+    return await anyio.to_thread.run_sync(func, *args, limiter=_get_query_limiter())
+
+
+async def execute(query: Any) -> Any:
+    """Execute a PostgREST query builder without blocking the event loop."""
+    return await run_blocking(query.execute)
 
 # Helper functions for common operations
 
+# user id -> user_profiles row; quota and admin flags rarely change
+user_profile_cache: TTLCache[Dict[str, Any]] = TTLCache(
+    max_size=settings.USER_PROFILE_CACHE_SIZE,
+    ttl_seconds=settings.USER_PROFILE_CACHE_SECONDS,
+    name="user_profile",
+)
+
+def invalidate_user_profile(user_id: str) -> None:
+    """Drop a cached profile; call after any write to user_profiles."""
+    user_profile_cache.invalidate(user_id)
+
+async def get_user_profile(user_id: str) -> Dict[str, Any]:
+    """Get the user_profiles row for a user, or an empty dict if there is none."""
+    profile_data = user_profile_cache.get(user_id)
+    if profile_data is not None:
+        return dict(profile_data)
+    
+    supabase = get_supabase_client()
+    profile_response = await execute(supabase.table("user_profiles").select("*").eq("id", user_id))
+    profile_data = profile_response.data[0] if profile_response.data else {}
+    
+    # Missing profiles are not cached so a newly created one is seen at once
+    if profile_data:
+        user_profile_cache.set(user_id, profile_data)
+    return dict(profile_data)
+
+async def save_user_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Upsert a user_profiles row (e.g. a quota change) and invalidate its cache entry."""
+    supabase = get_supabase_client()
+    response = await execute(supabase.table("user_profiles").upsert(profile))
+    invalidate_user_profile(profile["id"])
+    return response.data[0] if response.data else {}
+
 async def get_user_by_id(user_id: str):
     """Get user information by user ID including profile data."""
     supabase = get_supabase_client()
     
     # Get auth user info
-    auth_response = supabase.auth.admin.get_user_by_id(user_id)
+    auth_response = await run_blocking(supabase.auth.admin.get_user_by_id, user_id)
     
     if not auth_response.user:
         return None
     
     # Get user profile info
-    profile_response = supabase.table("user_profiles").select("*").eq("id", user_id).execute()
-    profile_data = profile_response.data[0] if profile_response.data else {}
+    profile_data = await get_user_profile(user_id)
     
     # Combine auth user and profile data
     user_data = {
@@ -49,35 +233,51 @@ async def get_user_by_id(user_id: str):
 
 async def ensure_user_profile(user_id: str):
     """Ensure user profile exists, create if it doesn't."""
+    if user_profile_cache.get(user_id) is not None:
+        return
+    
     supabase = get_supabase_client()
     
     # Check if profile exists
-    profile_response = supabase.table("user_profiles").select("id").eq("id", user_id).execute()
+    profile_response = await execute(supabase.table("user_profiles").select("id").eq("id", user_id))
     
     # If profile doesn't exist, create it
     if not profile_response.data:
-        supabase.table("user_profiles").insert({
+        await execute(supabase.table("user_profiles").insert({
             "id": user_id,
             "quota_minutes": 60,  # Default free minutes
             "is_admin": False
-        }).execute()
+        }))
+        invalidate_user_profile(user_id)
 
-async def create_file_record(user_id: str, filename: str, size: int, storage_path: str):
-    """Create a new file record in the database."""
+async def create_file_record(
+    user_id: str,
+    filename: str,
+    size: int,
+    storage_path: str,
+    content_sha256: Optional[str] = None,
+    media: Optional[Dict[str, Any]] = None,
+):
+    """
+    Create a new file record in the database. `media` holds probed
+    duration_seconds, sample_rate, channels and media_format, if known.
+    """
     supabase = get_supabase_client()
-    response = supabase.table("files").insert({
+    response = await execute(supabase.table("files").insert({
         "user_id": user_id,
         "original_filename": filename,
         "size": size,
         "upload_status": "uploaded",
-        "storage_path": storage_path
-    }).execute()
+        "storage_path": storage_path,
+        "content_sha256": content_sha256,
+        **(media or {})
+    }))
     return response.data[0] if response.data else None
 
 async def update_transcription_status(transcription_id: str, status: str):
     """Update the status of a transcription."""
     supabase = get_supabase_client()
-    response = supabase.table("transcriptions").update({
+    response = await execute(supabase.table("transcriptions").update({
         "status": status
-    }).eq("id", transcription_id).execute()
+    }).eq("id", transcription_id))
     return response.data[0] if response.data else None 
\ No newline at end of file
@@ -1,9 +1,31 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 from app.core.config import settings
+from app.api.middleware import CompressionMiddleware, LoadSheddingMiddleware, RateLimitMiddleware
 from app.api.routes import router as api_router
+from app.core.events import progress_broker
+from app.core.metrics import metrics
+from app.core.storage import close_storage_http_client
+from app.core.supabase import supabase_clients
+from app.services.backends import close_transcription_backend
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Relay progress notified by the workers to this process's subscribers
+    progress_broker.start_fanout()
+    yield
+    await progress_broker.stop_fanout()
+    # Release pooled Supabase connections on shutdown
+    supabase_clients.close()
+    await close_storage_http_client()
+    await close_transcription_backend()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -11,15 +33,24 @@ app = FastAPI(
     version="0.1.0",
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url=f"{settings.API_V1_STR}/docs",
+    lifespan=lifespan,
 )
 
-# Set up CORS middleware
+# Shed load, then rate limit, before requests reach authentication or
+# Supabase, and compress what the routes return (middleware added later
+# runs first)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(LoadSheddingMiddleware)
+
+# Set up CORS middleware, outermost so refusals carry CORS headers too
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.BACKEND_CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
 # Include API router
@@ -30,5 +61,10 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 async def health_check():
     return {"status": "ok"}
 
+# Metrics endpoint, in the Prometheus text format
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return metrics.render()
+
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
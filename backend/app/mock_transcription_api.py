@@ -0,0 +1,45 @@
+"""
+Local stand-in for the transcription API, for development and for
+benchmarking the http transcription backend offline.
+
+Accepts the same multipart upload as the real API and answers with a
+placeholder transcript after MOCK_TRANSCRIPTION_LATENCY_SECONDS. A
+MOCK_TRANSCRIPTION_FAILURE_RATE share of requests fail, alternating
+between 429 (with Retry-After) and 503, so retries and the circuit breaker
+can be exercised:
+
+    python -m app.mock_transcription_api
+
+then point TRANSCRIPTION_API_URL at http://localhost:9000/v1/transcribe.
+"""
+import asyncio
+import random
+
+from fastapi import FastAPI, File, UploadFile
+from fastapi.responses import JSONResponse
+import uvicorn
+
+from app.core.config import settings
+from app.services.backends import placeholder_result
+
+app = FastAPI(title="Mock Transcription API")
+app.state.requests = 0
+
+
+@app.post("/v1/transcribe")
+async def transcribe(file: UploadFile = File(...)):
+    app.state.requests += 1
+    # Read the whole upload, as the real service would
+    while await file.read(1024 * 1024):
+        pass
+    await asyncio.sleep(settings.MOCK_TRANSCRIPTION_LATENCY_SECONDS)
+
+    if random.random() < settings.MOCK_TRANSCRIPTION_FAILURE_RATE:
+        if app.state.requests % 2:
+            return JSONResponse({"error": "rate limited"}, status_code=429, headers={"Retry-After": "1"})
+        return JSONResponse({"error": "service unavailable"}, status_code=503)
+    return placeholder_result()
+
+
+if __name__ == "__main__":
+    uvicorn.run("app.mock_transcription_api:app", host="0.0.0.0", port=9000)
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 
 
 # Shared properties
@@ -46,3 +46,35 @@ class FileUploadResponse(BaseModel):
     original_filename: str
     upload_status: str
     file_size: Optional[int] = None
+
+
+# Properties to receive via API when starting a resumable upload
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int
+    content_type: Optional[str] = None
+
+    @validator("size")
+    def size_positive(cls, v):
+        if v <= 0:
+            raise ValueError("Size must be greater than 0")
+        return v
+
+
+# Resumable upload state returned via API
+class UploadSessionResponse(BaseModel):
+    id: str
+    filename: str
+    size: int
+    offset: int
+    chunk_size: int  # every chunk except the last must be a multiple of this
+    status: str
+    expires_at: datetime
+
+
+# Pre-signed direct-to-storage upload returned via API
+class SignedUploadResponse(BaseModel):
+    id: str
+    upload_url: str  # PUT the file body here
+    storage_path: str
+    expires_at: datetime
@@ -1,7 +1,9 @@
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Literal, Optional, Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
+
+from app.core.config import settings
 
 
 # Shared properties
@@ -42,9 +44,30 @@ class TranscriptionInDB(TranscriptionInDBBase):
     pass
 
 
+# Properties to receive via API on batch creation
+class TranscriptionBatchCreate(BaseModel):
+    file_ids: List[str]
+    force: bool = False  # transcribe again even if identical media was transcribed before
+
+    @validator("file_ids")
+    def file_ids_within_limit(cls, v):
+        if not v:
+            raise ValueError("At least one file ID is required")
+        if len(v) > settings.TRANSCRIPTION_BATCH_MAX_FILES:
+            raise ValueError(f"At most {settings.TRANSCRIPTION_BATCH_MAX_FILES} files can be submitted at once")
+        return v
+
+
+# Outcome for one file of a batch: queued, reused, not_found, over_quota or duplicate
+class TranscriptionBatchItem(BaseModel):
+    file_id: str
+    status: str
+    transcription_id: Optional[str] = None
+
+
 # For returning transcription status updates
 class TranscriptionStatus(BaseModel):
-    id: int
+    id: str
     status: str
     progress: Optional[float] = None  # 0.0 to 1.0 progress indicator
 
@@ -58,3 +81,46 @@ class TranscriptionResult(BaseModel):
     language: Optional[str] = None
     completed_at: datetime
     processing_duration: float
+
+
+# A single segment-level edit. Indexes refer to the segment list as left by
+# the previous operations in the same batch.
+class SegmentEdit(BaseModel):
+    op: Literal["replace", "insert", "delete"]
+    index: int
+    text: Optional[str] = None
+    start: Optional[float] = None
+    end: Optional[float] = None
+    speaker: Optional[str] = None
+
+    @validator("index")
+    def index_not_negative(cls, v):
+        if v < 0:
+            raise ValueError("Index must not be negative")
+        return v
+
+    @validator("text", always=True)
+    def insert_has_text(cls, v, values):
+        if values.get("op") == "insert" and v is None:
+            raise ValueError("Inserted segments need text")
+        return v
+
+
+# Batch of edits against a known version of a transcript
+class TranscriptPatch(BaseModel):
+    version: int
+    operations: List[SegmentEdit]
+
+    @validator("operations")
+    def operations_not_empty(cls, v):
+        if not v:
+            raise ValueError("At least one operation is required")
+        return v
+
+
+# Result of a saved edit
+class TranscriptPatchResult(BaseModel):
+    id: str
+    version: int
+    updated_at: datetime
+    segment_count: int
@@ -0,0 +1,351 @@
+"""
+Transcription backends.
+
+process_transcription hands media to the TranscriptionBackend chosen by
+TRANSCRIPTION_BACKEND:
+
+- "http" posts it to the transcription API at TRANSCRIPTION_API_URL through
+  one pooled, keep-alive HTTP client per process
+- "mock" returns a placeholder transcript without reading the media, for
+  development and offline benchmarks
+
+Every backend caps the requests a process has in flight to it, retries
+429s, 5xx responses and connection errors with jittered backoff, and stops
+calling a failing service for a while once its circuit breaker opens.
+"""
+import abc
+import asyncio
+import random
+import time
+from typing import Any, AsyncContextManager, AsyncIterator, BinaryIO, Callable, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.media import multipart_stream
+from app.services.normalize import available_format
+
+# How long an idle connection to the API is kept; jobs often arrive minutes apart
+KEEPALIVE_EXPIRY_SECONDS = 120.0
+
+backend_retries = metrics.counter(
+    "transcription_backend_retries_total", "Transcription backend requests retried after a failure"
+)
+backend_failures = metrics.counter(
+    "transcription_backend_failures_total", "Transcription backend requests that failed with a retryable error"
+)
+breaker_opens = metrics.counter(
+    "transcription_backend_circuit_opens_total", "Times a transcription backend circuit breaker opened"
+)
+
+
+class BackendError(Exception):
+    """Raised when a transcription backend fails a request."""
+
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        retryable: bool = False,
+        retry_after: Optional[float] = None,
+    ):
+        self.status_code = status_code
+        self.retryable = retryable
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class CircuitOpenError(BackendError):
+    """Raised instead of calling a backend whose circuit breaker is open."""
+
+    def __init__(self, backend: str, retry_after: float):
+        super().__init__(
+            f"Transcription backend {backend!r} is unavailable; retry in {retry_after:.0f}s",
+            retry_after=retry_after,
+        )
+
+
+class MediaUpload:
+    """
+    Media for one request: a seekable file with a known length, or a stream
+    of chunks sent with chunked transfer encoding.
+    """
+
+    def __init__(
+        self, filename: str, file: Optional[BinaryIO] = None, chunks: Optional[AsyncIterator[bytes]] = None
+    ):
+        self.filename = filename
+        self.file = file
+        self.chunks = chunks
+
+
+# Opens the media for one attempt. Streamed media cannot be replayed, so
+# each retry opens it again.
+MediaOpener = Callable[[], AsyncContextManager[MediaUpload]]
+
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter before retry number `attempt`."""
+    ceiling = min(
+        settings.TRANSCRIPTION_RETRY_MAX_SECONDS, settings.TRANSCRIPTION_RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+    )
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures, failing calls fast for
+    `reset_seconds`. Then a single trial call is let through: success
+    closes the circuit again and failure reopens it.
+    """
+
+    def __init__(self, name: str, threshold: int, reset_seconds: float):
+        self.name = name
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go ahead."""
+        state = self.state
+        if state == "open":
+            raise CircuitOpenError(self.name, self._opened_at + self.reset_seconds - time.monotonic())
+        if state == "half_open":
+            if self._trial_running:
+                raise CircuitOpenError(self.name, self.reset_seconds)
+            self._trial_running = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_running or (self._opened_at is None and self.failures >= self.threshold):
+            self._opened_at = time.monotonic()
+            breaker_opens.inc()
+        self._trial_running = False
+
+    def release(self) -> None:
+        """End a call that says nothing about the backend's health."""
+        self._trial_running = False
+
+
+class TranscriptionBackend(abc.ABC):
+    """
+    Base class of transcription backends. Subclasses implement
+    `_transcribe_once`, a single attempt that raises BackendError on
+    failure; `transcribe` adds the concurrency limit, retries and circuit
+    breaker around it.
+    """
+
+    name = "base"
+    # Whether the backend reads the media; the mock does not
+    reads_media = True
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        audio_format: Optional[str] = None,
+    ):
+        self._audio_format = audio_format
+        self.max_attempts = max_attempts or settings.TRANSCRIPTION_RETRY_ATTEMPTS
+        self.breaker = CircuitBreaker(
+            self.name, settings.TRANSCRIPTION_BREAKER_THRESHOLD, settings.TRANSCRIPTION_BREAKER_RESET_SECONDS
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency or settings.TRANSCRIPTION_MAX_CONCURRENCY)
+
+    @property
+    def audio_format(self) -> Optional[str]:
+        """Format media is normalized to before it is sent, if any."""
+        return available_format(self._audio_format) if self.reads_media else None
+
+    def settings_key(self) -> Dict[str, Any]:
+        """What identifies this backend's output, for the result cache."""
+        audio_format = self.audio_format
+        return {
+            "backend": self.name,
+            "audio": [
+                audio_format,
+                settings.TRANSCRIPTION_AUDIO_SAMPLE_RATE,
+                settings.TRANSCRIPTION_AUDIO_CHANNELS,
+                settings.TRANSCRIPTION_AUDIO_BITRATE,
+            ] if audio_format else None,
+        }
+
+    async def transcribe(self, open_media: MediaOpener) -> Dict[str, Any]:
+        """
+        Transcribe media, returning a result with `text` and `segments`.
+        Retryable failures are retried up to `max_attempts` times in all;
+        the slot is given up while waiting between attempts.
+        """
+        attempt = 1
+        while True:
+            self.breaker.before_call()
+            try:
+                async with self._semaphore:
+                    result = await self._transcribe_once(open_media)
+            except BackendError as e:
+                if not e.retryable:
+                    # The service answered; it is the request that was refused
+                    self.breaker.record_success()
+                    raise
+                backend_failures.inc()
+                self.breaker.record_failure()
+                if attempt >= self.max_attempts:
+                    raise
+                delay = retry_delay(attempt)
+                if e.retry_after is not None:
+                    delay = max(delay, min(e.retry_after, settings.TRANSCRIPTION_RETRY_MAX_SECONDS))
+                print(f"Transcription backend {self.name!r} failed (attempt {attempt}), retrying in {delay:.1f}s: {e}")
+                backend_retries.inc()
+                attempt += 1
+                await asyncio.sleep(delay)
+            except BaseException:
+                self.breaker.release()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    @abc.abstractmethod
+    async def _transcribe_once(self, open_media: MediaOpener) -> Dict[str, Any]:
+        """Make one attempt, raising BackendError on failure."""
+
+    async def aclose(self) -> None:
+        pass
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+class HttpTranscriptionBackend(TranscriptionBackend):
+    """
+    The transcription API at `url`, which takes the media as the `file` field
+    of a multipart POST and answers with JSON.
+    """
+
+    name = "http"
+
+    def __init__(self, url: str, api_key: str, **kwargs: Any):
+        self.url = url
+        self.api_key = api_key
+        self._client: Optional[httpx.AsyncClient] = None
+        super().__init__(**kwargs)
+
+    def settings_key(self) -> Dict[str, Any]:
+        return {**super().settings_key(), "api_url": self.url}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                limits=httpx.Limits(
+                    max_connections=settings.TRANSCRIPTION_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.TRANSCRIPTION_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                timeout=httpx.Timeout(settings.TRANSCRIPTION_HTTP_TIMEOUT, connect=10.0),
+                http2=settings.TRANSCRIPTION_HTTP2,
+            )
+        return self._client
+
+    async def _transcribe_once(self, open_media: MediaOpener) -> Dict[str, Any]:
+        client = self._get_client()
+        async with open_media() as media:
+            try:
+                if media.file is not None:
+                    response = await client.post(self.url, files={"file": (media.filename, media.file)})
+                else:
+                    content_type, body = multipart_stream("file", media.filename, media.chunks)
+                    response = await client.post(self.url, content=body, headers={"Content-Type": content_type})
+            except httpx.TransportError as e:
+                raise BackendError(f"Transcription API unreachable: {e!r}", retryable=True) from e
+
+        if response.status_code != 200:
+            raise BackendError(
+                f"Transcription API error {response.status_code}: {response.text[:500]}",
+                status_code=response.status_code,
+                retryable=response.status_code == 429 or response.status_code >= 500,
+                retry_after=_retry_after(response),
+            )
+        return response.json()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+
+def placeholder_result() -> Dict[str, Any]:
+    return {
+        "text": "This is a placeholder transcription. The real transcription would be generated by an AI service.",
+        "segments": [
+            {"start": 0, "end": 5, "text": "This is a placeholder transcription."},
+            {"start": 5, "end": 10, "text": "The real transcription would be generated by an AI service."},
+        ],
+    }
+
+
+class MockTranscriptionBackend(TranscriptionBackend):
+    """
+    Returns a placeholder transcript after MOCK_TRANSCRIPTION_LATENCY_SECONDS,
+    failing MOCK_TRANSCRIPTION_FAILURE_RATE of attempts with a retryable
+    error. The media is never opened.
+    """
+
+    name = "mock"
+    reads_media = False
+
+    async def _transcribe_once(self, open_media: MediaOpener) -> Dict[str, Any]:
+        await asyncio.sleep(settings.MOCK_TRANSCRIPTION_LATENCY_SECONDS)
+        if random.random() < settings.MOCK_TRANSCRIPTION_FAILURE_RATE:
+            raise BackendError("Simulated transcription failure", status_code=503, retryable=True)
+        return placeholder_result()
+
+
+_backend: Optional[TranscriptionBackend] = None
+
+
+def get_transcription_backend() -> TranscriptionBackend:
+    """Return this process's transcription backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        name = settings.TRANSCRIPTION_BACKEND
+        if name is None:
+            name = "http" if settings.TRANSCRIPTION_API_URL and settings.TRANSCRIPTION_API_KEY else "mock"
+        if name == "http":
+            if not settings.TRANSCRIPTION_API_URL:
+                raise ValueError("TRANSCRIPTION_API_URL must be set to use the http transcription backend")
+            _backend = HttpTranscriptionBackend(
+                settings.TRANSCRIPTION_API_URL,
+                settings.TRANSCRIPTION_API_KEY or "",
+                audio_format=settings.TRANSCRIPTION_HTTP_AUDIO_FORMAT,
+            )
+        else:
+            _backend = MockTranscriptionBackend()
+    return _backend
+
+
+async def close_transcription_backend() -> None:
+    global _backend
+    if _backend is not None:
+        backend, _backend = _backend, None
+        await backend.aclose()
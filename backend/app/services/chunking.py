@@ -0,0 +1,241 @@
+"""
+Silence-aware chunking of long media for parallel transcription.
+
+Long recordings are split near silences into chunks of about
+TRANSCRIPTION_CHUNK_SECONDS, the chunks are transcribed concurrently, and
+their segments are merged back onto the original timeline.
+"""
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.normalize import normalized_filename, output_args, worth_normalizing
+
+_SILENCE_START = re.compile(r"silence_start: (-?[\d.]+)")
+_SILENCE_END = re.compile(r"silence_end: (-?[\d.]+)")
+
+
+def ffmpeg_available() -> bool:
+    return bool(shutil.which(settings.FFMPEG_PATH) and shutil.which(settings.FFPROBE_PATH))
+
+
+async def _run(*args: str) -> Tuple[bytes, bytes]:
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise Exception(f"{os.path.basename(args[0])} failed: {stderr.decode(errors='replace')[-500:]}")
+    return stdout, stderr
+
+
+def worth_splitting(duration: float) -> bool:
+    """Whether media of this length is long enough to transcribe in chunks."""
+    return duration > settings.TRANSCRIPTION_CHUNK_SECONDS * 1.5
+
+
+async def probe_duration(path: str) -> float:
+    stdout, _ = await _run(
+        settings.FFPROBE_PATH, "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        path,
+    )
+    return float(stdout.strip())
+
+
+def parse_silences(ffmpeg_log: str) -> List[Tuple[float, float]]:
+    """Parse the (start, end) intervals reported by ffmpeg's silencedetect filter."""
+    silences = []
+    start = None
+    for line in ffmpeg_log.splitlines():
+        match = _SILENCE_START.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = _SILENCE_END.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    return silences
+
+
+async def detect_silences(path: str) -> List[Tuple[float, float]]:
+    # Downsampled mono is plenty for energy detection and much faster
+    _, stderr = await _run(
+        settings.FFMPEG_PATH, "-hide_banner", "-nostats", "-i", path,
+        "-vn", "-ac", "1",
+        "-af", f"aresample=8000,silencedetect=noise={settings.SILENCE_THRESHOLD_DB}dB:d={settings.SILENCE_MIN_SECONDS}",
+        "-f", "null", "-",
+    )
+    return parse_silences(stderr.decode(errors="replace"))
+
+
+def choose_split_points(
+    duration: float,
+    silences: List[Tuple[float, float]],
+    chunk_seconds: float,
+    search_seconds: float,
+) -> List[float]:
+    """
+    Pick cut times about `chunk_seconds` apart. Each cut is placed in the
+    middle of the longest silence within `search_seconds` before the target
+    time, or exactly at the target if there is none.
+    """
+    cuts = []
+    position = 0.0
+    while duration - position > chunk_seconds:
+        target = position + chunk_seconds
+        candidates = [
+            (end - start, (start + end) / 2)
+            for start, end in silences
+            if target - search_seconds <= (start + end) / 2 <= target
+            and (start + end) / 2 > position
+        ]
+        cut = max(candidates)[1] if candidates else target
+        cuts.append(cut)
+        position = cut
+    return cuts
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", "", text.lower()).split())
+
+
+def merge_chunk_results(chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge per-chunk results into a single transcript.
+
+    Each chunk is a dict with `offset` (where its audio starts on the original
+    timeline), `start`/`end` (the part of the timeline it owns) and the
+    backend `result`. Segments are shifted by the offset and kept only by the
+    chunk that owns their midpoint, so overlapping audio at seams is not
+    transcribed twice; repeated text straddling a seam is dropped as well.
+    """
+    segments: List[Dict[str, Any]] = []
+    texts = []
+    for chunk in chunks:
+        result = chunk["result"]
+        chunk_segments = result.get("segments") or []
+        if not chunk_segments:
+            if result.get("text"):
+                texts.append(result["text"].strip())
+            continue
+
+        for segment in chunk_segments:
+            start = segment["start"] + chunk["offset"]
+            end = segment["end"] + chunk["offset"]
+            midpoint = (start + end) / 2
+            if not chunk["start"] <= midpoint < chunk["end"]:
+                continue
+            if (
+                segments
+                and start < segments[-1]["end"] + settings.TRANSCRIPTION_CHUNK_OVERLAP_SECONDS
+                and _normalize(segment.get("text", "")) == _normalize(segments[-1].get("text", ""))
+            ):
+                continue
+            segments.append({**segment, "start": round(start, 3), "end": round(end, 3)})
+
+    if segments:
+        text = " ".join(segment.get("text", "").strip() for segment in segments)
+    else:
+        text = " ".join(texts)
+    return {"text": text, "segments": segments}
+
+
+async def extract_chunk(path: str, start: float, end: float, output_path: str, format_name: str = "flac") -> None:
+    await _run(
+        settings.FFMPEG_PATH, "-v", "error", "-y",
+        "-ss", f"{start:.3f}", "-i", path, "-t", f"{end - start:.3f}",
+        *output_args(format_name),
+        output_path,
+    )
+
+
+async def transcribe_in_chunks(
+    path: str,
+    transcribe: Callable[[str], Awaitable[Dict[str, Any]]],
+    format_name: Optional[str] = None,
+    parallelism: Optional[int] = None,
+    on_progress: Optional[Callable[[float], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """
+    Transcribe a local media file, splitting it at silences and running up
+    to `parallelism` chunks at once when it is long enough to benefit.
+    `transcribe` takes the path of a media file and returns a result with
+    `text` and `segments`. `on_progress` is awaited with the fraction of
+    chunks done each time one finishes. Chunks are encoded as `format_name`
+    (FLAC if None); media too short to split is sent as it is unless a
+    format is given.
+    """
+    duration = await probe_duration(path)
+    if not worth_splitting(duration):
+        if format_name is None or not worth_normalizing(os.path.getsize(path), duration, format_name):
+            return await transcribe(path)
+        with tempfile.TemporaryDirectory() as work_dir:
+            audio_path = os.path.join(work_dir, normalized_filename("audio", format_name))
+            await extract_chunk(path, 0.0, duration, audio_path, format_name)
+            return await transcribe(audio_path)
+
+    silences = await detect_silences(path)
+    cuts = choose_split_points(
+        duration, silences, settings.TRANSCRIPTION_CHUNK_SECONDS, settings.TRANSCRIPTION_CHUNK_SEARCH_SECONDS
+    )
+    bounds = list(zip([0.0] + cuts, cuts + [duration]))
+    overlap = settings.TRANSCRIPTION_CHUNK_OVERLAP_SECONDS
+    parallelism = parallelism or settings.TRANSCRIPTION_CHUNK_PARALLELISM
+    # Chunks are encoded ahead of their turn, one per core, so encoding the
+    # next round overlaps the API calls instead of holding their slots.
+    # Encoded chunks waiting for a slot are bounded to keep the temp files few.
+    cores = os.cpu_count() or 1
+    transcribe_slots = asyncio.Semaphore(parallelism)
+    encode_slots = asyncio.Semaphore(cores)
+    pending_slots = asyncio.Semaphore(parallelism + cores)
+    chunk_format = format_name or "flac"
+    finished = 0
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        async def run_chunk(index: int, start: float, end: float) -> Dict[str, Any]:
+            nonlocal finished
+            offset = max(0.0, start - overlap)
+            chunk_path = os.path.join(work_dir, normalized_filename(f"chunk-{index}", chunk_format))
+            async with pending_slots:
+                async with encode_slots:
+                    await extract_chunk(path, offset, min(duration, end + overlap), chunk_path, chunk_format)
+                try:
+                    async with transcribe_slots:
+                        result = await transcribe(chunk_path)
+                finally:
+                    os.remove(chunk_path)
+            if on_progress is not None:
+                finished += 1
+                # Progress is informational; never fail the job over it
+                try:
+                    await on_progress(finished / len(bounds))
+                except Exception as e:
+                    print(f"Error reporting progress: {e}")
+            # The first and last chunks own everything before and after them
+            return {
+                "offset": offset,
+                "start": start if index > 0 else float("-inf"),
+                "end": end if index < len(bounds) - 1 else float("inf"),
+                "result": result,
+            }
+
+        tasks = [
+            asyncio.create_task(run_chunk(index, start, end)) for index, (start, end) in enumerate(bounds)
+        ]
+        try:
+            chunks = await asyncio.gather(*tasks)
+        except BaseException:
+            # Stop the other chunks before their files are deleted
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    return merge_chunk_results(chunks)
@@ -0,0 +1,109 @@
+import json
+import os
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services.segments import PackedSegments
+
+# Segments rendered per yielded chunk; large enough that the response is
+# written in a few KB pieces rather than line by line
+SEGMENTS_PER_CHUNK = 200
+
+
+def _timestamp(seconds: float, separator: str) -> str:
+    millis = int(round(max(seconds, 0.0) * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def _cue_text(packed: PackedSegments, index: int) -> str:
+    text = packed.text[packed.offsets[index]:packed.offsets[index + 1]].strip()
+    if packed.speaker_ids is not None and packed.speakers[packed.speaker_ids[index]]:
+        return f"{packed.speakers[packed.speaker_ids[index]]}: {text}"
+    return text
+
+
+def _chunked(packed: PackedSegments, render: Callable[[int], str]) -> Iterator[str]:
+    for first in range(0, len(packed), SEGMENTS_PER_CHUNK):
+        last = min(first + SEGMENTS_PER_CHUNK, len(packed))
+        yield "".join(render(index) for index in range(first, last))
+
+
+def render_srt(packed: PackedSegments) -> Iterator[str]:
+    starts, ends = packed.starts, packed.ends
+    return _chunked(packed, lambda index: (
+        f"{index + 1}\n"
+        f"{_timestamp(starts[index], ',')} --> {_timestamp(ends[index], ',')}\n"
+        f"{_cue_text(packed, index)}\n\n"
+    ))
+
+
+def render_vtt(packed: PackedSegments) -> Iterator[str]:
+    yield "WEBVTT\n\n"
+    starts, ends = packed.starts, packed.ends
+    yield from _chunked(packed, lambda index: (
+        f"{_timestamp(starts[index], '.')} --> {_timestamp(ends[index], '.')}\n"
+        f"{_cue_text(packed, index)}\n\n"
+    ))
+
+
+def render_txt(packed: PackedSegments) -> Iterator[str]:
+    return _chunked(packed, lambda index: _cue_text(packed, index) + "\n")
+
+
+def render_json(packed: PackedSegments) -> Iterator[str]:
+    yield '{"segments": ['
+    yield from _chunked(packed, lambda index: ("," if index else "") + json.dumps(packed.segment(index)))
+    yield "]}\n"
+
+
+# Renderer, media type and file extension for each export format
+EXPORT_FORMATS: Dict[str, Tuple[Callable[[PackedSegments], Iterator[str]], str, str]] = {
+    "srt": (render_srt, "application/x-subrip", "srt"),
+    "vtt": (render_vtt, "text/vtt", "vtt"),
+    "txt": (render_txt, "text/plain", "txt"),
+    "json": (render_json, "application/json", "json"),
+}
+
+
+def content_disposition(original_filename: str, extension: str) -> str:
+    """Attachment header naming the export after the uploaded file."""
+    filename = f"{os.path.splitext(original_filename)[0]}.{extension}"
+    fallback = "".join(c if " " <= c <= "~" and c not in '"\\' else "_" for c in filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
+# Rendered exports, keyed on (transcription id, updated_at, format). Only
+# exports up to EXPORT_CACHE_MAX_BYTES are kept, so caching never holds a
+# whole very long transcript in memory.
+export_cache: TTLCache[bytes] = TTLCache(
+    max_size=settings.EXPORT_CACHE_SIZE,
+    ttl_seconds=settings.EXPORT_CACHE_SECONDS,
+    name="export",
+)
+
+
+def stream_export(cache_key: Tuple[str, str, str], packed: PackedSegments) -> Iterator[bytes]:
+    """
+    Encoded export chunks for `packed` in the format named by the key. The
+    rendered export is cached once it has been sent in full, if it is small
+    enough.
+    """
+    render = EXPORT_FORMATS[cache_key[2]][0]
+    kept: Optional[List[bytes]] = []
+    size = 0
+    for chunk in render(packed):
+        data = chunk.encode("utf-8")
+        if kept is not None:
+            size += len(data)
+            if size > settings.EXPORT_CACHE_MAX_BYTES:
+                kept = None
+            else:
+                kept.append(data)
+        yield data
+    if kept is not None:
+        export_cache.set(cache_key, b"".join(kept))
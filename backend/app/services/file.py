@@ -0,0 +1,52 @@
+from typing import Any, Dict, List, Optional
+
+from app.core.supabase import create_file_record, execute, get_supabase_client
+
+# IDs per `in` filter, keeping request URLs well under proxy limits
+IN_QUERY_CHUNK_SIZE = 200
+
+
+class FileRepository:
+    """
+    Non-blocking access to the `files` table.
+    """
+
+    async def get_file(self, file_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get a file by ID, optionally restricted to its owner."""
+        query = get_supabase_client().table("files").select("*").eq("id", file_id)
+        if user_id is not None:
+            query = query.eq("user_id", user_id)
+        response = await execute(query.limit(1))
+        return response.data[0] if response.data else None
+
+    async def get_files(self, file_ids: List[str], user_id: str, columns: str = "*") -> List[Dict[str, Any]]:
+        """Get those of the given files that belong to a user, in as few queries as possible."""
+        files = []
+        for first in range(0, len(file_ids), IN_QUERY_CHUNK_SIZE):
+            response = await execute(
+                get_supabase_client()
+                .table("files")
+                .select(columns)
+                .eq("user_id", user_id)
+                .in_("id", file_ids[first:first + IN_QUERY_CHUNK_SIZE])
+            )
+            files.extend(response.data)
+        return files
+
+    async def create_file(
+        self,
+        user_id: str,
+        filename: str,
+        size: int,
+        storage_path: str,
+        content_sha256: Optional[str] = None,
+        media: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        return await create_file_record(user_id, filename, size, storage_path, content_sha256, media)
+
+    async def update_file(self, file_id: str, values: Dict[str, Any]) -> None:
+        """Record what a worker learned about a file, such as its hash or duration."""
+        await execute(get_supabase_client().table("files").update(values).eq("id", file_id))
+
+
+file_repository = FileRepository()
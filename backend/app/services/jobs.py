@@ -0,0 +1,147 @@
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.supabase import execute, get_supabase_client
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Exponential backoff with full jitter for a job that has failed
+    `attempts` times.
+    """
+    ceiling = min(settings.JOB_RETRY_MAX_SECONDS, settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def user_weight(user: Dict[str, Any]) -> float:
+    """
+    A user's share of the workers relative to other users: admins and users
+    with more than the free quota get SCHEDULER_PAID_WEIGHT.
+    """
+    quota_minutes = user.get("quota_minutes") or settings.DEFAULT_FREE_MINUTES
+    if user.get("is_admin") or quota_minutes > settings.DEFAULT_FREE_MINUTES:
+        return settings.SCHEDULER_PAID_WEIGHT
+    return 1.0
+
+
+class JobQueue:
+    """
+    Durable transcription job queue stored in the `transcription_jobs` table.
+
+    Workers claim jobs with a lease that they keep alive with heartbeats; a
+    job whose lease expires counts as a failed attempt and is retried with
+    backoff by another worker. Claims share the
+    workers fairly between users, by weight, and cap the jobs any one user
+    has running.
+    """
+
+    def _table(self):
+        return get_supabase_client().table("transcription_jobs")
+
+    async def enqueue(
+        self,
+        transcription_id: str,
+        file_id: str,
+        user_id: str,
+        weight: float = 1.0,
+        duration_seconds: Optional[float] = None,
+        reuse_result: bool = True,
+    ) -> Dict[str, Any]:
+        jobs = await self.enqueue_many([{
+            "transcription_id": transcription_id,
+            "file_id": file_id,
+            "user_id": user_id,
+            "weight": weight,
+            "duration_seconds": duration_seconds,
+            "reuse_result": reuse_result,
+        }])
+        return jobs[0]
+
+    async def enqueue_many(self, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Insert jobs (transcription_id, file_id, user_id, and optionally the
+        user's weight, the file's duration_seconds and whether an earlier
+        result may be reused) in a single statement.
+        """
+        # Every row needs the same keys for a bulk insert
+        rows = [
+            {
+                "weight": 1.0,
+                "duration_seconds": None,
+                "reuse_result": True,
+                **job,
+                "max_attempts": settings.JOB_MAX_ATTEMPTS,
+            }
+            for job in jobs
+        ]
+        response = await execute(self._table().insert(rows))
+        return response.data
+
+    async def claim(self, worker_id: str, limit: int) -> List[Dict[str, Any]]:
+        response = await execute(get_supabase_client().rpc("claim_transcription_jobs", {
+            "p_worker_id": worker_id,
+            "p_limit": limit,
+            "p_lease_seconds": settings.JOB_LEASE_SECONDS,
+            "p_user_limit": settings.SCHEDULER_USER_MAX_RUNNING,
+            "p_short_seconds": settings.SCHEDULER_SHORT_FILE_SECONDS,
+            "p_retry_base_seconds": settings.JOB_RETRY_BASE_SECONDS,
+            "p_retry_max_seconds": settings.JOB_RETRY_MAX_SECONDS,
+        }))
+        return response.data or []
+
+    async def backlog(self) -> int:
+        """Number of queued jobs, including ones waiting to be retried."""
+        response = await execute(self._table().select("id", count="exact").eq("status", "queued").limit(1))
+        return response.count or 0
+
+    async def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Extend a job's lease. Returns False if the worker has lost the job."""
+        response = await execute(get_supabase_client().rpc("heartbeat_transcription_job", {
+            "p_job_id": job_id,
+            "p_worker_id": worker_id,
+            "p_lease_seconds": settings.JOB_LEASE_SECONDS,
+        }))
+        return bool(response.data)
+
+    async def complete(self, job_id: str, worker_id: str) -> None:
+        await execute(
+            self._table()
+            .update({
+                "status": "completed",
+                "locked_by": None,
+                "lease_expires_at": None,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            })
+            .eq("id", job_id)
+            .eq("locked_by", worker_id)
+        )
+
+    async def retry_or_fail(self, job: Dict[str, Any], worker_id: str, error: str) -> bool:
+        """
+        Put a failed job back on the queue with backoff, or mark it failed
+        once it has used all its attempts. Returns True if it will be retried.
+        """
+        now = datetime.now(timezone.utc)
+        retry = job["attempts"] < job["max_attempts"]
+        update = {
+            "status": "queued" if retry else "failed",
+            "locked_by": None,
+            "lease_expires_at": None,
+            "last_error": error,
+            "updated_at": now.isoformat(),
+        }
+        if retry:
+            update["run_after"] = (now + timedelta(seconds=retry_delay(job["attempts"]))).isoformat()
+
+        await execute(
+            self._table()
+            .update(update)
+            .eq("id", job["id"])
+            .eq("locked_by", worker_id)
+        )
+        return retry
+
+
+job_queue = JobQueue()
@@ -0,0 +1,71 @@
+import mimetypes
+import os
+import uuid
+from contextlib import asynccontextmanager
+from tempfile import NamedTemporaryFile, SpooledTemporaryFile
+from typing import AsyncIterator, BinaryIO, Tuple
+
+from app.core.config import settings
+from app.core.storage import iter_object
+
+
+@asynccontextmanager
+async def spool_object(path: str) -> AsyncIterator[BinaryIO]:
+    """
+    Stream a storage object into a spooled temporary file and yield it,
+    rewound. Small files stay in memory; anything above
+    MEDIA_SPOOL_MAX_MEMORY rolls over to disk, so memory use is bounded.
+    """
+    with SpooledTemporaryFile(max_size=settings.MEDIA_SPOOL_MAX_MEMORY) as spool:
+        async for chunk in iter_object(path):
+            spool.write(chunk)
+        spool.seek(0)
+        yield spool
+
+
+@asynccontextmanager
+async def download_to_file(path: str) -> AsyncIterator[str]:
+    """
+    Stream a storage object to a temporary file on disk and yield its path,
+    for tools such as ffmpeg that need a seekable local file.
+    """
+    with NamedTemporaryFile(suffix=os.path.splitext(path)[1], delete=False) as temp_file:
+        temp_path = temp_file.name
+        try:
+            async for chunk in iter_object(path):
+                temp_file.write(chunk)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    try:
+        yield temp_path
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def multipart_stream(
+    field: str, filename: str, chunks: AsyncIterator[bytes]
+) -> Tuple[str, AsyncIterator[bytes]]:
+    """
+    Build a multipart/form-data body around a stream of file chunks.
+
+    Returns the Content-Type header and an async body generator that can be
+    passed to httpx as `content=`. The body is sent with chunked transfer
+    encoding and cannot be replayed.
+    """
+    boundary = uuid.uuid4().hex
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    safe_filename = filename.replace('"', "%22")
+
+    async def body() -> AsyncIterator[bytes]:
+        yield (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{safe_filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+        async for chunk in chunks:
+            yield chunk
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    return f"multipart/form-data; boundary={boundary}", body()
@@ -0,0 +1,118 @@
+"""
+Audio normalization ahead of the transcription API.
+
+Recognizers work on mono 16 kHz audio, so uploading the original media
+(often 48 kHz stereo, or a whole video) mostly spends bandwidth on data the
+API throws away. ffmpeg drops everything but the first audio track,
+downmixes, resamples and re-encodes it in a compact codec, streaming from
+its input straight into the upload.
+"""
+import asyncio
+import os
+import shutil
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+# ffmpeg muxer, encoder options and file extension of each output format
+AUDIO_FORMATS: Dict[str, Tuple[str, Tuple[str, ...], str]] = {
+    "flac": ("flac", ("-c:a", "flac"), "flac"),
+    "opus": ("ogg", ("-c:a", "libopus", "-application", "voip"), "ogg"),
+    "mp3": ("mp3", ("-c:a", "libmp3lame"), "mp3"),
+    "wav": ("wav", ("-c:a", "pcm_s16le"), "wav"),
+}
+# Formats encoded at TRANSCRIPTION_AUDIO_BITRATE
+LOSSY_FORMATS = {"opus", "mp3"}
+# Estimated FLAC size as a fraction of the PCM it encodes
+FLAC_RATIO = 0.6
+
+
+def available_format(format_name: Optional[str]) -> Optional[str]:
+    """`format_name` if media can be normalized to it, or None if it is sent unchanged."""
+    if format_name and shutil.which(settings.FFMPEG_PATH):
+        return format_name
+    return None
+
+
+def output_args(format_name: str) -> List[str]:
+    """ffmpeg output options producing normalized audio in `format_name`."""
+    muxer, codec_args, _ = AUDIO_FORMATS[format_name]
+    args = [
+        "-map", "0:a:0", "-map_metadata", "-1", "-vn", "-sn", "-dn",
+        "-ac", str(settings.TRANSCRIPTION_AUDIO_CHANNELS),
+        "-ar", str(settings.TRANSCRIPTION_AUDIO_SAMPLE_RATE),
+        *codec_args,
+    ]
+    if format_name in LOSSY_FORMATS:
+        args += ["-b:a", settings.TRANSCRIPTION_AUDIO_BITRATE]
+    return args + ["-f", muxer]
+
+
+def _bitrate(value: str) -> float:
+    """Parse an ffmpeg bitrate such as "32k" into bits per second."""
+    multiplier = {"k": 1e3, "m": 1e6}.get(value[-1:].lower(), 1)
+    return float(value.rstrip("kKmM")) * multiplier
+
+
+def output_bitrate(format_name: str) -> float:
+    """Approximate bits per second of normalized audio in `format_name`."""
+    if format_name in LOSSY_FORMATS:
+        return _bitrate(settings.TRANSCRIPTION_AUDIO_BITRATE)
+    pcm = settings.TRANSCRIPTION_AUDIO_SAMPLE_RATE * settings.TRANSCRIPTION_AUDIO_CHANNELS * 16
+    # FLAC typically halves 16-bit speech; estimate on the high side
+    return pcm * FLAC_RATIO if format_name == "flac" else pcm
+
+
+def worth_normalizing(size: Optional[int], duration: Optional[float], format_name: str) -> bool:
+    """
+    Whether normalizing media of this size and duration makes the upload
+    smaller. Compressed audio such as a 128 kbps MP3 is already smaller than
+    lossless 16 kHz output and is better sent as it is. Media of unknown
+    duration is always normalized.
+    """
+    if not size or not duration:
+        return True
+    return size * 8 / duration > output_bitrate(format_name)
+
+
+def normalized_filename(filename: str, format_name: str) -> str:
+    return f"{os.path.splitext(filename)[0]}.{AUDIO_FORMATS[format_name][2]}"
+
+
+@asynccontextmanager
+async def normalized_stream(source: str, format_name: str) -> AsyncIterator[AsyncIterator[bytes]]:
+    """
+    Run ffmpeg over `source`, a local path or URL, and yield the normalized
+    audio as an async iterator of chunks read from ffmpeg as it produces
+    them. ffmpeg fetches URLs itself, with range requests where it needs to
+    seek, so nothing is written to disk.
+
+    The iterator raises once it is exhausted if ffmpeg failed, so a broken
+    conversion aborts the upload it feeds rather than sending a truncated
+    file.
+    """
+    process = await asyncio.create_subprocess_exec(
+        settings.FFMPEG_PATH, "-v", "error", "-nostdin", "-i", source, *output_args(format_name), "pipe:1",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    # Drained alongside stdout so a chatty ffmpeg can never block on it
+    stderr = asyncio.create_task(process.stderr.read())
+
+    async def chunks() -> AsyncIterator[bytes]:
+        while True:
+            chunk = await process.stdout.read(settings.MEDIA_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+        if await process.wait() != 0:
+            raise Exception(f"ffmpeg failed: {(await stderr).decode(errors='replace')[-500:]}")
+
+    try:
+        yield chunks()
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        await stderr
@@ -0,0 +1,454 @@
+"""
+Header-only media probing.
+
+Reads just the container headers and index structures of WAV, MP3, M4A/MP4,
+Ogg (Vorbis/Opus), FLAC and WebM/Matroska media to find the duration,
+sample rate and channel count, without decoding audio or downloading whole
+objects. A probe of a stored object typically costs one or two range
+requests.
+"""
+import struct
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.storage import read_object_range
+
+# Reads are rounded out to blocks of this size, so parsers can ask for a
+# few bytes at a time without a request for each
+BLOCK_SIZE = 64 * 1024
+
+# Largest header structure read in full (an MP4 `moov` atom, a Matroska
+# Info or Tracks element)
+MAX_HEADER_BYTES = 16 * 1024 * 1024
+
+
+class MediaReader:
+    """
+    Random access to media through an async `fetch(offset, length)`, with
+    the blocks read so far kept in memory.
+    """
+
+    def __init__(self, fetch: Callable[[int, int], Awaitable[bytes]], size: int):
+        self._fetch = fetch
+        self.size = size
+        self._blocks: Dict[int, bytes] = {}
+
+    async def read(self, offset: int, length: int) -> bytes:
+        length = max(0, min(length, self.size - offset))
+        if length > BLOCK_SIZE * 4:
+            return await self._fetch(offset, length)
+        first, last = offset // BLOCK_SIZE, (offset + length - 1) // BLOCK_SIZE
+        missing = [block for block in range(first, last + 1) if block not in self._blocks]
+        if missing:
+            data = await self._fetch(missing[0] * BLOCK_SIZE, (missing[-1] - missing[0] + 1) * BLOCK_SIZE)
+            for block in missing:
+                start = (block - missing[0]) * BLOCK_SIZE
+                self._blocks[block] = data[start:start + BLOCK_SIZE]
+        data = b"".join(self._blocks[block] for block in range(first, last + 1))
+        start = offset - first * BLOCK_SIZE
+        return data[start:start + length]
+
+
+def _media_info(fmt: str, duration: Optional[float], sample_rate: Optional[int], channels: Optional[int]) -> Dict[str, Any]:
+    return {
+        "media_format": fmt,
+        "duration_seconds": round(duration, 3) if duration is not None else None,
+        "sample_rate": sample_rate,
+        "channels": channels,
+    }
+
+
+# WAV
+
+async def _probe_wav(reader: MediaReader) -> Optional[Dict[str, Any]]:
+    offset = 12
+    channels = sample_rate = byte_rate = None
+    while offset + 8 <= reader.size:
+        chunk_id, chunk_size = struct.unpack("<4sI", await reader.read(offset, 8))
+        if chunk_id == b"fmt ":
+            _, channels, sample_rate, byte_rate = struct.unpack("<HHII", await reader.read(offset + 8, 12))
+        elif chunk_id == b"data" and channels is not None:
+            # Streamed WAVs may leave the size unset; the data runs to the end
+            if chunk_size in (0, 0xFFFFFFFF) or offset + 8 + chunk_size > reader.size:
+                chunk_size = reader.size - offset - 8
+            duration = chunk_size / byte_rate if byte_rate else None
+            return _media_info("wav", duration, sample_rate, channels)
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+# MP3
+
+_MP3_BITRATES = {
+    # (MPEG-1, layer) and (MPEG-2/2.5, layer), in kbit/s by bitrate index
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def _parse_mp3_header(header: bytes) -> Optional[Tuple[int, int, int, int, int]]:
+    """(version bits, layer, bitrate in kbit/s, sample rate, channels) of a frame header."""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    b1, b2, b3 = header[1], header[2], header[3]
+    version_bits, layer_bits = (b1 >> 3) & 3, (b1 >> 1) & 3
+    bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    layer = 4 - layer_bits
+    bitrate = _MP3_BITRATES[(1 if version_bits == 3 else 2, layer)][bitrate_index]
+    sample_rate = _MP3_SAMPLE_RATES[version_bits][rate_index]
+    channels = 1 if (b3 >> 6) == 3 else 2
+    return version_bits, layer, bitrate, sample_rate, channels
+
+
+async def _probe_mp3(reader: MediaReader) -> Optional[Dict[str, Any]]:
+    start = 0
+    head = await reader.read(0, 10)
+    if head[:3] == b"ID3":
+        # ID3v2 tag size is a 28-bit "syncsafe" integer, plus an optional footer
+        size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        start = 10 + size + (10 if head[5] & 0x10 else 0)
+
+    window = await reader.read(start, BLOCK_SIZE)
+    for index in range(len(window) - 4):
+        if window[index] != 0xFF or (window[index + 1] & 0xE0) != 0xE0:
+            continue
+        parsed = _parse_mp3_header(window[index:index + 4])
+        if parsed is None:
+            continue
+        version_bits, layer, bitrate, sample_rate, channels = parsed
+        frame_offset = start + index
+        samples_per_frame = {1: 384, 2: 1152, 3: 1152 if version_bits == 3 else 576}[layer]
+
+        # A sync word can turn up by chance; a real frame is whole and is
+        # followed by another one, unless it is the last
+        padding = (window[index + 2] >> 1) & 1
+        if layer == 1:
+            frame_length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+        else:
+            frame_length = samples_per_frame // 8 * bitrate * 1000 // sample_rate + padding
+        next_offset = frame_offset + frame_length
+        if next_offset > reader.size:
+            continue
+        if next_offset < reader.size and _parse_mp3_header(await reader.read(next_offset, 4)) is None:
+            continue
+
+        # A Xing/Info or VBRI header in the first frame gives the frame count
+        frame = await reader.read(frame_offset, 200)
+        if version_bits == 3:
+            side_info = 17 if channels == 1 else 32
+        else:
+            side_info = 9 if channels == 1 else 17
+        frames = None
+        xing = frame[4 + side_info:4 + side_info + 12]
+        if xing[:4] in (b"Xing", b"Info") and struct.unpack(">I", xing[4:8])[0] & 1:
+            frames = struct.unpack(">I", xing[8:12])[0]
+        elif frame[36:40] == b"VBRI":
+            frames = struct.unpack(">I", frame[50:54])[0]
+
+        if frames:
+            duration = frames * samples_per_frame / sample_rate
+        else:
+            # Constant bitrate: the audio size gives the duration
+            duration = (reader.size - frame_offset) * 8 / (bitrate * 1000)
+        return _media_info("mp3", duration, sample_rate, channels)
+    return None
+
+
+# MP4 / M4A
+
+async def _atoms(reader: MediaReader, start: int, end: int):
+    """Yield (type, payload offset, payload size) for each atom in a range."""
+    offset = start
+    while offset + 8 <= end:
+        size, kind = struct.unpack(">I4s", await reader.read(offset, 8))
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", await reader.read(offset + 8, 8))[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield kind, offset + header, size - header
+        offset += size
+
+
+def _buffer_atoms(data: bytes, start: int = 0, end: Optional[int] = None):
+    """_atoms for an atom tree already in memory."""
+    offset, end = start, len(data) if end is None else end
+    while offset + 8 <= end:
+        size, kind = struct.unpack(">I4s", data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield kind, offset + header, size - header
+        offset += size
+
+
+def _child(data: bytes, start: int, size: int, kind: bytes) -> Optional[Tuple[int, int]]:
+    for child_kind, child_start, child_size in _buffer_atoms(data, start, start + size):
+        if child_kind == kind:
+            return child_start, child_size
+    return None
+
+
+async def _probe_mp4(reader: MediaReader) -> Optional[Dict[str, Any]]:
+    # `moov` may come before or after the media data; only atom headers
+    # are read until it is found
+    async for kind, start, size in _atoms(reader, 0, reader.size):
+        if kind == b"moov":
+            if size > MAX_HEADER_BYTES:
+                return None
+            moov = await reader.read(start, size)
+            break
+    else:
+        return None
+
+    duration = sample_rate = channels = None
+    mvhd = _child(moov, 0, len(moov), b"mvhd")
+    if mvhd:
+        start, _ = mvhd
+        if moov[start] == 1:
+            timescale, length = struct.unpack(">IQ", moov[start + 20:start + 32])
+        else:
+            timescale, length = struct.unpack(">II", moov[start + 12:start + 20])
+        duration = length / timescale if timescale else None
+
+    for kind, trak_start, trak_size in _buffer_atoms(moov):
+        if kind != b"trak":
+            continue
+        mdia = _child(moov, trak_start, trak_size, b"mdia")
+        hdlr = mdia and _child(moov, *mdia, b"hdlr")
+        if not hdlr or moov[hdlr[0] + 8:hdlr[0] + 12] != b"soun":
+            continue
+        minf = _child(moov, *mdia, b"minf")
+        stbl = minf and _child(moov, *minf, b"stbl")
+        stsd = stbl and _child(moov, *stbl, b"stsd")
+        if stsd:
+            # First sample entry, after version/flags and the entry count
+            entry = stsd[0] + 8
+            channels, _ = struct.unpack(">HH", moov[entry + 24:entry + 28])
+            sample_rate = struct.unpack(">I", moov[entry + 32:entry + 36])[0] >> 16
+        break
+
+    return _media_info("mp4", duration, sample_rate, channels)
+
+
+# Ogg
+
+async def _probe_ogg(reader: MediaReader) -> Optional[Dict[str, Any]]:
+    page = await reader.read(0, 27 + 255 + 64)
+    segments = page[26]
+    packet = page[27 + segments:]
+    if packet[:7] == b"\x01vorbis":
+        channels = packet[11]
+        sample_rate = struct.unpack("<I", packet[12:16])[0]
+        granule_rate, pre_skip, fmt = sample_rate, 0, "ogg-vorbis"
+    elif packet[:8] == b"OpusHead":
+        channels = packet[9]
+        pre_skip = struct.unpack("<H", packet[10:12])[0]
+        sample_rate = struct.unpack("<I", packet[12:16])[0] or 48000
+        # Opus granule positions always count 48 kHz samples
+        granule_rate, fmt = 48000, "ogg-opus"
+    else:
+        return None
+
+    # The last page's granule position is the total sample count
+    tail_start = max(0, reader.size - BLOCK_SIZE)
+    tail = await reader.read(tail_start, reader.size - tail_start)
+    last_page = tail.rfind(b"OggS")
+    duration = None
+    if last_page != -1 and last_page + 14 <= len(tail):
+        granule = struct.unpack("<q", tail[last_page + 6:last_page + 14])[0]
+        if granule > 0:
+            duration = max(0, granule - pre_skip) / granule_rate
+    return _media_info(fmt, duration, sample_rate, channels)
+
+
+# FLAC
+
+async def _probe_flac(reader: MediaReader) -> Optional[Dict[str, Any]]:
+    # STREAMINFO is always the first metadata block, of 34 bytes
+    block_header = await reader.read(4, 4)
+    if len(block_header) < 4 or block_header[0] & 0x7F != 0 or int.from_bytes(block_header[1:], "big") != 34:
+        return None
+    streaminfo = await reader.read(8, 34)
+    if len(streaminfo) < 34:
+        return None
+    packed = int.from_bytes(streaminfo[10:18], "big")
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    duration = total_samples / sample_rate if sample_rate and total_samples else None
+    return _media_info("flac", duration, sample_rate, channels)
+
+
+# WebM / Matroska
+
+_EBML_SEGMENT = 0x18538067
+_EBML_INFO = 0x1549A966
+_EBML_TRACKS = 0x1654AE6B
+_EBML_CLUSTER = 0x1F43B675
+_EBML_TIMECODE_SCALE = 0x2AD7B1
+_EBML_DURATION = 0x4489
+_EBML_TRACK_ENTRY = 0xAE
+_EBML_TRACK_TYPE = 0x83
+_EBML_AUDIO = 0xE1
+_EBML_SAMPLING_FREQUENCY = 0xB5
+_EBML_CHANNELS = 0x9F
+_EBML_UNKNOWN_SIZE = -1
+
+
+def _vint(data: bytes, offset: int, keep_marker: bool) -> Tuple[int, int]:
+    """Decode an EBML variable-length integer; returns (value, length)."""
+    first = data[offset]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8:
+        raise ValueError("Invalid EBML variable-length integer")
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in data[offset + 1:offset + length]:
+        value = (value << 8) | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        value = _EBML_UNKNOWN_SIZE
+    return value, length
+
+
+def _ebml_elements(data: bytes, start: int = 0, end: Optional[int] = None):
+    """Yield (id, payload offset, payload size) for elements in memory."""
+    offset, end = start, len(data) if end is None else end
+    while offset < end:
+        element_id, id_length = _vint(data, offset, keep_marker=True)
+        size, size_length = _vint(data, offset + id_length, keep_marker=False)
+        payload = offset + id_length + size_length
+        yield element_id, payload, size
+        if size == _EBML_UNKNOWN_SIZE:
+            return
+        offset = payload + size
+
+
+def _ebml_uint(data: bytes, start: int, size: int) -> int:
+    return int.from_bytes(data[start:start + size], "big")
+
+
+def _ebml_float(data: bytes, start: int, size: int) -> Optional[float]:
+    if size == 4:
+        return struct.unpack(">f", data[start:start + 4])[0]
+    if size == 8:
+        return struct.unpack(">d", data[start:start + 8])[0]
+    return None
+
+
+async def _probe_matroska(reader: MediaReader) -> Optional[Dict[str, Any]]:
+    head = await reader.read(0, BLOCK_SIZE)
+    # Skip the EBML header to the Segment
+    _, header_start, header_size = next(_ebml_elements(head), (None, 0, 0))
+    segment_id, segment_start, _ = next(_ebml_elements(head, header_start + header_size), (None, 0, 0))
+    if segment_id != _EBML_SEGMENT:
+        return None
+
+    timecode_scale, duration, sample_rate, channels = 1_000_000, None, None, None
+    offset = segment_start
+    found = 0
+    # Info and Tracks come before the first Cluster in practice
+    while offset < reader.size and found < 2:
+        header = await reader.read(offset, 12)
+        if len(header) < 2:
+            break
+        element_id, id_length = _vint(header, 0, keep_marker=True)
+        size, size_length = _vint(header, id_length, keep_marker=False)
+        payload = offset + id_length + size_length
+        if element_id == _EBML_CLUSTER or size == _EBML_UNKNOWN_SIZE:
+            break
+        if element_id in (_EBML_INFO, _EBML_TRACKS) and size <= MAX_HEADER_BYTES:
+            found += 1
+            data = await reader.read(payload, size)
+            if element_id == _EBML_INFO:
+                for child_id, start, child_size in _ebml_elements(data):
+                    if child_id == _EBML_TIMECODE_SCALE:
+                        timecode_scale = _ebml_uint(data, start, child_size)
+                    elif child_id == _EBML_DURATION:
+                        duration = _ebml_float(data, start, child_size)
+            else:
+                for entry_id, entry_start, entry_size in _ebml_elements(data):
+                    if entry_id != _EBML_TRACK_ENTRY:
+                        continue
+                    children = {
+                        child_id: (start, child_size)
+                        for child_id, start, child_size in _ebml_elements(data, entry_start, entry_start + entry_size)
+                    }
+                    if _EBML_TRACK_TYPE in children and _ebml_uint(data, *children[_EBML_TRACK_TYPE]) == 2:
+                        if _EBML_AUDIO in children:
+                            start, audio_size = children[_EBML_AUDIO]
+                            for child_id, child_start, child_size in _ebml_elements(data, start, start + audio_size):
+                                if child_id == _EBML_SAMPLING_FREQUENCY:
+                                    sample_rate = int(_ebml_float(data, child_start, child_size) or 0) or None
+                                elif child_id == _EBML_CHANNELS:
+                                    channels = _ebml_uint(data, child_start, child_size)
+                            if channels is None:
+                                channels = 1
+                        break
+        offset = payload + size
+
+    if duration is not None:
+        duration = duration * timecode_scale / 1e9
+    return _media_info("webm", duration, sample_rate, channels)
+
+
+async def probe_media(reader: MediaReader) -> Optional[Dict[str, Any]]:
+    """
+    Identify the container from its magic bytes and read its headers.
+    Returns media_format, duration_seconds, sample_rate and channels (any of
+    the last three may be None), or None for unrecognised, truncated or
+    corrupt media.
+    """
+    try:
+        return await _probe_container(reader)
+    except (struct.error, IndexError, ValueError):
+        return None
+
+
+async def _probe_container(reader: MediaReader) -> Optional[Dict[str, Any]]:
+    head = await reader.read(0, 12)
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return await _probe_wav(reader)
+    if head[4:8] == b"ftyp":
+        return await _probe_mp4(reader)
+    if head[:4] == b"OggS":
+        return await _probe_ogg(reader)
+    if head[:4] == b"fLaC":
+        return await _probe_flac(reader)
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return await _probe_matroska(reader)
+    if head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return await _probe_mp3(reader)
+    return None
+
+
+async def probe_stored_media(path: str, size: int) -> Optional[Dict[str, Any]]:
+    """
+    Probe a storage object with range requests. Returns None, rather than
+    raising, when the media cannot be probed, since an unprobed upload is
+    still usable.
+    """
+    if not settings.MEDIA_PROBE:
+        return None
+    reader = MediaReader(lambda offset, length: read_object_range(path, offset, length), size)
+    try:
+        return await probe_media(reader)
+    except Exception as e:
+        print(f"Error probing {path}: {e}")
+        return None
@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.supabase import execute, get_supabase_client
+
+
+class QuotaExceededError(Exception):
+    """Raised when media would take a user past their monthly transcription quota."""
+
+    def __init__(self, requested_seconds: float, remaining_seconds: float):
+        self.requested_seconds = requested_seconds
+        self.remaining_seconds = remaining_seconds
+        super().__init__(
+            f"Transcription quota exceeded: {requested_seconds / 60:.1f} minutes requested, "
+            f"{remaining_seconds / 60:.1f} minutes left this month"
+        )
+
+
+def quota_period_start(now: Optional[datetime] = None) -> datetime:
+    """Start of the current quota period, the calendar month in UTC."""
+    now = now or datetime.now(timezone.utc)
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def unknown_bytes_per_second() -> float:
+    """Bytes per second of media assumed for files whose duration is unknown."""
+    return settings.QUOTA_UNKNOWN_BITRATE_KBPS * 1000 / 8
+
+
+def billable_seconds(file: Dict[str, Any]) -> float:
+    """
+    Seconds a file counts against the quota: its probed duration, or an
+    estimate from its size when the probe could not read it.
+    """
+    if file.get("duration_seconds") is not None:
+        return file["duration_seconds"]
+    return (file.get("size") or 0) / unknown_bytes_per_second()
+
+
+async def get_used_seconds(user_id: str) -> float:
+    """Seconds of media submitted for transcription in the current period."""
+    response = await execute(get_supabase_client().rpc("get_transcribed_seconds", {
+        "p_user_id": user_id,
+        "p_since": quota_period_start().isoformat(),
+        "p_unknown_bytes_per_second": unknown_bytes_per_second(),
+    }))
+    return float(response.data or 0)
+
+
+async def get_remaining_seconds(user: Dict[str, Any]) -> Optional[float]:
+    """Seconds a user may still submit this period, or None if unlimited."""
+    if user.get("is_admin"):
+        return None
+    quota_minutes = user.get("quota_minutes")
+    if quota_minutes is None:
+        quota_minutes = settings.DEFAULT_FREE_MINUTES
+    return max(0.0, quota_minutes * 60 - await get_used_seconds(user["id"]))
+
+
+async def check_quota(user: Dict[str, Any], files: List[Dict[str, Any]]) -> None:
+    """
+    Raise QuotaExceededError unless a user has quota left for all of
+    `files`, counted by billable_seconds.
+    """
+    requested = sum(billable_seconds(file) for file in files)
+    if not requested:
+        return
+    remaining = await get_remaining_seconds(user)
+    if remaining is not None and requested > remaining:
+        raise QuotaExceededError(requested, remaining)
+
+
+async def files_within_quota(user: Dict[str, Any], files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    The files that fit in a user's remaining quota, first come first
+    served; a file too long for what is left is skipped.
+    """
+    remaining = await get_remaining_seconds(user)
+    if remaining is None:
+        return files
+    accepted = []
+    for file in files:
+        duration = billable_seconds(file)
+        if duration > remaining:
+            continue
+        remaining -= duration
+        accepted.append(file)
+    return accepted
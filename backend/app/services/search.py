@@ -0,0 +1,75 @@
+import re
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+from app.core.config import settings
+from app.core.supabase import execute, get_supabase_client
+from app.services.segments import PackedSegments, segment_repository
+
+# Suffixes dropped from query words so that, like the English text search
+# configuration, "meetings" also finds "meeting" in segment text
+_SUFFIXES = ("ing", "es", "ed", "s")
+
+
+def query_pattern(query: str) -> Optional[Pattern[str]]:
+    """
+    Regex matching the positive words of a web-search style query, used to
+    find the segments behind a full-text match. Excluded (-word) terms and
+    the OR operator are ignored.
+    """
+    stems = []
+    for word in re.findall(r'-?[\w\']+', query.lower()):
+        if word.startswith("-") or word == "or":
+            continue
+        for suffix in _SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                word = word[:-len(suffix)]
+                break
+        stems.append(re.escape(word))
+    if not stems:
+        return None
+    return re.compile(r"\b(?:" + "|".join(stems) + ")", re.IGNORECASE)
+
+
+def matching_segments(packed: PackedSegments, pattern: Pattern[str], limit: int) -> List[Dict[str, Any]]:
+    """The first `limit` segments whose text matches `pattern`."""
+    matches = []
+    for index in range(len(packed)):
+        if pattern.search(packed.text[packed.offsets[index]:packed.offsets[index + 1]]):
+            matches.append(packed.segment(index))
+            if len(matches) == limit:
+                break
+    return matches
+
+
+async def search_transcriptions(
+    user_id: str, query: str, limit: int, offset: int = 0
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """
+    Full-text search over a user's completed transcriptions, best match
+    first. Each result carries a highlighted snippet and the timestamps of
+    the matching segments. Returns one page and the offset of the next
+    (None on the last page).
+    """
+    # Fetch one extra row to tell whether another page follows
+    response = await execute(get_supabase_client().rpc("search_transcriptions", {
+        "p_user_id": user_id,
+        "p_query": query,
+        "p_limit": limit + 1,
+        "p_offset": offset,
+    }))
+    results = response.data or []
+    next_offset = offset + limit if len(results) > limit else None
+    results = results[:limit]
+
+    pattern = query_pattern(query)
+    # The page's segments are loaded in one query rather than one per result
+    segments = (
+        await segment_repository.get_many({result["id"]: result["version"] for result in results})
+        if pattern is not None and results else {}
+    )
+    for result in results:
+        packed = segments.get(result["id"])
+        result["matches"] = (
+            matching_segments(packed, pattern, settings.SEARCH_MATCHES_PER_RESULT) if packed is not None else []
+        )
+    return results, next_offset
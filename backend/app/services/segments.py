@@ -0,0 +1,317 @@
+import base64
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Any, Dict, List, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.supabase import execute, get_supabase_client
+from app.services.file import IN_QUERY_CHUNK_SIZE
+
+# Packed arrays are stored little-endian whatever the host byte order
+_LITTLE_ENDIAN = array("H", [1]).tobytes() == b"\x01\x00"
+
+
+def _pack(typecode: str, values: List[Any]) -> str:
+    data = array(typecode, values)
+    if data.itemsize > 1 and not _LITTLE_ENDIAN:
+        data.byteswap()
+    return base64.b64encode(data.tobytes()).decode()
+
+
+def _unpack(typecode: str, encoded: Optional[str]) -> Optional[array]:
+    if encoded is None:
+        return None
+    data = array(typecode)
+    data.frombytes(base64.b64decode(encoded))
+    if data.itemsize > 1 and not _LITTLE_ENDIAN:
+        data.byteswap()
+    return data
+
+
+class PackedSegments:
+    """
+    Transcript segments stored column by column.
+
+    Start and end times are packed float arrays and all segment texts share
+    one string, sliced by offsets. Speakers and confidences are optional
+    columns, present only when the transcription API returned them. Decoding
+    is a base64 decode per column, with no per-segment JSON parsing.
+
+    Segments are kept in start-time order, so a time window is found by
+    binary search.
+    """
+
+    def __init__(
+        self,
+        starts: array,
+        ends: array,
+        text: str,
+        offsets: array,
+        speaker_ids: Optional[array] = None,
+        speakers: Optional[List[str]] = None,
+        confidences: Optional[array] = None,
+        version: int = 1,
+    ):
+        self.starts = starts
+        self.ends = ends
+        self.text = text
+        self.offsets = offsets  # len(self) + 1 character offsets into `text`
+        self.speaker_ids = speaker_ids
+        self.speakers = speakers
+        self.confidences = confidences
+        self.version = version  # the transcription version these segments belong to
+        # No segment starting more than this before a window can reach into it
+        self._max_duration = max((end - start for start, end in zip(starts, ends)), default=0.0)
+
+    @classmethod
+    def from_segments(cls, segments: List[Dict[str, Any]], version: int = 1) -> "PackedSegments":
+        segments = sorted(segments, key=lambda segment: float(segment.get("start", 0)))
+        texts = [segment.get("text", "") for segment in segments]
+        offsets = [0, *accumulate(len(text) for text in texts)]
+
+        speaker_ids = speakers = None
+        if any("speaker" in segment for segment in segments):
+            labels: Dict[str, int] = {}
+            for segment in segments:
+                labels.setdefault(str(segment.get("speaker", "")), len(labels))
+            speakers = list(labels)
+            speaker_ids = array("H", (labels[str(segment.get("speaker", ""))] for segment in segments))
+
+        confidences = None
+        if any("confidence" in segment for segment in segments):
+            confidences = array("f", (float(segment.get("confidence", 0.0)) for segment in segments))
+
+        return cls(
+            starts=array("d", (float(segment.get("start", 0)) for segment in segments)),
+            ends=array("d", (float(segment.get("end", 0)) for segment in segments)),
+            text="".join(texts),
+            offsets=array("I", offsets),
+            speaker_ids=speaker_ids,
+            speakers=speakers,
+            confidences=confidences,
+            version=version,
+        )
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "PackedSegments":
+        return cls(
+            starts=_unpack("d", row["starts"]),
+            ends=_unpack("d", row["ends"]),
+            text=row["text"],
+            offsets=_unpack("I", row["text_offsets"]),
+            speaker_ids=_unpack("H", row.get("speaker_ids")),
+            speakers=row.get("speakers"),
+            confidences=_unpack("f", row.get("confidences")),
+            version=row.get("version", 1),
+        )
+
+    def to_row(self) -> Dict[str, Any]:
+        return {
+            "segment_count": len(self),
+            "starts": _pack("d", self.starts),
+            "ends": _pack("d", self.ends),
+            "text": self.text,
+            "text_offsets": _pack("I", self.offsets),
+            "speaker_ids": _pack("H", self.speaker_ids) if self.speaker_ids is not None else None,
+            "speakers": self.speakers,
+            "confidences": _pack("f", self.confidences) if self.confidences is not None else None,
+        }
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def segment(self, index: int) -> Dict[str, Any]:
+        segment = {
+            "start": self.starts[index],
+            "end": self.ends[index],
+            "text": self.text[self.offsets[index]:self.offsets[index + 1]],
+        }
+        if self.speaker_ids is not None and self.speakers[self.speaker_ids[index]]:
+            segment["speaker"] = self.speakers[self.speaker_ids[index]]
+        if self.confidences is not None:
+            segment["confidence"] = round(self.confidences[index], 4)
+        return segment
+
+    def window_indices(self, start: Optional[float] = None, end: Optional[float] = None) -> List[int]:
+        """Indices of the segments overlapping [start, end)."""
+        last = bisect_left(self.starts, end) if end is not None else len(self)
+        if start is None:
+            return list(range(last))
+        first = bisect_left(self.starts, start - self._max_duration)
+        return [index for index in range(first, last) if self.ends[index] > start]
+
+    def window(self, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Segments overlapping [start, end), in the usual JSON shape."""
+        return [self.segment(index) for index in self.window_indices(start, end)]
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return self.window()
+
+    def full_text(self) -> str:
+        """Transcript text made from the segments, as stored after an edit."""
+        return " ".join(
+            self.text[self.offsets[index]:self.offsets[index + 1]].strip() for index in range(len(self))
+        )
+
+
+def apply_segment_edits(segments: List[Dict[str, Any]], operations: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Apply a batch of SegmentEdit operations to a segment list, in order.
+    Raises ValueError if an operation refers to a segment that does not exist.
+    """
+    segments = [dict(segment) for segment in segments]
+    for number, operation in enumerate(operations, start=1):
+        limit = len(segments) if operation.op == "insert" else len(segments) - 1
+        if operation.index > limit:
+            raise ValueError(f"Operation {number}: no segment at index {operation.index}")
+
+        if operation.op == "delete":
+            del segments[operation.index]
+            continue
+
+        fields = {
+            name: getattr(operation, name)
+            for name in ("text", "start", "end", "speaker")
+            if getattr(operation, name) is not None
+        }
+        if operation.op == "replace":
+            segments[operation.index].update(fields)
+        else:
+            # Inserted segments default to the gap where they are placed
+            before = segments[operation.index - 1] if operation.index > 0 else None
+            after = segments[operation.index] if operation.index < len(segments) else None
+            segment = {
+                "start": before["end"] if before else 0.0,
+                "end": after["start"] if after else (before["end"] if before else 0.0),
+            }
+            segment.update(fields)
+            segments.insert(operation.index, segment)
+
+    for number, segment in enumerate(segments):
+        if float(segment["end"]) < float(segment["start"]):
+            raise ValueError(f"Segment {number} ends before it starts")
+    return segments
+
+
+class SegmentRepository:
+    """
+    Packed segments in the `transcription_segments` table, one row per
+    transcription.
+
+    Decoded segments are cached per process. Rows are written when a
+    transcription completes and on each edit; each cached copy carries its
+    version, so callers that need a given version can skip a stale one.
+    """
+
+    def __init__(self):
+        self._cache: TTLCache[PackedSegments] = TTLCache(
+            max_size=settings.SEGMENT_CACHE_SIZE,
+            ttl_seconds=settings.SEGMENT_CACHE_SECONDS,
+            name="segments",
+        )
+
+    def _table(self):
+        return get_supabase_client().table("transcription_segments")
+
+    async def save(self, transcription_id: str, segments: List[Dict[str, Any]], version: int = 1) -> PackedSegments:
+        packed = PackedSegments.from_segments(segments, version=version)
+        await execute(
+            self._table().upsert(
+                {"transcription_id": transcription_id, "version": version, **packed.to_row()},
+                on_conflict="transcription_id",
+            )
+        )
+        self._cache.set(transcription_id, packed)
+        return packed
+
+    async def save_many(self, segments_by_id: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Save the segments of several transcriptions in one statement."""
+        packed_by_id = {
+            transcription_id: PackedSegments.from_segments(segments)
+            for transcription_id, segments in segments_by_id.items()
+        }
+        await execute(
+            self._table().upsert(
+                [{"transcription_id": transcription_id, **packed.to_row()}
+                 for transcription_id, packed in packed_by_id.items()],
+                on_conflict="transcription_id",
+            )
+        )
+        for transcription_id, packed in packed_by_id.items():
+            self._cache.set(transcription_id, packed)
+
+    def remember(self, transcription_id: str, packed: PackedSegments) -> None:
+        """Cache segments that were just written by other means."""
+        self._cache.set(transcription_id, packed)
+
+    async def get(self, transcription_id: str, version: Optional[int] = None) -> Optional[PackedSegments]:
+        """
+        Get the packed segments of a transcription. Transcriptions completed
+        before packed storage existed are packed from their JSONB `segments`
+        on first read. A cached copy at a version other than `version` is
+        refreshed from the database, so readers should pass the version of
+        the transcription row they read; another process may have edited it.
+        """
+        packed = self._cache.get(transcription_id)
+        if packed is not None and (version is None or packed.version == version):
+            return packed
+
+        response = await execute(
+            self._table().select("*").eq("transcription_id", transcription_id).limit(1)
+        )
+        if response.data:
+            packed = PackedSegments.from_row(response.data[0])
+            self._cache.set(transcription_id, packed)
+            return packed
+
+        response = await execute(
+            get_supabase_client()
+            .table("transcriptions")
+            .select("segments, version")
+            .eq("id", transcription_id)
+            .limit(1)
+        )
+        if not response.data or response.data[0].get("segments") is None:
+            return None
+        return await self.save(transcription_id, response.data[0]["segments"], response.data[0]["version"])
+
+    async def get_many(self, versions: Dict[str, int]) -> Dict[str, PackedSegments]:
+        """
+        Batch form of get: the packed segments of several transcriptions,
+        given as {transcription_id: version}, keyed by transcription id.
+        Segments not cached at the given version are read in one query per
+        IN_QUERY_CHUNK_SIZE transcriptions.
+        """
+        results = {}
+        missing = []
+        for transcription_id, version in versions.items():
+            packed = self._cache.get(transcription_id)
+            if packed is not None and packed.version == version:
+                results[transcription_id] = packed
+            else:
+                missing.append(transcription_id)
+
+        for first in range(0, len(missing), IN_QUERY_CHUNK_SIZE):
+            response = await execute(
+                self._table().select("*").in_("transcription_id", missing[first:first + IN_QUERY_CHUNK_SIZE])
+            )
+            for row in response.data:
+                packed = PackedSegments.from_row(row)
+                self._cache.set(row["transcription_id"], packed)
+                results[row["transcription_id"]] = packed
+
+        # Transcriptions completed before packed storage existed, one at a time
+        for transcription_id in missing:
+            if transcription_id not in results:
+                packed = await self.get(transcription_id, version=versions[transcription_id])
+                if packed is not None:
+                    results[transcription_id] = packed
+        return results
+
+    def invalidate(self, transcription_id: str) -> None:
+        self._cache.invalidate(transcription_id)
+
+
+segment_repository = SegmentRepository()
@@ -0,0 +1,653 @@
+import base64
+import hashlib
+import json
+import os
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.events import progress_broker
+from app.core.metrics import metrics
+from app.core.storage import create_signed_download_url, iter_object
+from app.core.supabase import execute, get_supabase_client
+from app.services.backends import MediaUpload, get_transcription_backend
+from app.services.chunking import ffmpeg_available, probe_duration, transcribe_in_chunks, worth_splitting
+from app.services.file import IN_QUERY_CHUNK_SIZE, file_repository
+from app.services.media import download_to_file, spool_object
+from app.services.normalize import normalized_filename, normalized_stream, worth_normalizing
+from app.services.segments import PackedSegments, apply_segment_edits, segment_repository
+from app.services.uploads import hash_object
+
+# How long ffmpeg may keep reading a stored file it is normalizing
+SOURCE_URL_EXPIRES_SECONDS = 60 * 60
+
+# Columns returned for transcriptions, including the parent file summary
+TRANSCRIPTION_COLUMNS = "*, files(original_filename, duration_seconds)"
+
+# Fields that can be requested when listing transcriptions, and their columns
+LIST_FIELDS = {
+    "id": "id",
+    "file_id": "file_id",
+    "status": "status",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+    "version": "version",
+    "text": "text",
+    "file": "files(original_filename, duration_seconds)",
+}
+# Listing defaults to a summary without the transcript itself
+DEFAULT_LIST_FIELDS = ["id", "file_id", "status", "created_at", "updated_at", "file"]
+# Always selected, since the pagination cursor is built from id and
+# created_at, and the page's ETag from id and updated_at
+REQUIRED_FIELDS = ["id", "created_at", "updated_at"]
+
+
+dedup_hits = metrics.counter(
+    "transcription_dedup_hits_total", "Transcriptions served from the content-hash result cache"
+)
+dedup_misses = metrics.counter(
+    "transcription_dedup_misses_total", "Transcriptions that had to be sent to the transcription API"
+)
+media_bytes_stored = metrics.counter(
+    "transcription_media_bytes_stored_total", "Size of the stored media of transcribed files"
+)
+media_bytes_sent = metrics.counter(
+    "transcription_media_bytes_sent_total", "Media bytes uploaded to the transcription API"
+)
+
+
+def transcription_settings_key() -> str:
+    """
+    Identify the settings that affect transcription output, so cached
+    results are only reused for transcriptions made the same way.
+    """
+    backend = get_transcription_backend()
+    relevant = {
+        **backend.settings_key(),
+        "version": settings.TRANSCRIPTION_SETTINGS_VERSION,
+        "chunking": settings.TRANSCRIPTION_CHUNKING and ffmpeg_available(),
+        "chunk_seconds": settings.TRANSCRIPTION_CHUNK_SECONDS,
+        "chunk_overlap_seconds": settings.TRANSCRIPTION_CHUNK_OVERLAP_SECONDS,
+    }
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class TranscriptionResultCache:
+    """
+    Transcription API output keyed by media content hash and settings key,
+    stored in the `transcription_results` table.
+
+    Entries hold the original machine transcript, so later edits to a
+    user's transcription are never shared with other uploads.
+    """
+
+    def _table(self):
+        return get_supabase_client().table("transcription_results")
+
+    async def get(self, content_sha256: str, settings_key: str) -> Optional[Dict[str, Any]]:
+        response = await execute(
+            self._table()
+            .select("text, segments")
+            .eq("content_sha256", content_sha256)
+            .eq("settings_key", settings_key)
+            .limit(1)
+        )
+        return response.data[0] if response.data else None
+
+    async def get_many(self, content_sha256s: List[str], settings_key: str) -> Dict[str, Dict[str, Any]]:
+        """Cached results for any of the given content hashes, keyed by hash."""
+        results = {}
+        for first in range(0, len(content_sha256s), IN_QUERY_CHUNK_SIZE):
+            response = await execute(
+                self._table()
+                .select("content_sha256, text, segments")
+                .eq("settings_key", settings_key)
+                .in_("content_sha256", content_sha256s[first:first + IN_QUERY_CHUNK_SIZE])
+            )
+            results.update((row["content_sha256"], row) for row in response.data)
+        return results
+
+    async def put(
+        self, content_sha256: str, settings_key: str, text: str, segments: List[Dict[str, Any]], transcription_id: str
+    ) -> None:
+        await execute(
+            self._table().upsert({
+                "content_sha256": content_sha256,
+                "settings_key": settings_key,
+                "text": text,
+                "segments": segments,
+                "source_transcription_id": transcription_id,
+            }, on_conflict="content_sha256,settings_key")
+        )
+
+
+class VersionConflictError(Exception):
+    """Raised when an edit was made against an outdated transcript version."""
+
+    def __init__(self, current_version: int):
+        self.current_version = current_version
+        super().__init__(f"Transcript has changed; the current version is {current_version}")
+
+
+class TranscriptionRepository:
+    """
+    Non-blocking access to the `transcriptions` table.
+
+    Every query runs on the bounded Supabase thread pool, so route handlers
+    and background jobs can await them without stalling the event loop.
+    """
+
+    def _table(self):
+        return get_supabase_client().table("transcriptions")
+
+    async def get_transcription(self, transcription_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a transcription owned by a user, or None if there is no such row.
+        Segments held in packed storage are expanded into the JSON list.
+        """
+        response = await execute(
+            self._table()
+            .select(TRANSCRIPTION_COLUMNS)
+            .eq("id", transcription_id)
+            .eq("user_id", user_id)
+            .limit(1)
+        )
+        if not response.data:
+            return None
+        transcription = response.data[0]
+        if transcription.get("segments") is None and transcription["status"] == "completed":
+            packed = await segment_repository.get(transcription_id, version=transcription["version"])
+            transcription["segments"] = packed.to_list() if packed is not None else []
+        return transcription
+
+    async def get_updated_at(self, transcription_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the id and updated_at of a user's transcription, enough to check
+        a cached copy without reading its text or segments.
+        """
+        response = await execute(
+            self._table()
+            .select("id, updated_at")
+            .eq("id", transcription_id)
+            .eq("user_id", user_id)
+            .limit(1)
+        )
+        return response.data[0] if response.data else None
+
+    async def get_summary(self, transcription_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get a user's transcription without its text or segments."""
+        response = await execute(
+            self._table()
+            .select("id, status, progress, version, updated_at, files(original_filename)")
+            .eq("id", transcription_id)
+            .eq("user_id", user_id)
+            .limit(1)
+        )
+        return response.data[0] if response.data else None
+
+    async def _get_version(self, transcription_id: str, user_id: str) -> Optional[int]:
+        """The current version of a user's transcription, or None if there is no such row."""
+        response = await execute(
+            self._table()
+            .select("version")
+            .eq("id", transcription_id)
+            .eq("user_id", user_id)
+            .limit(1)
+        )
+        return response.data[0]["version"] if response.data else None
+
+    async def get_segments(
+        self, transcription_id: str, user_id: str, start: Optional[float] = None, end: Optional[float] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the segments of a user's transcription that overlap [start, end),
+        or None if there is no such transcription.
+        """
+        version = await self._get_version(transcription_id, user_id)
+        if version is None:
+            return None
+        packed = await segment_repository.get(transcription_id, version=version)
+        return packed.window(start, end) if packed is not None else []
+
+    async def list_transcriptions(
+        self,
+        user_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        status: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get one page of a user's transcriptions, newest first, and the cursor
+        for the next page (None on the last page).
+
+        Pages are keyed on (created_at, id), so each page is an index range
+        scan however deep the client has paged.
+        """
+        query = (
+            self._table()
+            .select(_list_columns(fields or DEFAULT_LIST_FIELDS))
+            .eq("user_id", user_id)
+        )
+        if status is not None:
+            query = query.eq("status", status)
+        if created_after is not None:
+            query = query.gte("created_at", created_after.isoformat())
+        if created_before is not None:
+            query = query.lt("created_at", created_before.isoformat())
+        if cursor is not None:
+            created_at, last_id = decode_cursor(cursor)
+            query = query.or_(
+                f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{last_id})'
+            )
+
+        # Fetch one extra row to tell whether another page follows
+        response = await execute(
+            query
+            .order("created_at", desc=True)
+            .order("id", desc=True)
+            .limit(limit + 1)
+        )
+        rows = response.data
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+
+    async def create_transcription(
+        self, file_id: str, user_id: str, result: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Create a pending transcription, or a completed one when an existing
+        `result` (text and segments) is being reused.
+        """
+        row = {
+            "file_id": file_id,
+            "user_id": user_id,
+            "status": "pending"
+        }
+        if result is not None:
+            row.update(text=result["text"], status="completed")
+        response = await execute(self._table().insert(row))
+        transcription = response.data[0]
+        if result is not None:
+            await segment_repository.save(transcription["id"], result["segments"] or [])
+        return transcription
+
+    async def create_transcriptions(
+        self, user_id: str, file_ids: List[str], results: Dict[str, Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Create transcriptions for many files in one statement. Files with a
+        reusable result in `results` (keyed by file id) are created completed;
+        the rest are pending. Rows come back in `file_ids` order.
+        """
+        rows = []
+        for file_id in file_ids:
+            row = {"file_id": file_id, "user_id": user_id, "status": "pending"}
+            if file_id in results:
+                row.update(text=results[file_id]["text"], status="completed")
+            rows.append(row)
+        response = await execute(self._table().insert(rows))
+        transcriptions = response.data
+
+        reused = {
+            transcription["id"]: results[transcription["file_id"]]["segments"] or []
+            for transcription in transcriptions
+            if transcription["file_id"] in results
+        }
+        if reused:
+            await segment_repository.save_many(reused)
+        return transcriptions
+
+    async def update_status(
+        self, transcription_id: str, status: str, progress: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        response = await execute(
+            self._table()
+            .update({"status": status, "progress": progress})
+            .eq("id", transcription_id)
+        )
+        _publish_progress(transcription_id, status, progress)
+        return response.data[0] if response.data else None
+
+    async def update_progress(self, transcription_id: str, progress: float) -> None:
+        """Record how far a running transcription has got, from 0.0 to 1.0."""
+        await execute(
+            self._table()
+            .update({"progress": progress})
+            .eq("id", transcription_id)
+        )
+        _publish_progress(transcription_id, "processing", progress)
+
+    async def _save_edit(
+        self,
+        transcription_id: str,
+        user_id: str,
+        expected_version: Optional[int],
+        text: str,
+        packed: Optional[PackedSegments],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Write an edit in one transaction through the save_transcript_edit RPC.
+        Returns the new version and updated_at, or None if there is no such
+        transcription. Raises VersionConflictError on a stale `expected_version`,
+        and ValueError when editing segments before transcription completes.
+        """
+        response = await execute(get_supabase_client().rpc("save_transcript_edit", {
+            "p_transcription_id": transcription_id,
+            "p_user_id": user_id,
+            "p_expected_version": expected_version,
+            "p_text": text,
+            "p_segments": packed.to_row() if packed is not None else None,
+        }))
+        outcome = response.data[0]
+        if outcome["status"] == "not_found":
+            return None
+        if outcome["status"] == "conflict":
+            raise VersionConflictError(outcome["version"])
+        if outcome["status"] == "not_completed":
+            raise ValueError("Transcription has not completed yet")
+        return outcome
+
+    async def update_text(self, transcription_id: str, user_id: str, text: str) -> Optional[Dict[str, Any]]:
+        """
+        Replace the text of a user's transcription, leaving its segments as
+        they are. Ownership is enforced by the update filter, so no separate
+        existence check is needed.
+        """
+        saved = await self._save_edit(transcription_id, user_id, None, text, None)
+        if saved is None:
+            return None
+        return await self.get_transcription(transcription_id, user_id)
+
+    async def apply_edits(
+        self, transcription_id: str, user_id: str, version: int, operations: List[Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Apply a batch of segment edits made against `version` and save the
+        resulting segments and text together. Returns the new version, or
+        None if there is no such transcription.
+
+        Raises VersionConflictError if the transcript has moved past
+        `version`, and ValueError for operations that do not fit it.
+        """
+        current = await segment_repository.get(transcription_id, version=version)
+        if current is None:
+            # Not found, not owned, or not transcribed yet; the RPC tells which
+            current = PackedSegments.from_segments([])
+        try:
+            edited = PackedSegments.from_segments(apply_segment_edits(current.to_list(), operations))
+        except ValueError:
+            # Say nothing about the segments of other users' transcriptions
+            if await self._get_version(transcription_id, user_id) is None:
+                return None
+            raise
+
+        saved = await self._save_edit(transcription_id, user_id, version, edited.full_text(), edited)
+        if saved is None:
+            return None
+        edited.version = saved["version"]
+        segment_repository.remember(transcription_id, edited)
+        return {
+            "id": transcription_id,
+            "version": saved["version"],
+            "updated_at": saved["updated_at"],
+            "segment_count": len(edited),
+        }
+
+    async def complete(self, transcription_id: str, text: str, segments: List[Dict[str, Any]]) -> None:
+        """
+        Store a finished transcription. Segments go to packed storage, which
+        is written before the status changes so readers never see a
+        completed transcription without them.
+        """
+        await segment_repository.save(transcription_id, segments)
+        await execute(
+            self._table()
+            .update({
+                "text": text,
+                "status": "completed",
+                "progress": 1.0
+            })
+            .eq("id", transcription_id)
+        )
+        _publish_progress(transcription_id, "completed", 1.0)
+
+    async def fail(self, transcription_id: str, error: str) -> None:
+        await execute(
+            self._table()
+            .update({
+                "status": "failed",
+                "text": f"Error: {error}",
+                "progress": None
+            })
+            .eq("id", transcription_id)
+        )
+        _publish_progress(transcription_id, "failed", None)
+
+
+def _publish_progress(transcription_id: str, status: str, progress: Optional[float]) -> None:
+    """
+    Tell this process's progress subscribers about a change. Other processes
+    hear of it through the database trigger's notification.
+    """
+    progress_broker.publish({"id": transcription_id, "status": status, "progress": progress})
+
+
+def _list_columns(fields: List[str]) -> str:
+    unknown = [field for field in fields if field not in LIST_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    selected = REQUIRED_FIELDS + [field for field in fields if field not in REQUIRED_FIELDS]
+    return ", ".join(LIST_FIELDS[field] for field in selected)
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past `row` in the listing order."""
+    raw = json.dumps([row["created_at"], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of encode_cursor. Raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, last_id = json.loads(raw)
+        # Validate both parts, since they are interpolated into the filter
+        datetime.fromisoformat(created_at)
+        last_id = str(uuid.UUID(last_id))
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+    return created_at, last_id
+
+
+transcription_repository = TranscriptionRepository()
+transcription_result_cache = TranscriptionResultCache()
+
+
+async def find_cached_result(file: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Look up an earlier transcription of identical media made with the
+    current settings, counting the hit or miss.
+    """
+    if not settings.TRANSCRIPTION_DEDUP or not file.get("content_sha256"):
+        return None
+    result = await transcription_result_cache.get(file["content_sha256"], transcription_settings_key())
+    if result is None:
+        dedup_misses.inc()
+    else:
+        dedup_hits.inc()
+    return result
+
+
+async def find_cached_results(files: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Batch form of find_cached_result: reusable results for any of `files`,
+    keyed by file id, found in one query per IN_QUERY_CHUNK_SIZE hashes.
+    """
+    if not settings.TRANSCRIPTION_DEDUP:
+        return {}
+    hashes = list({file["content_sha256"] for file in files if file.get("content_sha256")})
+    cached = await transcription_result_cache.get_many(hashes, transcription_settings_key()) if hashes else {}
+    results = {}
+    for file in files:
+        if not file.get("content_sha256"):
+            continue
+        if file["content_sha256"] in cached:
+            dedup_hits.inc()
+            results[file["id"]] = cached[file["content_sha256"]]
+        else:
+            dedup_misses.inc()
+    return results
+
+
+async def _counted(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        media_bytes_sent.inc(len(chunk))
+        yield chunk
+
+
+@asynccontextmanager
+async def _open_local_media(path: str) -> AsyncIterator[MediaUpload]:
+    media_bytes_sent.inc(os.path.getsize(path))
+    with open(path, "rb") as media:
+        yield MediaUpload(os.path.basename(path), file=media)
+
+
+@asynccontextmanager
+async def _open_stored_media(
+    storage_path: str, filename: str, format_name: Optional[str] = None
+) -> AsyncIterator[MediaUpload]:
+    """Open a stored file for upload, normalized to `format_name` if one is given."""
+    if format_name is not None:
+        # ffmpeg reads the stored file and its output is uploaded as it is encoded
+        source_url = await create_signed_download_url(storage_path, SOURCE_URL_EXPIRES_SECONDS)
+        async with normalized_stream(source_url, format_name) as chunks:
+            yield MediaUpload(normalized_filename(filename, format_name), chunks=_counted(chunks))
+    elif settings.TRANSCRIPTION_SPOOL_MEDIA:
+        async with spool_object(storage_path) as media:
+            media_bytes_sent.inc(media.seek(0, os.SEEK_END))
+            media.seek(0)
+            yield MediaUpload(filename, file=media)
+    else:
+        yield MediaUpload(filename, chunks=_counted(iter_object(storage_path)))
+
+
+def _should_chunk(file_info: Dict[str, Any], format_name: Optional[str]) -> bool:
+    """
+    Whether to download the file and transcribe it in chunks. Files probed
+    at upload as too short to split are normalized straight from storage
+    instead, when normalization is on.
+    """
+    if not settings.TRANSCRIPTION_CHUNKING or not ffmpeg_available():
+        return False
+    duration = file_info.get("duration_seconds")
+    return duration is None or worth_splitting(duration) or format_name is None
+
+
+async def process_transcription(transcription_id: str, file_id: str, user_id: str, reuse_result: bool = True):
+    """
+    Transcribe a file and store the result on its transcription. Files that
+    were not hashed at upload are hashed first, and unless `reuse_result` is
+    False an earlier result for the same media is used without calling the
+    backend.
+
+    Raises on failure; the worker running the job decides whether to retry
+    it or mark the transcription as failed.
+    """
+    # Update status to processing
+    await transcription_repository.update_status(transcription_id, "processing", progress=0.0)
+    
+    # Get file path from storage
+    file_info = await file_repository.get_file(file_id)
+    
+    if not file_info:
+        raise Exception("File not found")
+    
+    storage_path = file_info["storage_path"]
+    filename = os.path.basename(storage_path)
+
+    if file_info.get("duration_seconds") is None:
+        file_info["duration_seconds"] = await _measure_duration(file_info)
+    if settings.TRANSCRIPTION_DEDUP and not file_info.get("content_sha256"):
+        file_info["content_sha256"] = await _hash_file(file_info)
+    cached = await find_cached_result(file_info) if reuse_result else None
+    if cached is not None:
+        await transcription_repository.complete(
+            transcription_id, text=cached["text"], segments=cached["segments"] or []
+        )
+        return
+
+    backend = get_transcription_backend()
+    format_name = backend.audio_format
+
+    if backend.reads_media:
+        media_bytes_stored.inc(file_info.get("size") or 0)
+
+    if backend.reads_media and _should_chunk(file_info, format_name):
+        # Long recordings are split at silences and transcribed in parallel
+        async with download_to_file(storage_path) as media_path:
+            result = await transcribe_in_chunks(
+                media_path,
+                lambda path: backend.transcribe(lambda: _open_local_media(path)),
+                format_name=format_name,
+                on_progress=lambda progress: transcription_repository.update_progress(
+                    transcription_id, progress
+                ),
+            )
+    else:
+        # The media is streamed from storage rather than loaded whole
+        if format_name is not None and not worth_normalizing(
+            file_info.get("size"), file_info.get("duration_seconds"), format_name
+        ):
+            format_name = None
+        result = await backend.transcribe(lambda: _open_stored_media(storage_path, filename, format_name))
+
+    # Update transcription with results
+    text = result.get("text", "")
+    segments = result.get("segments", [])
+    await transcription_repository.complete(transcription_id, text=text, segments=segments)
+
+    # Remember the result for later uploads of the same media
+    if settings.TRANSCRIPTION_DEDUP and file_info.get("content_sha256"):
+        await transcription_result_cache.put(
+            file_info["content_sha256"], transcription_settings_key(), text, segments, transcription_id
+        )
+
+
+async def _measure_duration(file_info: Dict[str, Any]) -> Optional[float]:
+    """
+    Time a file the upload probe could not read with ffprobe, which reads
+    it from storage, and record it so the quota charges the real duration
+    rather than the estimate from its size.
+    """
+    if not ffmpeg_available():
+        return None
+    try:
+        source_url = await create_signed_download_url(file_info["storage_path"], SOURCE_URL_EXPIRES_SECONDS)
+        duration = await probe_duration(source_url)
+        await file_repository.update_file(file_info["id"], {"duration_seconds": duration})
+    except Exception as e:
+        print(f"Error measuring file {file_info['id']}: {e}")
+        return None
+    return duration
+
+
+async def _hash_file(file_info: Dict[str, Any]) -> Optional[str]:
+    """
+    Hash a file uploaded in several requests or straight to storage, which
+    is left to its first transcription job to keep it off the request path.
+    The hash is recorded on the file; a failure only loses dedup.
+    """
+    try:
+        content_sha256 = await hash_object(file_info["storage_path"])
+        await file_repository.update_file(file_info["id"], {"content_sha256": content_sha256})
+    except Exception as e:
+        print(f"Error hashing file {file_info['id']}: {e}")
+        return None
+    return content_sha256
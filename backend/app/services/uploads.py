@@ -0,0 +1,140 @@
+import hashlib
+import mimetypes
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.core.config import settings
+from app.core.storage import append_to_upload, create_resumable_upload, create_signed_upload_url, iter_object
+from app.core.supabase import create_file_record, execute, get_supabase_client
+from app.services.probe import probe_stored_media
+
+
+def build_storage_path(user_id: str, filename: str) -> str:
+    """
+    Storage key for a user's upload. The first folder must be the user id,
+    as required by the storage bucket policies.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    return f"{user_id}/{uuid.uuid4()}{extension}"
+
+
+class UploadSessionRepository:
+    """
+    Resumable upload sessions stored in the `upload_sessions` table.
+
+    The bytes themselves live in a resumable upload in Supabase Storage,
+    which is the source of truth for how much has been received.
+    """
+
+    def _table(self):
+        return get_supabase_client().table("upload_sessions")
+
+    async def create_session(
+        self, user_id: str, filename: str, size: int, content_type: Optional[str] = None, signed: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Start an upload. Resumable sessions are fed through the API; signed
+        sessions hand the client a pre-signed URL to upload to storage directly.
+        """
+        content_type = content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        storage_path = build_storage_path(user_id, filename)
+        if signed:
+            upload_url = await create_signed_upload_url(storage_path)
+            expires_in = timedelta(seconds=settings.SIGNED_UPLOAD_EXPIRES_SECONDS)
+        else:
+            upload_url = await create_resumable_upload(storage_path, size, content_type)
+            expires_in = timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+
+        response = await execute(self._table().insert({
+            "user_id": user_id,
+            "original_filename": filename,
+            "content_type": content_type,
+            "size": size,
+            "storage_path": storage_path,
+            "upload_url": upload_url,
+            "upload_method": "signed" if signed else "resumable",
+            "expires_at": (datetime.now(timezone.utc) + expires_in).isoformat(),
+        }))
+        return response.data[0]
+
+    async def get_session(self, upload_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        response = await execute(
+            self._table()
+            .select("*")
+            .eq("id", upload_id)
+            .eq("user_id", user_id)
+            .limit(1)
+        )
+        return response.data[0] if response.data else None
+
+    async def complete_session(
+        self, session: Dict[str, Any], size: Optional[int] = None, content_sha256: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Create the `files` row for a fully received upload and close the
+        session. `size` overrides the declared size with the stored one.
+        Without `content_sha256` the file is hashed later, by its first
+        transcription job. The media headers are probed for its duration and
+        audio format.
+        """
+        size = size if size is not None else session["size"]
+        media = await probe_stored_media(session["storage_path"], size)
+        file = await create_file_record(
+            user_id=session["user_id"],
+            filename=session["original_filename"],
+            size=size,
+            storage_path=session["storage_path"],
+            content_sha256=content_sha256,
+            media=media,
+        )
+        await execute(
+            self._table()
+            .update({"status": "completed", "file_id": file["id"]})
+            .eq("id", session["id"])
+        )
+        return file
+
+
+async def hash_chunks(chunks: AsyncIterator[bytes], digest: Any) -> AsyncIterator[bytes]:
+    """Pass a stream of chunks through unchanged, feeding each one to `digest`."""
+    async for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+async def hash_object(path: str) -> str:
+    """SHA-256 of a storage object, computed by streaming it."""
+    digest = hashlib.sha256()
+    async for _ in hash_chunks(iter_object(path), digest):
+        pass
+    return digest.hexdigest()
+
+
+async def write_upload_chunks(upload_url: str, offset: int, chunks: AsyncIterator[bytes]) -> int:
+    """
+    Forward a stream of request chunks to a resumable storage upload.
+
+    Data is regrouped into STORAGE_UPLOAD_CHUNK_SIZE pieces (Supabase
+    Storage requires a fixed chunk size for all but the last piece), so at
+    most one piece is held in memory. Returns the new offset.
+    """
+    piece_size = settings.STORAGE_UPLOAD_CHUNK_SIZE
+    pending = []
+    pending_size = 0
+    async for chunk in chunks:
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size >= piece_size:
+            data = b"".join(pending)
+            for start in range(0, len(data) - piece_size + 1, piece_size):
+                offset = await append_to_upload(upload_url, offset, data[start:start + piece_size])
+            rest = data[len(data) - len(data) % piece_size:]
+            pending, pending_size = [rest], len(rest)
+    if pending_size:
+        offset = await append_to_upload(upload_url, offset, b"".join(pending))
+    return offset
+
+
+upload_session_repository = UploadSessionRepository()
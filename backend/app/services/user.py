@@ -6,46 +6,56 @@ from jose import JWTError, jwt
 from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import TTLCache
 from app.core.config import settings
-from app.core.supabase import get_supabase_client, get_user_by_id, ensure_user_profile
+from app.core.security import TokenVerificationUnavailable, verify_supabase_token
+from app.core.supabase import (
+    get_supabase_client,
+    get_supabase_auth_client,
+    execute,
+    run_blocking,
+    get_user_by_id,
+    get_user_profile,
+    ensure_user_profile,
+)
 from app.db.session import get_db_session
 from app.models.user import User
 from app.schemas.token import TokenPayload
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
+# Verified access token -> user claims, kept until the token expires
+token_claims_cache: TTLCache[Dict[str, Any]] = TTLCache(
+    max_size=settings.SUPABASE_TOKEN_CACHE_SIZE,
+    ttl_seconds=settings.SUPABASE_TOKEN_CACHE_SECONDS,
+    name="token_claims",
+)
+
 
 async def get_supabase_user_by_email(email: str) -> Optional[Dict[str, Any]]:
     """
     Get a user by email using Supabase.
+
+    Resolved through the get_user_by_email RPC, an indexed lookup on
+    user_profiles.email, so the cost does not grow with the number of users.
     """
     supabase = get_supabase_client()
     try:
-        # Get all users and filter by email
-        response = supabase.auth.admin.list_users()
-        
-        users = response.users
-        if not users:
-            return None
+        response = await execute(supabase.rpc("get_user_by_email", {"p_email": email}))
         
-        # Find user with matching email
-        matching_users = [user for user in users if user.email == email]
-        if not matching_users:
+        if not response.data:
             return None
-            
-        user = matching_users[0]
         
-        # Get user profile data
-        profile_response = supabase.table("user_profiles").select("*").eq("id", user.id).execute()
-        profile_data = profile_response.data[0] if profile_response.data else {}
+        user = response.data[0]
         
         # Combine user and profile data
         user_data = {
-            "id": user.id,
-            "email": user.email,
-            "created_at": user.created_at,
-            "is_active": not user.banned_until,
-            **profile_data
+            "id": user["id"],
+            "email": user["email"],
+            "created_at": user["created_at"],
+            "is_active": not user["banned_until"],
+            "quota_minutes": user["quota_minutes"],
+            "is_admin": user["is_admin"],
         }
         
         return user_data
@@ -59,8 +69,7 @@ async def authenticate_supabase_user(email: str, password: str) -> Optional[Dict
     Authenticate a user through Supabase authentication.
     """
     try:
-        supabase = get_supabase_client()
-        auth_response = supabase.auth.sign_in_with_password({
+        auth_response = await run_blocking(get_supabase_auth_client().auth.sign_in_with_password, {
             "email": email,
             "password": password
         })
@@ -75,8 +84,7 @@ async def authenticate_supabase_user(email: str, password: str) -> Optional[Dict
         await ensure_user_profile(user_id)
         
         # Get profile data
-        profile_response = supabase.table("user_profiles").select("*").eq("id", user_id).execute()
-        profile_data = profile_response.data[0] if profile_response.data else {}
+        profile_data = await get_user_profile(user_id)
         
         # Combine user and profile data
         user_data = {
@@ -95,6 +103,53 @@ async def authenticate_supabase_user(email: str, password: str) -> Optional[Dict
         return None
 
 
+async def _verify_token_remotely(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Ask Supabase Auth whether a token is valid. Unlike local verification
+    this also honors sign-outs and revoked users.
+    """
+    supabase = get_supabase_client()
+    auth_response = await run_blocking(supabase.auth.get_user, token)
+    
+    if not auth_response or not auth_response.user:
+        return None
+    
+    return {
+        "sub": auth_response.user.id,
+        "email": auth_response.user.email,
+        "created_at": auth_response.user.created_at,
+    }
+
+
+async def get_token_claims(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the verified claims of a Supabase access token.
+
+    Results are cached until the token expires (capped by
+    SUPABASE_TOKEN_CACHE_SECONDS). In "local" verify mode the signature is
+    checked in-process, falling back to Supabase Auth when no key is available.
+    """
+    claims = token_claims_cache.get(token)
+    if claims is not None:
+        return claims
+    
+    claims = None
+    if settings.SUPABASE_AUTH_VERIFY_MODE == "local":
+        try:
+            claims = await verify_supabase_token(token)
+        except TokenVerificationUnavailable as e:
+            print(f"Local token verification unavailable, using Supabase Auth: {e}")
+    
+    if claims is None:
+        claims = await _verify_token_remotely(token)
+        if not claims:
+            return None
+    
+    expires_at = jwt.get_unverified_claims(token).get("exp")
+    token_claims_cache.set(token, claims, expires_at=expires_at)
+    return claims
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
     """
     Get the current authenticated user from Supabase token.
@@ -106,17 +161,27 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any
     )
     
     try:
-        # Verify token with Supabase
-        supabase = get_supabase_client()
-        auth_response = supabase.auth.get_user(token)
+        claims = await get_token_claims(token)
         
-        if not auth_response or not auth_response.user:
+        if not claims:
             raise credentials_exception
         
-        user_id = auth_response.user.id
-        
-        # Get complete user info including profile
-        user_data = await get_user_by_id(user_id)
+        user_id = claims["sub"]
+        
+        # The verified claims already identify the user, so only the
+        # profile needs to be fetched
+        profile_data = await get_user_profile(user_id)
+        
+        if profile_data or claims.get("created_at"):
+            # Locally verified tokens carry no created_at; the profile row's is used then
+            user_data = {
+                "id": user_id,
+                "email": claims.get("email"),
+                **({"created_at": claims["created_at"]} if claims.get("created_at") else {}),
+                **profile_data
+            }
+        else:
+            user_data = await get_user_by_id(user_id)
         
         if not user_data:
             raise credentials_exception
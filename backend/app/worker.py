@@ -0,0 +1,173 @@
+"""
+Transcription worker entry point.
+
+Claims jobs from the `transcription_jobs` queue and runs
+process_transcription for them, independently of the API processes:
+
+    python -m app.worker
+"""
+import asyncio
+import os
+import signal
+import socket
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Set
+
+from app.core.config import settings
+from app.core.metrics import metrics, serve_metrics
+from app.core.storage import close_storage_http_client
+from app.core.supabase import supabase_clients
+from app.services.backends import close_transcription_backend
+from app.services.jobs import job_queue
+from app.services.transcription import process_transcription, transcription_repository
+
+queue_wait = metrics.histogram(
+    "transcription_queue_wait_seconds",
+    "Time jobs waited between becoming ready and being claimed, by plan",
+    buckets=[1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200],
+    labels=["plan"],
+)
+
+
+def job_plan(job: Dict[str, Any]) -> str:
+    """The plan a job was queued under, from its weight (see user_weight)."""
+    return "free" if job.get("weight", 1.0) == 1.0 else "paid"
+
+
+class TranscriptionWorker:
+    """
+    Runs up to `concurrency` transcription jobs at a time, keeping each
+    job's lease alive with heartbeats and retrying failures with backoff.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None):
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.concurrency = concurrency or settings.WORKER_CONCURRENCY
+        self._tasks: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    def stop(self) -> None:
+        """Stop claiming new jobs; running jobs are allowed to finish."""
+        self._stopping = True
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        print(f"Worker {self.worker_id} started with concurrency {self.concurrency}")
+        while not self._stopping:
+            free_slots = self.concurrency - len(self._tasks)
+            jobs = []
+            if free_slots > 0:
+                try:
+                    jobs = await job_queue.claim(self.worker_id, free_slots)
+                except Exception as e:
+                    print(f"Error claiming jobs: {e}")
+
+            claimed_at = datetime.now(timezone.utc)
+            for job in jobs:
+                # run_after is when the job was queued, or became due for a retry
+                ready_at = datetime.fromisoformat(job["run_after"])
+                queue_wait.observe(max(0.0, (claimed_at - ready_at).total_seconds()), plan=job_plan(job))
+                task = asyncio.create_task(self._run_job(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._job_done)
+
+            # Claim again straight away if the queue may hold more work
+            if jobs and len(self._tasks) < self.concurrency:
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.WORKER_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+        if self._tasks:
+            print(f"Waiting for {len(self._tasks)} running job(s) to finish")
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _job_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        self._wakeup.set()
+
+    async def _run_job(self, job: Dict[str, Any]) -> None:
+        transcription_id = job["transcription_id"]
+        work = asyncio.create_task(
+            process_transcription(
+                transcription_id=transcription_id,
+                file_id=job["file_id"],
+                user_id=job["user_id"],
+                reuse_result=job.get("reuse_result", True),
+            )
+        )
+
+        try:
+            # Heartbeat until the job finishes. A failed heartbeat is retried
+            # on the next beat; the job is only given up once the lease is
+            # lost, or has run out without being renewed.
+            renewed_at = time.monotonic()
+            while not work.done():
+                done, _ = await asyncio.wait({work}, timeout=settings.JOB_HEARTBEAT_SECONDS)
+                if done:
+                    break
+                try:
+                    owned = await job_queue.heartbeat(job["id"], self.worker_id)
+                except Exception as e:
+                    print(f"Heartbeat for job {job['id']} failed: {e}")
+                    owned = time.monotonic() - renewed_at < settings.JOB_LEASE_SECONDS
+                else:
+                    if owned:
+                        renewed_at = time.monotonic()
+                if not owned:
+                    print(f"Lost lease on job {job['id']}, abandoning it")
+                    await _cancel(work)
+                    return
+            work.result()
+        except Exception as e:
+            print(f"Job {job['id']} failed (attempt {job['attempts']}): {e}")
+            # Never requeue a job that is still running here
+            await _cancel(work)
+            try:
+                if await job_queue.retry_or_fail(job, self.worker_id, str(e)):
+                    await transcription_repository.update_status(transcription_id, "pending")
+                else:
+                    await transcription_repository.fail(transcription_id, str(e))
+            except Exception as e:
+                print(f"Error recording failure of job {job['id']}: {e}")
+        else:
+            await job_queue.complete(job["id"], self.worker_id)
+
+
+async def _cancel(task: asyncio.Task) -> None:
+    """Cancel a task and wait until it has stopped."""
+    if task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        pass
+
+
+async def run_worker(concurrency: Optional[int] = None) -> None:
+    worker = TranscriptionWorker(concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    metrics_server = None
+    if settings.WORKER_METRICS_PORT:
+        metrics_server = await serve_metrics(settings.WORKER_METRICS_PORT)
+    try:
+        await worker.run()
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        supabase_clients.close()
+        await close_storage_http_client()
+        await close_transcription_backend()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
@@ -0,0 +1,124 @@
+"""
+Throughput and resilience of the http transcription backend against the
+local mock API (app.mock_transcription_api), compared with the previous
+client-per-job, no-retry approach.
+
+Each scenario sends REQUESTS uploads of PAYLOAD_BYTES from CONCURRENCY
+simulated jobs, with the mock failing a given share of requests:
+- healthy: no failures
+- flaky: 20% of requests answered with 429 or 503
+- outage: every request fails, so the circuit breaker should open and later
+  requests fail fast instead of waiting on retries
+
+Run from the backend directory:
+    python -m benchmarks.backend_benchmark
+"""
+import asyncio
+import io
+import socket
+import statistics
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Tuple
+
+import httpx
+import uvicorn
+
+from app.core.config import settings
+from app.mock_transcription_api import app as mock_app
+from app.services.backends import BackendError, HttpTranscriptionBackend, MediaUpload
+
+REQUESTS = 400
+CONCURRENCY = 32
+PAYLOAD_BYTES = 256 * 1024
+LATENCY_SECONDS = 0.05
+SCENARIOS = [("healthy", 0.0), ("flaky", 0.2), ("outage", 1.0)]
+
+# Quick retries so the benchmark finishes in seconds
+settings.TRANSCRIPTION_RETRY_BASE_SECONDS = 0.05
+settings.TRANSCRIPTION_RETRY_MAX_SECONDS = 0.5
+settings.TRANSCRIPTION_BREAKER_RESET_SECONDS = 2.0
+settings.MOCK_TRANSCRIPTION_LATENCY_SECONDS = LATENCY_SECONDS
+
+
+def start_mock_server() -> Tuple[uvicorn.Server, str]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(mock_app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}/v1/transcribe"
+
+
+async def client_per_job(url: str, payload: bytes) -> None:
+    """The previous approach: a fresh client per job and no retries."""
+    async with httpx.AsyncClient(timeout=300) as client:
+        response = await client.post(url, files={"file": ("audio.flac", io.BytesIO(payload))})
+    if response.status_code != 200:
+        raise Exception(f"Transcription API error: {response.text}")
+
+
+async def run(send, label: str) -> None:
+    payload = b"\0" * PAYLOAD_BYTES
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies: List[float] = []
+    failures = 0
+    requests_before = mock_app.state.requests
+
+    async def job() -> None:
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await send(payload)
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(job() for _ in range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(
+        f"  {label:<16} {REQUESTS / elapsed:7.1f} jobs/s  {100 * (1 - failures / REQUESTS):5.1f}% ok  "
+        f"p50 {1000 * statistics.median(latencies):6.0f} ms  p95 {1000 * latencies[int(0.95 * len(latencies))]:6.0f} ms  "
+        f"{mock_app.state.requests - requests_before:5d} API calls"
+    )
+
+
+async def main() -> None:
+    server, url = start_mock_server()
+    print(
+        f"{REQUESTS} jobs, {CONCURRENCY} at a time, {PAYLOAD_BYTES // 1024} KB each, "
+        f"{LATENCY_SECONDS * 1000:.0f} ms mock latency"
+    )
+    try:
+        for name, failure_rate in SCENARIOS:
+            settings.MOCK_TRANSCRIPTION_FAILURE_RATE = failure_rate
+            print(f"\n{name} ({failure_rate:.0%} failures)")
+            await run(lambda payload: client_per_job(url, payload), "client per job")
+
+            backend = HttpTranscriptionBackend(url, "benchmark", max_concurrency=CONCURRENCY)
+
+            @asynccontextmanager
+            async def open_media(payload: bytes) -> AsyncIterator[MediaUpload]:
+                yield MediaUpload("audio.flac", file=io.BytesIO(payload))
+
+            async def send(payload: bytes) -> None:
+                await backend.transcribe(lambda: open_media(payload))
+
+            try:
+                await run(send, "pooled backend")
+            except BackendError:
+                pass
+            finally:
+                await backend.aclose()
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,105 @@
+"""
+Wall-clock speedup of chunked transcription with parallelism, against the
+local mock API (app.mock_transcription_api) over the http backend.
+
+The fixture is a 76-minute 16 kHz mono recording generated with ffmpeg: a
+tone broken by a second of silence every 45 seconds, so it splits at
+silences into eight chunks of about 10 minutes. The mock answers each
+chunk after LATENCY_SECONDS, standing in for the transcription API's own
+work on 10 minutes of audio.
+
+Two stages do not shrink with parallelism: probing the duration and
+scanning for silences, reported separately, and encoding the chunks,
+which is CPU-bound and so only runs side by side on as many cores as the
+host has. The fan-out speedup leaves out the probe and scan.
+
+Run from the backend directory (requires ffmpeg):
+    python -m benchmarks.chunking_benchmark
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Tuple
+
+import uvicorn
+
+from app.core.config import settings
+from app.mock_transcription_api import app as mock_app
+from app.services.backends import HttpTranscriptionBackend
+from app.services.chunking import detect_silences, probe_duration, transcribe_in_chunks
+from app.services.transcription import _open_local_media
+
+MINUTES = 76
+LATENCY_SECONDS = 10.0
+PARALLELISM = [1, 2, 4, 8]
+
+settings.MOCK_TRANSCRIPTION_LATENCY_SECONDS = LATENCY_SECONDS
+settings.MOCK_TRANSCRIPTION_FAILURE_RATE = 0.0
+settings.TRANSCRIPTION_CHUNK_SECONDS = 600
+settings.TRANSCRIPTION_MAX_CONCURRENCY = max(PARALLELISM)
+
+
+def start_mock_server() -> Tuple[uvicorn.Server, str]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(mock_app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}/v1/transcribe"
+
+
+def make_fixture(path: str) -> None:
+    seconds = MINUTES * 60
+    subprocess.run(
+        [
+            settings.FFMPEG_PATH, "-v", "error", "-y",
+            "-f", "lavfi", "-i", f"sine=frequency=220:sample_rate=16000:duration={seconds}",
+            "-af", "volume='if(lt(mod(t,45),44),1,0)':eval=frame",
+            "-ac", "1", "-c:a", "pcm_s16le", path,
+        ],
+        check=True,
+    )
+
+
+async def main() -> None:
+    server, url = start_mock_server()
+    backend = HttpTranscriptionBackend(url, "benchmark")
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, "recording.wav")
+        make_fixture(path)
+
+        start = time.perf_counter()
+        await probe_duration(path)
+        await detect_silences(path)
+        prepare = time.perf_counter() - start
+        print(
+            f"{MINUTES}-minute recording, {LATENCY_SECONDS:.0f} s per chunk at the API; "
+            f"probe and silence scan {prepare:.1f} s\n"
+        )
+
+        serial = None
+        for parallelism in PARALLELISM:
+            start = time.perf_counter()
+            result = await transcribe_in_chunks(
+                path, lambda chunk: backend.transcribe(lambda: _open_local_media(chunk)), parallelism=parallelism
+            )
+            elapsed = time.perf_counter() - start
+            serial = serial or elapsed
+            fan_out_speedup = (serial - prepare) / (elapsed - prepare)
+            print(
+                f"parallelism {parallelism}  {elapsed:5.1f} s  speedup {serial / elapsed:4.2f}x  "
+                f"fan-out speedup {fan_out_speedup:4.2f}x  ({len(result['segments'])} segments)"
+            )
+
+    await backend.aclose()
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
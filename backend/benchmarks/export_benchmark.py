@@ -0,0 +1,65 @@
+"""
+Throughput of the transcript export renderers on a synthetic 10-hour
+transcript (one ~4 second segment at a time, about 9,000 segments).
+
+Run from the backend directory:
+    python -m benchmarks.export_benchmark
+"""
+import random
+import time
+import tracemalloc
+
+from app.services.export import EXPORT_FORMATS
+from app.services.segments import PackedSegments
+
+HOURS = 10
+ROUNDS = 5
+WORDS = (
+    "the we meeting budget quarter revenue customer launch roadmap hiring design review "
+    "deadline marketing product sales support release feedback team project plan"
+).split()
+
+
+def synthetic_transcript(hours: float) -> PackedSegments:
+    rng = random.Random(42)
+    segments = []
+    t = 0.0
+    while t < hours * 3600:
+        length = rng.uniform(2.0, 6.0)
+        segments.append({
+            "start": round(t, 3),
+            "end": round(t + length, 3),
+            "text": " " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16))),
+            "speaker": f"SPEAKER_{rng.randint(0, 3)}",
+        })
+        t += length
+    return PackedSegments.from_segments(segments)
+
+
+def main() -> None:
+    packed = synthetic_transcript(HOURS)
+    print(f"{HOURS}-hour transcript, {len(packed)} segments, best of {ROUNDS} rounds")
+    for name, (render, _, _) in EXPORT_FORMATS.items():
+        best = float("inf")
+        size = 0
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            size = sum(len(chunk.encode("utf-8")) for chunk in render(packed))
+            best = min(best, time.perf_counter() - start)
+
+        # Peak memory held while streaming, chunks being dropped as they go
+        tracemalloc.start()
+        for _ in render(packed):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print(
+            f"{name:>4}: {best * 1000:7.1f} ms  {size / 1e6:6.2f} MB  "
+            f"{size / 1e6 / best:6.1f} MB/s  {len(packed) / best:9.0f} segments/s  "
+            f"peak {peak / 1024:.0f} KB"
+        )
+
+
+if __name__ == "__main__":
+    main()
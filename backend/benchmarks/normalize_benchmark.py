@@ -0,0 +1,86 @@
+"""
+Bytes and wall-clock time saved by normalizing audio before it is sent to
+the transcription API, over a fixture set of typical uploads generated with
+ffmpeg (five minutes each: a 48 kHz stereo screen recording, 48 and 44.1 kHz
+stereo WAV, a 128 kbps MP3 and an AAC M4A).
+
+Upload time is estimated for an UPLINK_MBPS connection. Since the encoder
+output is uploaded as it is produced, a normalized upload takes about as
+long as the slower of encoding and sending. Rows marked as skipped are
+sources the pipeline sends unchanged, being smaller than their normalized
+form.
+
+Run from the backend directory (requires ffmpeg):
+    python -m benchmarks.normalize_benchmark
+"""
+import asyncio
+import os
+import subprocess
+import tempfile
+import time
+
+from app.core.config import settings
+from app.services.normalize import AUDIO_FORMATS, normalized_stream, worth_normalizing
+
+SECONDS = 300
+UPLINK_MBPS = 20.0
+# Pink noise under a warbling tone, so lossless codecs have real work to do
+AUDIO_SOURCE = (
+    f"anoisesrc=color=pink:amplitude=0.05:sample_rate=48000:duration={SECONDS}[noise];"
+    f"sine=frequency=220:sample_rate=48000:duration={SECONDS},vibrato=f=4:d=0.5[tone];"
+    "[noise][tone]amix=inputs=2,aformat=channel_layouts=stereo"
+)
+FIXTURES = {
+    "screen-recording.mp4": [
+        "-f", "lavfi", "-i", f"testsrc=size=1280x720:rate=30:duration={SECONDS}",
+        "-filter_complex", AUDIO_SOURCE,
+        "-c:v", "libx264", "-preset", "ultrafast", "-crf", "28", "-c:a", "aac", "-b:a", "128k",
+    ],
+    "interview-48k.wav": ["-filter_complex", AUDIO_SOURCE, "-c:a", "pcm_s16le"],
+    "interview-44k.wav": ["-filter_complex", AUDIO_SOURCE, "-ar", "44100", "-c:a", "pcm_s16le"],
+    "podcast.mp3": ["-filter_complex", AUDIO_SOURCE, "-ar", "44100", "-c:a", "libmp3lame", "-b:a", "128k"],
+    "voice-memo.m4a": ["-filter_complex", AUDIO_SOURCE, "-c:a", "aac", "-b:a", "128k"],
+}
+
+
+def upload_seconds(size: int) -> float:
+    return size * 8 / (UPLINK_MBPS * 1e6)
+
+
+async def normalize(path: str, format_name: str) -> int:
+    size = 0
+    async with normalized_stream(path, format_name) as chunks:
+        async for chunk in chunks:
+            size += len(chunk)
+    return size
+
+
+async def main() -> None:
+    print(
+        f"{SECONDS // 60}-minute fixtures, {settings.TRANSCRIPTION_AUDIO_SAMPLE_RATE} Hz, "
+        f"{settings.TRANSCRIPTION_AUDIO_CHANNELS} channel(s), lossy at {settings.TRANSCRIPTION_AUDIO_BITRATE}, "
+        f"{UPLINK_MBPS:g} Mbit/s uplink"
+    )
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, args in FIXTURES.items():
+            path = os.path.join(work_dir, name)
+            subprocess.run(
+                [settings.FFMPEG_PATH, "-v", "error", "-y", *args, "-t", str(SECONDS), path], check=True
+            )
+            original = os.path.getsize(path)
+            print(f"\n{name}: {original / 1e6:.1f} MB, upload {upload_seconds(original):.1f} s")
+            for format_name in AUDIO_FORMATS:
+                start = time.perf_counter()
+                size = await normalize(path, format_name)
+                encode = time.perf_counter() - start
+                total = max(encode, upload_seconds(size))
+                skipped = "" if worth_normalizing(original, SECONDS, format_name) else "  (skipped: sent as is)"
+                print(
+                    f"  {format_name:>4}: {size / 1e6:6.2f} MB ({100 * (1 - size / original):5.1f}% saved)  "
+                    f"encode {encode:5.2f} s  upload {upload_seconds(size):5.2f} s  "
+                    f"total {total:5.2f} s vs {upload_seconds(original):5.1f} s{skipped}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
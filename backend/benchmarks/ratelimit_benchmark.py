@@ -0,0 +1,131 @@
+"""
+Latency and success of well-behaved clients while the API is overloaded,
+with and without the rate limiting and load shedding middleware.
+
+The API is simulated by a route that holds one of BACKEND_CAPACITY slots
+for BACKEND_SECONDS, standing in for get_current_user and the Supabase
+calls behind it. For DURATION seconds, LIGHT_CLIENTS clients each send a
+request every LIGHT_INTERVAL seconds while:
+- storm: one client retries from STORM_LOOPS connections, STORM_INTERVAL
+  after each response, ignoring Retry-After
+- surge: SURGE_CLIENTS clients, each within its rate limit and sending on
+  schedule without waiting for responses, together send twice what the
+  backend can serve
+
+Run from the backend directory:
+    python -m benchmarks.ratelimit_benchmark
+"""
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.middleware import LoadSheddingMiddleware, RateLimitMiddleware
+from app.core.config import settings
+from app.core.ratelimit import MemoryRateLimitStore, RateLimiter
+
+BACKEND_CAPACITY = 20
+BACKEND_SECONDS = 0.02  # so the backend serves 1000 requests/s
+DURATION = 5.0
+LIGHT_CLIENTS = 20
+LIGHT_INTERVAL = 0.25
+STORM_LOOPS = 200
+STORM_INTERVAL = 0.1
+SURGE_CLIENTS = 1000
+SURGE_INTERVAL = 0.5
+MAX_IN_FLIGHT = 100
+PATH = f"{settings.API_V1_STR}/transcriptions/benchmark"
+
+settings.LOAD_SHED_MAX_IN_FLIGHT = MAX_IN_FLIGHT
+settings.LOAD_SHED_MAX_BACKLOG = None
+
+
+def build_app(protected: bool):
+    api = FastAPI()
+    backend = asyncio.Semaphore(BACKEND_CAPACITY)
+
+    @api.get(PATH)
+    async def endpoint():
+        async with backend:
+            await asyncio.sleep(BACKEND_SECONDS)
+        return {"status": "ok"}
+
+    if not protected:
+        return api
+    return LoadSheddingMiddleware(RateLimitMiddleware(api, RateLimiter(MemoryRateLimitStore(100000))))
+
+
+async def client_loop(
+    app, address: str, interval: float, deadline: float, stats: Dict[int, List[float]], wait: bool = True
+) -> None:
+    """
+    Send requests every `interval` seconds until `deadline`. With `wait`,
+    each request waits for the previous response; without, requests go out
+    on schedule however long earlier ones take, as from many browsers.
+    """
+    transport = httpx.ASGITransport(app, client=(address, 123))
+    async with httpx.AsyncClient(transport=transport, base_url="http://api", timeout=None) as client:
+
+        async def send() -> None:
+            start = time.perf_counter()
+            response = await client.get(PATH)
+            stats.setdefault(response.status_code, []).append(time.perf_counter() - start)
+
+        pending = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            if wait:
+                await send()
+            else:
+                pending.append(asyncio.create_task(send()))
+            # Refusals never wait on I/O in-process, so always give other clients a turn
+            await asyncio.sleep(max(0.0, interval - (time.perf_counter() - start)))
+        await asyncio.gather(*pending)
+
+
+def report(label: str, stats: Dict[int, List[float]]) -> None:
+    total = sum(len(latencies) for latencies in stats.values())
+    ok = sorted(stats.get(200, []))
+    refused = ", ".join(f"{len(stats[code])} x {code}" for code in sorted(stats) if code != 200) or "none refused"
+    line = f"    {label:<6} {total:6d} requests  {100 * len(ok) / max(total, 1):5.1f}% ok"
+    if ok:
+        line += f"  p50 {1000 * statistics.median(ok):6.0f} ms  p95 {1000 * ok[int(0.95 * len(ok))]:6.0f} ms"
+    print(f"{line}  ({refused})")
+
+
+async def scenario(name: str, protected: bool) -> None:
+    app = build_app(protected)
+    deadline = time.perf_counter() + DURATION
+    light: Dict[int, List[float]] = {}
+    heavy: Dict[int, List[float]] = {}
+    tasks = [client_loop(app, f"10.0.0.{n}", LIGHT_INTERVAL, deadline, light) for n in range(LIGHT_CLIENTS)]
+    if name == "storm":
+        tasks += [client_loop(app, "10.1.0.1", STORM_INTERVAL, deadline, heavy) for _ in range(STORM_LOOPS)]
+    else:
+        tasks += [
+            client_loop(app, f"10.2.{n // 256}.{n % 256}", SURGE_INTERVAL, deadline, heavy, wait=False)
+            for n in range(SURGE_CLIENTS)
+        ]
+    await asyncio.gather(*tasks)
+    print(f"  {'middleware' if protected else 'unprotected'}")
+    report("light", light)
+    report(name, heavy)
+
+
+async def main() -> None:
+    print(
+        f"backend serves {BACKEND_CAPACITY / BACKEND_SECONDS:.0f} requests/s; {LIGHT_CLIENTS} light clients at "
+        f"{1 / LIGHT_INTERVAL:.0f}/s each; rate limit {settings.RATE_LIMIT_TRANSCRIPTIONS_PER_MINUTE:.0f}/min "
+        f"(burst {settings.RATE_LIMIT_TRANSCRIPTIONS_BURST}); at most {MAX_IN_FLIGHT} in flight"
+    )
+    for name in ("storm", "surge"):
+        print(f"\n{name}")
+        for protected in (False, True):
+            await scenario(name, protected)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
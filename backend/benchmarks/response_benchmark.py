@@ -0,0 +1,100 @@
+"""
+Serialize and compress time, and bytes on the wire, for GET
+/transcriptions/{id} of a synthetic 3-hour transcript (about 2,700
+segments, see export_benchmark).
+
+Serializers: FastAPI's default (jsonable_encoder, then json.dumps), orjson
+(FastJSONResponse) and MessagePack (MsgPackResponse). Each body is then
+compressed with the encodings and levels the API can be configured with.
+
+Run from the backend directory:
+    python -m benchmarks.response_benchmark
+"""
+import statistics
+import time
+import zlib
+from typing import Callable, List, Tuple
+
+import brotli
+import zstandard
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.api.responses import FastJSONResponse, MsgPackResponse
+from benchmarks.export_benchmark import synthetic_transcript
+
+HOURS = 3
+ROUNDS = 7
+LINK_MBITS = 10  # a modest mobile or home uplink
+
+
+def timed(func: Callable[[], bytes]) -> Tuple[float, bytes]:
+    times: List[float] = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, result
+
+
+def gzip(level: int) -> Callable[[bytes], bytes]:
+    def run(data: bytes) -> bytes:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+    return run
+
+
+ENCODINGS = [
+    ("identity", lambda data: data),
+    ("gzip 1", gzip(1)),
+    ("gzip 6", gzip(6)),
+    ("br 4", lambda data: brotli.compress(data, quality=4)),
+    ("br 5", lambda data: brotli.compress(data, quality=5)),
+    ("br 11", lambda data: brotli.compress(data, quality=11)),
+    ("zstd 1", zstandard.ZstdCompressor(level=1).compress),
+    ("zstd 3", zstandard.ZstdCompressor(level=3).compress),
+    ("zstd 10", zstandard.ZstdCompressor(level=10).compress),
+]
+
+
+def main() -> None:
+    packed = synthetic_transcript(HOURS)
+    transcription = {
+        "id": "5f0c7a52-3f0e-4a4e-9a43-0a5b0f7f2a10",
+        "file_id": "0d6f4f8e-8f7e-4a4b-b2f4-8f1f6d0f5c11",
+        "user_id": "6a0b1c2d-3e4f-4a5b-8c6d-7e8f9a0b1c2d",
+        "status": "completed",
+        "progress": 1.0,
+        "version": 1,
+        "created_at": "2026-01-01T09:00:00.000000+00:00",
+        "updated_at": "2026-01-01T09:12:00.000000+00:00",
+        "text": packed.full_text(),
+        "segments": packed.to_list(),
+        "files": {"original_filename": "all-hands.mp4", "duration_seconds": HOURS * 3600.0},
+    }
+    print(f"{HOURS}-hour transcript, {len(packed)} segments; wire time at {LINK_MBITS} Mbit/s\n")
+
+    serializers = [
+        ("FastAPI default", lambda: JSONResponse(jsonable_encoder(transcription)).body),
+        ("orjson", lambda: FastJSONResponse(transcription).body),
+        ("msgpack", lambda: MsgPackResponse(transcription).body),
+    ]
+    bodies = {}
+    for name, serialize in serializers:
+        elapsed, body = timed(serialize)
+        bodies[name] = body
+        print(f"{name:<16} serialize {elapsed:7.1f} ms  {len(body) / 1024:7.0f} KB")
+
+    for name in ("orjson", "msgpack"):
+        print(f"\n{name} body")
+        for encoding, compress in ENCODINGS:
+            elapsed, compressed = timed(lambda: compress(bodies[name]))
+            wire_ms = len(compressed) * 8 / (LINK_MBITS * 1000)
+            print(
+                f"  {encoding:<9} compress {elapsed:7.1f} ms  {len(compressed) / 1024:7.0f} KB  "
+                f"wire {wire_ms:6.0f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Simulated queue wait for light users while one heavy user floods the
+queue, with the old first-come, first-served claim and with the fair claim
+of claim_transcription_jobs, without and with a per-user running limit.
+
+The fair policy below mirrors the SQL: each user's ready jobs are ranked
+short files first, then oldest first, and claimed in order of
+(running + rank) / weight, never letting a user exceed the running limit.
+
+WORKERS x CONCURRENCY slots process jobs in a simulated
+REALTIME_FACTOR of each file's duration. At time zero the heavy user
+submits HEAVY_FILES recordings of 10-60 minutes; over the next two hours
+LIGHT_USERS users each submit one to three files of 1-20 minutes, and a
+few of them are on a paid plan.
+
+Run from the backend directory:
+    python -m benchmarks.scheduler_benchmark
+"""
+import heapq
+import random
+import statistics
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+WORKERS = 4
+CONCURRENCY = 4
+REALTIME_FACTOR = 0.1  # transcription takes a tenth of the media's duration
+HEAVY_FILES = 500
+LIGHT_USERS = 60
+PAID_SHARE = 0.2
+PAID_WEIGHT = 2.0
+USER_LIMIT = 4
+SHORT_SECONDS = 300.0
+
+
+class Job:
+    def __init__(self, user: str, ready_at: float, duration: float, weight: float):
+        self.user = user
+        self.ready_at = ready_at
+        self.duration = duration
+        self.weight = weight
+        self.started_at: Optional[float] = None
+
+
+def fifo(ready: List[Job], running: Dict[str, int], slots: int) -> List[Job]:
+    return sorted(ready, key=lambda job: job.ready_at)[:slots]
+
+
+def fair(ready: List[Job], running: Dict[str, int], slots: int, user_limit: Optional[int] = None) -> List[Job]:
+    by_user: Dict[str, List[Job]] = defaultdict(list)
+    for job in ready:
+        by_user[job.user].append(job)
+    candidates = []
+    for user, jobs in by_user.items():
+        jobs.sort(key=lambda job: (job.duration > SHORT_SECONDS, job.ready_at))
+        for position, job in enumerate(jobs, start=1):
+            turn = running[user] + position
+            if user_limit is not None and turn > user_limit:
+                break
+            candidates.append((turn / job.weight, job.ready_at, id(job), job))
+    return [job for *_, job in sorted(candidates)[:slots]]
+
+
+def workload(seed: int) -> List[Job]:
+    rng = random.Random(seed)
+    jobs = [Job("heavy", 0.0, rng.uniform(600, 3600), 1.0) for _ in range(HEAVY_FILES)]
+    for number in range(LIGHT_USERS):
+        arrives = rng.uniform(0, 7200)
+        weight = PAID_WEIGHT if rng.random() < PAID_SHARE else 1.0
+        for _ in range(rng.randint(1, 3)):
+            jobs.append(Job(f"light-{number}", arrives, rng.uniform(60, 1200), weight))
+    return jobs
+
+
+def simulate(policy, jobs: List[Job]) -> None:
+    slots = WORKERS * CONCURRENCY
+    arrivals = sorted(jobs, key=lambda job: job.ready_at)
+    finishing: List = []  # heap of (finish time, id, job)
+    running: Dict[str, int] = defaultdict(int)
+    ready: List[Job] = []
+    now = 0.0
+    index = 0
+    while index < len(arrivals) or ready or finishing:
+        # Advance to the next arrival or completion
+        next_arrival = arrivals[index].ready_at if index < len(arrivals) else float("inf")
+        next_finish = finishing[0][0] if finishing else float("inf")
+        now = min(next_arrival, next_finish)
+        while index < len(arrivals) and arrivals[index].ready_at <= now:
+            ready.append(arrivals[index])
+            index += 1
+        while finishing and finishing[0][0] <= now:
+            _, _, job = heapq.heappop(finishing)
+            running[job.user] -= 1
+
+        free = slots - len(finishing)
+        if free and ready:
+            for job in policy(ready, running, free):
+                ready.remove(job)
+                job.started_at = now
+                running[job.user] += 1
+                heapq.heappush(finishing, (now + job.duration * REALTIME_FACTOR, id(job), job))
+
+
+def percentile(values: List[float], share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def report(name: str, jobs: List[Job]) -> None:
+    waits = defaultdict(list)
+    for job in jobs:
+        group = "heavy" if job.user == "heavy" else ("light (paid)" if job.weight > 1 else "light (free)")
+        waits[group].append((job.started_at - job.ready_at) / 60)
+    heavy_done = max(job.started_at + job.duration * REALTIME_FACTOR for job in jobs if job.user == "heavy")
+    print(f"\n{name}: heavy user finished after {heavy_done / 3600:.2f} h")
+    for group in ("light (free)", "light (paid)", "heavy"):
+        values = waits[group]
+        print(
+            f"  {group:<13} {len(values):4d} jobs  wait p50 {statistics.median(values):6.1f} min  "
+            f"p95 {percentile(values, 0.95):6.1f} min  p99 {percentile(values, 0.99):6.1f} min  "
+            f"max {max(values):6.1f} min"
+        )
+
+
+def main() -> None:
+    print(
+        f"{WORKERS * CONCURRENCY} slots, heavy user with {HEAVY_FILES} files, {LIGHT_USERS} light users, "
+        f"user limit {USER_LIMIT}, paid weight {PAID_WEIGHT:g}"
+    )
+    policies = (
+        ("first come, first served", fifo),
+        ("fair", fair),
+        (f"fair, at most {USER_LIMIT} running per user", lambda *args: fair(*args, user_limit=USER_LIMIT)),
+    )
+    for name, policy in policies:
+        jobs = workload(seed=7)
+        simulate(policy, jobs)
+        report(name, jobs)
+
+
+if __name__ == "__main__":
+    main()
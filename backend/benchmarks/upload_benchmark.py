@@ -0,0 +1,123 @@
+"""
+Peak memory of a resumable upload chunk (PATCH /files/uploads/{id}) as the
+upload grows to several GiB.
+
+The request body is fed in 64 KiB pieces, as the ASGI server delivers it,
+through hash_chunks and write_upload_chunks to a local stand-in for the
+Supabase Storage TUS endpoint, run in its own process, that discards what
+it receives. Peak RSS of the uploading process
+should stay flat however large the upload; buffering the whole body first,
+as the old endpoint did, is shown for comparison.
+
+Run from the backend directory:
+    python -m benchmarks.upload_benchmark
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import resource
+import socket
+import time
+from typing import AsyncIterator, Tuple
+
+import httpx
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+# Storage needs credentials to build its client; requests go to the local sink
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "benchmark")
+
+from app.core.storage import close_storage_http_client  # noqa: E402
+from app.services.uploads import hash_chunks, write_upload_chunks  # noqa: E402
+
+MIB = 1024 * 1024
+SIZES = [256 * MIB, 1024 * MIB, 2048 * MIB]
+BUFFERED_SIZE = 256 * MIB
+REQUEST_CHUNK = 64 * 1024
+
+sink = FastAPI()
+
+
+@sink.patch("/upload/resumable/{upload_id}")
+async def append(request: Request) -> Response:
+    offset = int(request.headers["upload-offset"])
+    async for chunk in request.stream():
+        offset += len(chunk)
+    return Response(status_code=204, headers={"Upload-Offset": str(offset)})
+
+
+def start_sink() -> Tuple[multiprocessing.Process, str]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = multiprocessing.Process(
+        target=uvicorn.run, args=(sink,), kwargs={"host": "127.0.0.1", "port": port, "log_level": "error"},
+        daemon=True,
+    )
+    process.start()
+    url = f"http://127.0.0.1:{port}/upload/resumable/benchmark"
+    while True:
+        try:
+            httpx.get(url)
+            return process, url
+        except httpx.TransportError:
+            time.sleep(0.05)
+
+
+def peak_rss_mib() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def request_body(size: int) -> AsyncIterator[bytes]:
+    piece = os.urandom(REQUEST_CHUNK)
+    for _ in range(size // REQUEST_CHUNK):
+        yield piece
+
+
+async def streamed(upload_url: str, size: int) -> int:
+    digest = hashlib.sha256()
+    return await write_upload_chunks(upload_url, 0, hash_chunks(request_body(size), digest))
+
+
+async def buffered(upload_url: str, size: int) -> int:
+    body = b"".join([chunk async for chunk in request_body(size)])
+    hashlib.sha256(body)
+
+    async def pieces() -> AsyncIterator[bytes]:
+        yield body
+
+    return await write_upload_chunks(upload_url, 0, pieces())
+
+
+async def main() -> None:
+    process, upload_url = start_sink()
+    print(f"Baseline peak RSS {peak_rss_mib():.0f} MiB\n")
+    try:
+        for size in SIZES:
+            start = time.perf_counter()
+            offset = await streamed(upload_url, size)
+            elapsed = time.perf_counter() - start
+            assert offset == size
+            print(
+                f"streamed  {size // MIB:5d} MiB  {elapsed:5.1f} s  {size / MIB / elapsed:6.0f} MiB/s  "
+                f"peak RSS {peak_rss_mib():5.0f} MiB"
+            )
+
+        start = time.perf_counter()
+        await buffered(upload_url, BUFFERED_SIZE)
+        elapsed = time.perf_counter() - start
+        print(
+            f"buffered  {BUFFERED_SIZE // MIB:5d} MiB  {elapsed:5.1f} s  "
+            f"{BUFFERED_SIZE / MIB / elapsed:6.0f} MiB/s  peak RSS {peak_rss_mib():5.0f} MiB"
+        )
+    finally:
+        await close_storage_http_client()
+        process.terminate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+"""
+Chunked transcription against the local mock API (app.mock_transcription_api)
+over the http backend. Needs ffmpeg and ffprobe; skipped without them.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import threading
+import time
+
+import pytest
+import uvicorn
+
+from app.core.config import settings
+from app.mock_transcription_api import app as mock_app
+from app.services.backends import HttpTranscriptionBackend
+from app.services.chunking import (
+    detect_silences,
+    ffmpeg_available,
+    probe_duration,
+    transcribe_in_chunks,
+)
+from app.services.transcription import _open_local_media
+
+pytestmark = pytest.mark.skipif(not ffmpeg_available(), reason="ffmpeg and ffprobe are required")
+
+MINUTES = 8
+CHUNK_SECONDS = 60
+LATENCY_SECONDS = 2.0
+
+
+@pytest.fixture
+def chunked_settings(monkeypatch):
+    monkeypatch.setattr(settings, "TRANSCRIPTION_CHUNK_SECONDS", CHUNK_SECONDS)
+    monkeypatch.setattr(settings, "TRANSCRIPTION_CHUNK_SEARCH_SECONDS", 10.0)
+    monkeypatch.setattr(settings, "TRANSCRIPTION_MAX_CONCURRENCY", 8)
+    monkeypatch.setattr(settings, "MOCK_TRANSCRIPTION_LATENCY_SECONDS", LATENCY_SECONDS)
+    monkeypatch.setattr(settings, "MOCK_TRANSCRIPTION_FAILURE_RATE", 0.0)
+
+
+@pytest.fixture
+def mock_api_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(mock_app, host="127.0.0.1", port=port, log_level="error"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{port}/v1/transcribe"
+    server.should_exit = True
+
+
+@pytest.fixture
+def recording(tmp_path):
+    """A tone broken by a second of silence every 45 seconds: eight chunks of about a minute."""
+    path = str(tmp_path / "recording.wav")
+    subprocess.run(
+        [
+            settings.FFMPEG_PATH, "-v", "error", "-y",
+            "-f", "lavfi", "-i", f"sine=frequency=220:sample_rate=16000:duration={MINUTES * 60}",
+            "-af", "volume='if(lt(mod(t,45),44),1,0)':eval=frame",
+            "-ac", "1", "-c:a", "pcm_s16le", path,
+        ],
+        check=True,
+    )
+    return path
+
+
+def test_parallel_chunks_speed_up_near_linearly(chunked_settings, mock_api_url, recording):
+    async def run():
+        backend = HttpTranscriptionBackend(mock_api_url, "test")
+        try:
+            start = time.perf_counter()
+            await probe_duration(recording)
+            await detect_silences(recording)
+            prepare = time.perf_counter() - start
+
+            timings = {}
+            for parallelism in (1, 4):
+                start = time.perf_counter()
+                result = await transcribe_in_chunks(
+                    recording,
+                    lambda chunk: backend.transcribe(lambda: _open_local_media(chunk)),
+                    parallelism=parallelism,
+                )
+                timings[parallelism] = time.perf_counter() - start - prepare
+            return timings, result
+        finally:
+            await backend.aclose()
+
+    timings, result = asyncio.run(run())
+    assert result["segments"]
+    # Eight chunks of LATENCY_SECONDS each: about 16 s one at a time, 4 s four at a time,
+    # plus encoding, which does not shrink on a single core
+    assert timings[1] / timings[4] >= 3.0
+
+
+def test_failed_chunk_stops_the_others(chunked_settings, recording):
+    running = 0
+    finished_after_failure = 0
+    failed = asyncio.Event()
+
+    async def transcribe(chunk_path: str):
+        nonlocal running, finished_after_failure
+        running += 1
+        try:
+            if chunk_path.endswith("chunk-0.flac"):
+                await asyncio.sleep(0.1)
+                failed.set()
+                raise RuntimeError("chunk failed")
+            await asyncio.sleep(2)
+            assert os.path.exists(chunk_path)
+            if failed.is_set():
+                finished_after_failure += 1
+            return {"text": "", "segments": []}
+        finally:
+            running -= 1
+
+    async def run():
+        with pytest.raises(RuntimeError, match="chunk failed"):
+            await transcribe_in_chunks(recording, transcribe, parallelism=4)
+        # Nothing is left running once the error has been raised
+        assert running == 0
+        await asyncio.sleep(2.5)
+        assert finished_after_failure == 0
+
+    asyncio.run(run())
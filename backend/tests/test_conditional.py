@@ -0,0 +1,56 @@
+"""
+Revalidation of compressed responses: a 304 must carry the ETag and Vary
+of the 200 the client cached.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.api.conditional import cache_headers, etag_matches, if_none_match, not_modified, strong_etag
+from app.api.middleware import CompressionMiddleware
+from app.api.responses import JSON_MEDIA_TYPE, negotiated_response
+from app.core.config import settings
+
+ETAG = strong_etag("document", 1)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "COMPRESSION_ENABLED", True)
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/document")
+    async def document(request: Request):
+        validator = if_none_match(request)
+        if etag_matches(validator, ETAG):
+            return not_modified(ETAG, validator)
+        text = "word " * max(settings.COMPRESSION_MIN_BYTES, 1000)
+        return negotiated_response(JSON_MEDIA_TYPE, {"text": text}, headers=cache_headers(ETAG))
+
+    return TestClient(app)
+
+
+def test_revalidating_a_compressed_response_keeps_its_headers(client):
+    cached = client.get("/document", headers={"Accept-Encoding": "gzip"})
+    assert cached.status_code == 200
+    assert cached.headers["content-encoding"] == "gzip"
+
+    revalidated = client.get(
+        "/document", headers={"Accept-Encoding": "gzip", "If-None-Match": cached.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == cached.headers["etag"] == f"W/{ETAG}"
+    assert revalidated.headers["vary"] == cached.headers["vary"] == "Accept, Accept-Encoding"
+
+
+def test_revalidating_an_uncompressed_response_keeps_its_strong_etag(client):
+    cached = client.get("/document", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in cached.headers
+
+    revalidated = client.get("/document", headers={"If-None-Match": cached.headers["etag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == cached.headers["etag"] == ETAG
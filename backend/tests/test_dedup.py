@@ -0,0 +1,139 @@
+"""
+Result reuse for files uploaded in several requests, which are only hashed
+by their transcription job. Storage and the database are replaced with
+in-memory stand-ins.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.core.config import settings
+from app.services import transcription, uploads
+from app.services.backends import TranscriptionBackend
+from app.services.uploads import upload_session_repository
+
+MEDIA = b"identical meeting recording" * 1000
+
+
+class CountingBackend(TranscriptionBackend):
+    name = "counting"
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def _transcribe_once(self, open_media):
+        self.calls += 1
+        async with open_media() as media:
+            async for _ in media.chunks:
+                pass
+        return {"text": "hello", "segments": [{"start": 0.0, "end": 1.0, "text": "hello"}]}
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    monkeypatch.setattr(settings, "TRANSCRIPTION_DEDUP", True)
+    monkeypatch.setattr(settings, "TRANSCRIPTION_CHUNKING", False)
+    monkeypatch.setattr(settings, "TRANSCRIPTION_SPOOL_MEDIA", False)
+
+    objects = {}
+    files = {}
+    results = {}
+    completed = {}
+
+    async def iter_object(path, chunk_size=None, bucket=None):
+        yield objects[path]
+
+    async def create_file_record(user_id, filename, size, storage_path, content_sha256=None, media=None):
+        file = {
+            "id": f"file-{len(files)}",
+            "user_id": user_id,
+            "size": size,
+            "storage_path": storage_path,
+            "content_sha256": content_sha256,
+            "duration_seconds": 60.0,
+        }
+        files[file["id"]] = file
+        return dict(file)
+
+    async def get_file(file_id, user_id=None):
+        return dict(files[file_id])
+
+    async def update_file(file_id, values):
+        files[file_id].update(values)
+
+    async def get_result(content_sha256, settings_key):
+        return results.get((content_sha256, settings_key))
+
+    async def put_result(content_sha256, settings_key, text, segments, transcription_id):
+        results[(content_sha256, settings_key)] = {"text": text, "segments": segments}
+
+    async def update_status(transcription_id, status, progress=None):
+        pass
+
+    async def complete(transcription_id, text, segments):
+        completed[transcription_id] = text
+
+    async def execute(query):
+        return MagicMock(data=[])
+
+    async def probe_stored_media(path, size):
+        return {}
+
+    counting = CountingBackend()
+    monkeypatch.setattr(uploads, "iter_object", iter_object)
+    monkeypatch.setattr(uploads, "create_file_record", create_file_record)
+    monkeypatch.setattr(uploads, "probe_stored_media", probe_stored_media)
+    monkeypatch.setattr(uploads, "execute", execute)
+    monkeypatch.setattr(upload_session_repository, "_table", MagicMock())
+    monkeypatch.setattr(transcription, "iter_object", iter_object)
+    monkeypatch.setattr(transcription, "get_transcription_backend", lambda: counting)
+    monkeypatch.setattr(transcription.file_repository, "get_file", get_file)
+    monkeypatch.setattr(transcription.file_repository, "update_file", update_file)
+    monkeypatch.setattr(transcription.transcription_result_cache, "get", get_result)
+    monkeypatch.setattr(transcription.transcription_result_cache, "put", put_result)
+    monkeypatch.setattr(transcription.transcription_repository, "update_status", update_status)
+    monkeypatch.setattr(transcription.transcription_repository, "complete", complete)
+    counting.objects = objects
+    counting.completed = completed
+    return counting
+
+
+async def _upload_and_transcribe(backend, number: int, reuse_result: bool = True) -> None:
+    session = {
+        "id": f"session-{number}",
+        "user_id": "user",
+        "original_filename": "meeting.mp3",
+        "size": len(MEDIA),
+        "storage_path": f"user/upload-{number}.mp3",
+    }
+    backend.objects[session["storage_path"]] = MEDIA
+    # Resumable and signed uploads are completed without a hash
+    file = await upload_session_repository.complete_session(session)
+    assert file["content_sha256"] is None
+    await transcription.process_transcription(
+        f"transcription-{number}", file["id"], "user", reuse_result=reuse_result
+    )
+
+
+def test_second_resumable_upload_reuses_the_first_result(backend):
+    async def run():
+        await _upload_and_transcribe(backend, 1)
+        await _upload_and_transcribe(backend, 2)
+
+    asyncio.run(run())
+    assert backend.calls == 1
+    assert backend.completed == {"transcription-1": "hello", "transcription-2": "hello"}
+
+
+def test_forced_transcription_calls_the_backend_again(backend):
+    async def run():
+        await _upload_and_transcribe(backend, 1)
+        await _upload_and_transcribe(backend, 2, reuse_result=False)
+
+    asyncio.run(run())
+    assert backend.calls == 2
@@ -0,0 +1,219 @@
+"""
+Header-only media probing, against small synthetic headers of each format.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+import asyncio
+import random
+import struct
+
+import pytest
+
+from app.services.probe import MediaReader, probe_media
+
+
+def probe(data: bytes):
+    async def fetch(offset: int, length: int) -> bytes:
+        return data[offset:offset + length]
+
+    return asyncio.run(probe_media(MediaReader(fetch, len(data))))
+
+
+# WAV
+
+def wav(seconds: float, sample_rate: int = 16000, channels: int = 1) -> bytes:
+    byte_rate = sample_rate * channels * 2
+    data_size = int(seconds * byte_rate)
+    fmt = struct.pack("<HHIIHH", 1, channels, sample_rate, byte_rate, channels * 2, 16)
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", data_size)
+    return b"RIFF" + struct.pack("<I", len(body) + data_size) + body + bytes(data_size)
+
+
+def test_wav():
+    assert probe(wav(2.5, 16000, 2)) == {
+        "media_format": "wav", "duration_seconds": 2.5, "sample_rate": 16000, "channels": 2,
+    }
+
+
+def test_streamed_wav_without_a_data_size_runs_to_the_end():
+    data = bytearray(wav(1.0))
+    data[40:44] = struct.pack("<I", 0xFFFFFFFF)
+    assert probe(bytes(data))["duration_seconds"] == 1.0
+
+
+# MP3
+
+# MPEG-1 layer III, 128 kbit/s, 44.1 kHz, joint stereo
+MP3_HEADER = b"\xff\xfb\x90\x64"
+MP3_FRAME_BYTES = 417
+
+
+def mp3_frames(count: int) -> bytes:
+    frame = MP3_HEADER + bytes(MP3_FRAME_BYTES - 4)
+    return frame * count
+
+
+def test_constant_bitrate_mp3():
+    data = mp3_frames(100)
+    assert probe(data) == {
+        "media_format": "mp3",
+        "duration_seconds": round(len(data) * 8 / 128000, 3),
+        "sample_rate": 44100,
+        "channels": 2,
+    }
+
+
+def test_mp3_with_an_id3_tag_and_a_xing_header():
+    # Xing header after the 32 bytes of stereo MPEG-1 side information
+    xing = MP3_HEADER + bytes(32) + b"Xing" + struct.pack(">II", 1, 441)
+    first = xing + bytes(MP3_FRAME_BYTES - len(xing))
+    # ID3v2 tag of 300 bytes, its size written as a syncsafe integer
+    id3 = b"ID3\x04\x00\x00" + bytes([0, 0, 300 >> 7, 300 & 0x7F]) + bytes(300)
+    result = probe(id3 + first + mp3_frames(10))
+    assert result["duration_seconds"] == round(441 * 1152 / 44100, 3)
+
+
+def test_mp3_with_a_vbri_header():
+    vbri = MP3_HEADER + bytes(32) + b"VBRI" + bytes(10) + struct.pack(">I", 882)
+    first = vbri + bytes(MP3_FRAME_BYTES - len(vbri))
+    assert probe(first + mp3_frames(10))["duration_seconds"] == round(882 * 1152 / 44100, 3)
+
+
+# MP4
+
+def atom(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I", 8 + len(payload)) + kind + payload
+
+
+def mvhd(version: int, timescale: int, duration: int) -> bytes:
+    if version == 1:
+        payload = b"\x01\x00\x00\x00" + bytes(16) + struct.pack(">IQ", timescale, duration)
+    else:
+        payload = b"\x00\x00\x00\x00" + bytes(8) + struct.pack(">II", timescale, duration)
+    return atom(b"mvhd", payload + bytes(80))
+
+
+def sound_trak(sample_rate: int, channels: int) -> bytes:
+    hdlr = atom(b"hdlr", bytes(8) + b"soun" + bytes(12))
+    entry = bytes(16) + struct.pack(">HH", channels, 16) + bytes(4) + struct.pack(">I", sample_rate << 16)
+    stsd = atom(b"stsd", bytes(4) + struct.pack(">I", 1) + struct.pack(">I", 8 + len(entry)) + b"mp4a" + entry)
+    stbl = atom(b"stbl", stsd)
+    return atom(b"trak", atom(b"mdia", hdlr + atom(b"minf", stbl)))
+
+
+FTYP = atom(b"ftyp", b"M4A \x00\x00\x00\x00M4A isom")
+
+
+@pytest.mark.parametrize("version", [0, 1])
+def test_mp4(version):
+    moov = atom(b"moov", mvhd(version, 1000, 90_500) + sound_trak(44100, 2))
+    assert probe(FTYP + moov + atom(b"mdat", bytes(1000))) == {
+        "media_format": "mp4", "duration_seconds": 90.5, "sample_rate": 44100, "channels": 2,
+    }
+
+
+def test_mp4_with_moov_after_the_media_data():
+    moov = atom(b"moov", mvhd(0, 600, 1200) + sound_trak(48000, 1))
+    result = probe(FTYP + atom(b"mdat", bytes(200_000)) + moov)
+    assert (result["duration_seconds"], result["sample_rate"], result["channels"]) == (2.0, 48000, 1)
+
+
+# Ogg
+
+def ogg_page(granule: int, packet: bytes) -> bytes:
+    return b"OggS\x00\x02" + struct.pack("<q", granule) + bytes(12) + bytes([1, len(packet)]) + packet
+
+
+def test_ogg_vorbis():
+    ident = b"\x01vorbis" + struct.pack("<IBI", 0, 2, 22050) + bytes(13)
+    data = ogg_page(0, ident) + bytes(5000) + ogg_page(22050 * 3, b"x")
+    assert probe(data) == {
+        "media_format": "ogg-vorbis", "duration_seconds": 3.0, "sample_rate": 22050, "channels": 2,
+    }
+
+
+def test_ogg_opus_counts_48_khz_granules_after_pre_skip():
+    head = b"OpusHead" + struct.pack("<BBHI", 1, 1, 312, 16000) + bytes(3)
+    data = ogg_page(0, head) + bytes(5000) + ogg_page(48000 * 4 + 312, b"x")
+    assert probe(data) == {
+        "media_format": "ogg-opus", "duration_seconds": 4.0, "sample_rate": 16000, "channels": 1,
+    }
+
+
+# FLAC
+
+def flac(sample_rate: int, channels: int, total_samples: int) -> bytes:
+    packed = (sample_rate << 44) | ((channels - 1) << 41) | (15 << 36) | total_samples
+    streaminfo = struct.pack(">HH", 4096, 4096) + bytes(6) + packed.to_bytes(8, "big") + bytes(16)
+    return b"fLaC" + b"\x80" + len(streaminfo).to_bytes(3, "big") + streaminfo
+
+
+def test_flac():
+    assert probe(flac(44100, 2, 44100 * 7)) == {
+        "media_format": "flac", "duration_seconds": 7.0, "sample_rate": 44100, "channels": 2,
+    }
+
+
+def test_flac_with_unknown_sample_count_has_no_duration():
+    assert probe(flac(16000, 1, 0))["duration_seconds"] is None
+
+
+# WebM / Matroska
+
+def ebml_size(size: int) -> bytes:
+    # Eight-byte sizes exercise the longest variable-length integers
+    return bytes([0x01]) + size.to_bytes(7, "big")
+
+
+def element(element_id: int, payload: bytes) -> bytes:
+    id_bytes = element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+    return id_bytes + ebml_size(len(payload)) + payload
+
+
+def webm(duration_ms: float, sample_rate: float, channels: int) -> bytes:
+    header = element(0x1A45DFA3, element(0x4282, b"webm"))
+    info = element(0x1549A966, element(0x2AD7B1, (1_000_000).to_bytes(3, "big")) + element(0x4489, struct.pack(">d", duration_ms)))
+    audio = element(0xE1, element(0xB5, struct.pack(">f", sample_rate)) + element(0x9F, bytes([channels])))
+    tracks = element(0x1654AE6B, element(0xAE, element(0x83, b"\x02") + audio))
+    cluster = element(0x1F43B675, bytes(100))
+    return header + element(0x18538067, info + tracks + cluster)
+
+
+def test_webm():
+    assert probe(webm(12_345.0, 48000.0, 2)) == {
+        "media_format": "webm", "duration_seconds": 12.345, "sample_rate": 48000, "channels": 2,
+    }
+
+
+# Truncated and garbage input
+
+SAMPLES = {
+    "wav": wav(1.0),
+    "mp3": mp3_frames(3),
+    "mp4": FTYP + atom(b"moov", mvhd(0, 1000, 1000) + sound_trak(44100, 2)),
+    "ogg": ogg_page(0, b"\x01vorbis" + struct.pack("<IBI", 0, 2, 22050) + bytes(13)),
+    "flac": flac(44100, 2, 44100),
+    "webm": webm(1000.0, 48000.0, 2),
+}
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+@pytest.mark.parametrize("length", [0, 4, 12, 20, 30])
+def test_truncated_headers_are_not_probed(name, length):
+    assert probe(SAMPLES[name][:length]) is None
+
+
+def test_garbage_is_not_probed():
+    generator = random.Random(0)
+    for _ in range(200):
+        assert probe(bytes(generator.getrandbits(8) for _ in range(generator.randrange(1, 2000)))) is None
+
+
+@pytest.mark.parametrize("magic", [b"RIFF\x00\x00\x00\x00WAVE", b"\x00\x00\x00\x00ftyp", b"OggS", b"fLaC", b"\x1a\x45\xdf\xa3", b"ID3"])
+def test_magic_followed_by_garbage_is_not_probed(magic):
+    generator = random.Random(1)
+    for _ in range(50):
+        data = magic + bytes(generator.getrandbits(8) for _ in range(generator.randrange(0, 300)))
+        result = probe(data)
+        assert result is None or result["duration_seconds"] is None or result["duration_seconds"] >= 0
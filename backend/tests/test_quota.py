@@ -0,0 +1,45 @@
+"""
+Quota checks for files whose duration the upload probe could not read.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services import quota
+from app.services.quota import QuotaExceededError, billable_seconds, check_quota, files_within_quota
+
+USER = {"id": "user", "quota_minutes": 60}
+
+
+@pytest.fixture(autouse=True)
+def nothing_used(monkeypatch):
+    monkeypatch.setattr(settings, "QUOTA_UNKNOWN_BITRATE_KBPS", 32.0)
+
+    async def get_used_seconds(user_id):
+        return 0.0
+
+    monkeypatch.setattr(quota, "get_used_seconds", get_used_seconds)
+
+
+def test_unknown_duration_is_estimated_from_size():
+    # 32 kbps is 4000 bytes a second
+    assert billable_seconds({"size": 4_000_000, "duration_seconds": None}) == 1000.0
+    assert billable_seconds({"size": 4_000_000, "duration_seconds": 10.0}) == 10.0
+
+
+def test_unprobeable_file_is_not_free():
+    # About 2.8 hours at the assumed bitrate, against an hour of quota
+    file = {"id": "file", "size": 40_000_000, "duration_seconds": None}
+    with pytest.raises(QuotaExceededError):
+        asyncio.run(check_quota(USER, [file]))
+    assert asyncio.run(files_within_quota(USER, [file])) == []
+
+
+def test_small_unprobeable_file_fits():
+    file = {"id": "file", "size": 400_000, "duration_seconds": None}
+    asyncio.run(check_quota(USER, [file]))
+    assert asyncio.run(files_within_quota(USER, [file])) == [file]
@@ -0,0 +1,36 @@
+"""
+Time-window lookups on packed segments.
+
+Run from the backend directory:
+    python -m pytest tests
+"""
+import random
+
+from app.services.segments import PackedSegments
+
+
+def test_window_skips_segments_that_ended_before_it():
+    packed = PackedSegments.from_segments([
+        {"start": 0.0, "end": 100.0, "text": "long"},
+        {"start": 1.0, "end": 2.0, "text": "short"},
+        {"start": 50.0, "end": 51.0, "text": "inside"},
+    ])
+    assert [segment["text"] for segment in packed.window(10.0, 60.0)] == ["long", "inside"]
+
+
+def test_window_matches_a_linear_scan():
+    generator = random.Random(0)
+    segments = []
+    for _ in range(500):
+        start = generator.uniform(0, 1000)
+        segments.append({"start": start, "end": start + generator.expovariate(1 / 5), "text": "x"})
+    packed = PackedSegments.from_segments(segments)
+
+    for _ in range(200):
+        start = generator.uniform(-10, 1010)
+        end = start + generator.uniform(0, 50)
+        expected = [
+            index for index in range(len(packed)) if packed.ends[index] > start and packed.starts[index] < end
+        ]
+        assert packed.window_indices(start, end) == expected
+    assert packed.window_indices() == list(range(len(packed)))
@@ -0,0 +1,26 @@
+-- Store the SHA-256 of each uploaded file's contents
+ALTER TABLE public.files ADD COLUMN IF NOT EXISTS content_sha256 TEXT;
+
+-- Whether a job may finish with an earlier result for the same media.
+-- Files uploaded in several requests are only hashed by their job, which
+-- then looks the result up itself; forced transcriptions skip that.
+ALTER TABLE public.transcription_jobs ADD COLUMN IF NOT EXISTS reuse_result BOOLEAN DEFAULT true NOT NULL;
+
+-- Create index for finding earlier uploads of the same media
+CREATE INDEX IF NOT EXISTS files_content_sha256_idx ON public.files(content_sha256);
+
+-- Create transcription results cache, keyed by media content and the
+-- settings that produced the transcript. Only the service key reads it.
+CREATE TABLE IF NOT EXISTS public.transcription_results (
+  content_sha256 TEXT NOT NULL,
+  settings_key TEXT NOT NULL,
+  text TEXT NOT NULL,
+  segments JSONB,
+  source_transcription_id UUID REFERENCES public.transcriptions(id) ON DELETE SET NULL,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL,
+  PRIMARY KEY (content_sha256, settings_key)
+);
+
+-- Enable Row Level Security with no policies, so users cannot read
+-- other users' results directly
+ALTER TABLE public.transcription_results ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,55 @@
+-- Mirror each user's email onto user_profiles so it can be looked up by index
+ALTER TABLE public.user_profiles ADD COLUMN IF NOT EXISTS email TEXT;
+
+-- Backfill existing users (and any that are missing a profile)
+INSERT INTO public.user_profiles (id, email)
+SELECT id, lower(email) FROM auth.users
+ON CONFLICT (id) DO UPDATE SET email = EXCLUDED.email;
+
+-- Create index for email lookups (emails are stored lower-cased)
+CREATE UNIQUE INDEX IF NOT EXISTS user_profiles_email_idx ON public.user_profiles(email);
+
+-- Store the email when a profile is created for a new user
+CREATE OR REPLACE FUNCTION public.handle_new_user() 
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO public.user_profiles (id, email)
+  VALUES (NEW.id, lower(NEW.email));
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Keep the email in sync when a user changes it
+CREATE OR REPLACE FUNCTION public.handle_user_email_change() 
+RETURNS TRIGGER AS $$
+BEGIN
+  UPDATE public.user_profiles SET email = lower(NEW.email) WHERE id = NEW.id;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+DROP TRIGGER IF EXISTS on_auth_user_email_changed ON auth.users;
+CREATE TRIGGER on_auth_user_email_changed
+  AFTER UPDATE OF email ON auth.users
+  FOR EACH ROW EXECUTE FUNCTION public.handle_user_email_change();
+
+-- Look up a user and their profile by email in a single indexed query
+CREATE OR REPLACE FUNCTION public.get_user_by_email(p_email TEXT)
+RETURNS TABLE (
+  id UUID,
+  email TEXT,
+  created_at TIMESTAMP WITH TIME ZONE,
+  banned_until TIMESTAMP WITH TIME ZONE,
+  quota_minutes INTEGER,
+  is_admin BOOLEAN
+) AS $$
+  SELECT p.id, u.email::TEXT, u.created_at, u.banned_until, p.quota_minutes, p.is_admin
+  FROM public.user_profiles p
+  JOIN auth.users u ON u.id = p.id
+  WHERE p.email = lower(p_email)
+  LIMIT 1;
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+-- Only the backend (service role) may resolve emails to users
+REVOKE EXECUTE ON FUNCTION public.get_user_by_email(TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.get_user_by_email(TEXT) TO service_role;
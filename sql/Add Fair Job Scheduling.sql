@@ -0,0 +1,134 @@
+-- Share transcription workers fairly between users. Jobs record the
+-- user's scheduling weight and the file's duration when they are queued.
+ALTER TABLE public.transcription_jobs ADD COLUMN IF NOT EXISTS weight REAL DEFAULT 1 NOT NULL;
+ALTER TABLE public.transcription_jobs ADD COLUMN IF NOT EXISTS duration_seconds DOUBLE PRECISION;
+
+-- Create indexes for counting each user's running jobs and ranking their ready ones
+CREATE INDEX IF NOT EXISTS transcription_jobs_running_user_idx
+  ON public.transcription_jobs(user_id) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS transcription_jobs_ready_user_idx
+  ON public.transcription_jobs(user_id, run_after) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS transcription_jobs_ready_user_duration_idx
+  ON public.transcription_jobs(user_id, duration_seconds) WHERE status = 'queued';
+
+-- The first-come, first-served claim is replaced by the fair one below
+DROP FUNCTION IF EXISTS public.claim_transcription_jobs(TEXT, INTEGER, INTEGER);
+DROP FUNCTION IF EXISTS public.claim_transcription_jobs(TEXT, INTEGER, INTEGER, DOUBLE PRECISION, DOUBLE PRECISION);
+DROP FUNCTION IF EXISTS public.claim_transcription_jobs(TEXT, INTEGER, INTEGER, INTEGER, DOUBLE PRECISION);
+
+-- Claim up to p_limit ready jobs for a worker, round-robin between users.
+--
+-- Each user's ready jobs are ranked: files of up to p_short_seconds first,
+-- then oldest first. A job's turn is the number of jobs its user would
+-- have running once it starts, divided by the user's weight, and the jobs
+-- with the earliest turns are claimed. So every user with work waiting
+-- gets a first slot before anyone gets a second, and a user of weight 2
+-- gets two slots for every one of a user of weight 1. No user gets more
+-- than p_user_limit running jobs (NULL for no limit).
+--
+-- Only the jobs that could be claimed are ranked, not the whole backlog:
+-- the users with ready jobs are found with a skip scan of the ready index,
+-- one probe per user, and each user contributes at most as many jobs as
+-- they could still start (p_limit, less any p_user_limit headroom used),
+-- read in index order.
+--
+-- Claims are serialized with an advisory lock so that workers claiming at
+-- the same time see each other's jobs: the per-user limit needs it, and
+-- without it concurrent claims pick the same jobs, skip them, and come
+-- back short. The lock is held only for this statement's transaction.
+-- Jobs whose lease expired (their worker died) are first requeued with
+-- backoff, or failed once out of attempts (see
+-- expire_transcription_job_leases).
+CREATE OR REPLACE FUNCTION public.claim_transcription_jobs(
+  p_worker_id TEXT,
+  p_limit INTEGER,
+  p_lease_seconds INTEGER,
+  p_user_limit INTEGER,
+  p_short_seconds DOUBLE PRECISION,
+  p_retry_base_seconds DOUBLE PRECISION,
+  p_retry_max_seconds DOUBLE PRECISION
+)
+RETURNS SETOF public.transcription_jobs AS $$
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('claim_transcription_jobs'));
+  PERFORM public.expire_transcription_job_leases(p_retry_base_seconds, p_retry_max_seconds);
+
+  RETURN QUERY
+  WITH RECURSIVE ready_users AS (
+    (SELECT q.user_id
+     FROM public.transcription_jobs q
+     WHERE q.status = 'queued' AND q.run_after <= now()
+     ORDER BY q.user_id
+     LIMIT 1)
+    UNION ALL
+    SELECT (SELECT q.user_id
+            FROM public.transcription_jobs q
+            WHERE q.status = 'queued' AND q.run_after <= now() AND q.user_id > u.user_id
+            ORDER BY q.user_id
+            LIMIT 1)
+    FROM ready_users u
+    WHERE u.user_id IS NOT NULL
+  ),
+  users AS (
+    SELECT u.user_id, running.jobs,
+           greatest(least(p_limit, coalesce(p_user_limit - running.jobs, p_limit)), 0) AS take
+    FROM ready_users u
+    CROSS JOIN LATERAL (
+      SELECT count(*) AS jobs
+      FROM public.transcription_jobs r
+      WHERE r.user_id = u.user_id AND r.status = 'running'
+    ) running
+    WHERE u.user_id IS NOT NULL
+  ),
+  ready AS (
+    -- A user's first `take` jobs are among their oldest `take` short jobs
+    -- and their oldest `take` jobs of any length
+    SELECT picked.id, picked.weight, picked.run_after, users.jobs, users.take,
+           row_number() OVER (
+             PARTITION BY users.user_id
+             ORDER BY picked.short DESC, picked.run_after
+           ) AS position
+    FROM users
+    CROSS JOIN LATERAL (
+      (SELECT q.id, q.weight, q.run_after, true AS short
+       FROM public.transcription_jobs q
+       WHERE q.user_id = users.user_id AND q.status = 'queued' AND q.run_after <= now()
+         AND q.duration_seconds <= p_short_seconds
+       ORDER BY q.run_after
+       LIMIT users.take)
+      UNION
+      (SELECT q.id, q.weight, q.run_after, coalesce(q.duration_seconds <= p_short_seconds, false)
+       FROM public.transcription_jobs q
+       WHERE q.user_id = users.user_id AND q.status = 'queued' AND q.run_after <= now()
+       ORDER BY q.run_after
+       LIMIT users.take)
+    ) picked
+  ),
+  candidates AS (
+    SELECT ready.id
+    FROM ready
+    WHERE ready.position <= ready.take
+    ORDER BY (ready.jobs + ready.position) / greatest(ready.weight, 0.01), ready.run_after
+    LIMIT p_limit
+  ),
+  locked AS (
+    SELECT l.id
+    FROM public.transcription_jobs l
+    WHERE l.id IN (SELECT candidates.id FROM candidates)
+    FOR UPDATE SKIP LOCKED
+  )
+  UPDATE public.transcription_jobs j
+  SET status = 'running',
+      locked_by = p_worker_id,
+      attempts = j.attempts + 1,
+      lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+      heartbeat_at = now(),
+      updated_at = now()
+  FROM locked
+  WHERE j.id = locked.id
+  RETURNING j.*;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+REVOKE EXECUTE ON FUNCTION public.claim_transcription_jobs(TEXT, INTEGER, INTEGER, INTEGER, DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.claim_transcription_jobs(TEXT, INTEGER, INTEGER, INTEGER, DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION) TO service_role;
@@ -0,0 +1,27 @@
+-- Store what the media probe reads from each upload's headers
+ALTER TABLE public.files ADD COLUMN IF NOT EXISTS sample_rate INTEGER;
+ALTER TABLE public.files ADD COLUMN IF NOT EXISTS channels SMALLINT;
+ALTER TABLE public.files ADD COLUMN IF NOT EXISTS media_format TEXT;
+
+-- Seconds of media a user has submitted for transcription since p_since.
+-- Failed transcriptions do not count. Files whose duration is not known
+-- yet count as their size over p_unknown_bytes_per_second. Uses the
+-- (user_id, created_at, id) index on transcriptions.
+DROP FUNCTION IF EXISTS public.get_transcribed_seconds(UUID, TIMESTAMP WITH TIME ZONE);
+CREATE OR REPLACE FUNCTION public.get_transcribed_seconds(
+  p_user_id UUID,
+  p_since TIMESTAMP WITH TIME ZONE,
+  p_unknown_bytes_per_second DOUBLE PRECISION
+)
+RETURNS DOUBLE PRECISION AS $$
+  SELECT coalesce(sum(coalesce(f.duration_seconds, f.size / p_unknown_bytes_per_second)), 0)::DOUBLE PRECISION
+  FROM public.transcriptions t
+  JOIN public.files f ON f.id = t.file_id
+  WHERE t.user_id = p_user_id
+    AND t.created_at >= p_since
+    AND t.status <> 'failed';
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+-- Only the backend (service role) may read usage, since it trusts p_user_id
+REVOKE EXECUTE ON FUNCTION public.get_transcribed_seconds(UUID, TIMESTAMP WITH TIME ZONE, DOUBLE PRECISION) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.get_transcribed_seconds(UUID, TIMESTAMP WITH TIME ZONE, DOUBLE PRECISION) TO service_role;
@@ -0,0 +1,4 @@
+-- Track whether a session uploads through the API (resumable) or straight
+-- to storage with a pre-signed URL (signed)
+ALTER TABLE public.upload_sessions
+  ADD COLUMN IF NOT EXISTS upload_method TEXT DEFAULT 'resumable' NOT NULL;
@@ -0,0 +1,55 @@
+-- Index transcript text for full-text search
+ALTER TABLE public.transcriptions
+  ADD COLUMN IF NOT EXISTS text_search TSVECTOR
+  GENERATED ALWAYS AS (to_tsvector('english', coalesce(text, ''))) STORED;
+
+-- Create index for searches scoped to one user. btree_gin lets user_id
+-- share the GIN index, so other users' matches are never visited.
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+CREATE INDEX IF NOT EXISTS transcriptions_user_id_text_search_idx
+  ON public.transcriptions USING GIN (user_id, text_search);
+
+-- Search a user's completed transcriptions, best match first. Only the
+-- requested page is ranked against the full set; snippets are built for
+-- that page alone, since ts_headline re-parses the whole text. Each row
+-- carries the transcription's version, to read its segments at.
+DROP FUNCTION IF EXISTS public.search_transcriptions(UUID, TEXT, INTEGER, INTEGER);
+CREATE OR REPLACE FUNCTION public.search_transcriptions(
+  p_user_id UUID,
+  p_query TEXT,
+  p_limit INTEGER,
+  p_offset INTEGER
+)
+RETURNS TABLE (
+  id UUID,
+  file_id UUID,
+  original_filename TEXT,
+  created_at TIMESTAMP WITH TIME ZONE,
+  version INTEGER,
+  rank REAL,
+  snippet TEXT
+) AS $$
+  WITH query AS (
+    SELECT websearch_to_tsquery('english', p_query) AS q
+  ),
+  page AS (
+    SELECT t.id, t.file_id, t.created_at, t.version, t.text, ts_rank_cd(t.text_search, query.q) AS rank
+    FROM public.transcriptions t, query
+    WHERE t.user_id = p_user_id
+      AND t.status = 'completed'
+      AND t.text_search @@ query.q
+    ORDER BY rank DESC, t.created_at DESC, t.id DESC
+    LIMIT p_limit OFFSET p_offset
+  )
+  SELECT page.id, page.file_id, f.original_filename, page.created_at, page.version, page.rank,
+         ts_headline('english', page.text, query.q,
+                     'StartSel=<mark>, StopSel=</mark>, MaxFragments=3, MaxWords=20, MinWords=8')
+  FROM page
+  CROSS JOIN query
+  LEFT JOIN public.files f ON f.id = page.file_id
+  ORDER BY page.rank DESC, page.created_at DESC, page.id DESC;
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+-- Only the backend (service role) may search, since it trusts p_user_id
+REVOKE EXECUTE ON FUNCTION public.search_transcriptions(UUID, TEXT, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.search_transcriptions(UUID, TEXT, INTEGER, INTEGER) TO service_role;
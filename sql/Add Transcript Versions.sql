@@ -0,0 +1,94 @@
+-- Version each transcription's edits, for optimistic concurrency
+ALTER TABLE public.transcriptions ADD COLUMN IF NOT EXISTS version INTEGER DEFAULT 1 NOT NULL;
+ALTER TABLE public.transcription_segments ADD COLUMN IF NOT EXISTS version INTEGER DEFAULT 1 NOT NULL;
+
+-- Save an edited transcript in one transaction. The write only applies if
+-- the transcription is still at p_expected_version (NULL skips the check).
+-- p_segments is a packed transcription_segments row, or NULL to change the
+-- text alone; segments can only be edited once transcription has completed.
+-- Returns 'ok', 'conflict', 'not_completed' or 'not_found' with the version
+-- the transcription is now at.
+CREATE OR REPLACE FUNCTION public.save_transcript_edit(
+  p_transcription_id UUID,
+  p_user_id UUID,
+  p_expected_version INTEGER,
+  p_text TEXT,
+  p_segments JSONB
+)
+RETURNS TABLE (
+  status TEXT,
+  version INTEGER,
+  updated_at TIMESTAMP WITH TIME ZONE
+) AS $$
+DECLARE
+  v_version INTEGER;
+  v_updated_at TIMESTAMP WITH TIME ZONE;
+  v_status TEXT;
+BEGIN
+  UPDATE public.transcriptions t
+  SET text = p_text,
+      -- Packed storage becomes the only copy of edited segments
+      segments = CASE WHEN p_segments IS NULL THEN t.segments ELSE NULL END,
+      version = t.version + 1,
+      updated_at = now()
+  WHERE t.id = p_transcription_id
+    AND t.user_id = p_user_id
+    AND (p_expected_version IS NULL OR t.version = p_expected_version)
+    AND (p_segments IS NULL OR t.status = 'completed')
+  RETURNING t.version, t.updated_at INTO v_version, v_updated_at;
+
+  IF v_version IS NULL THEN
+    SELECT t.version, t.updated_at, t.status INTO v_version, v_updated_at, v_status
+    FROM public.transcriptions t
+    WHERE t.id = p_transcription_id AND t.user_id = p_user_id;
+    RETURN QUERY SELECT
+      CASE
+        WHEN v_version IS NULL THEN 'not_found'
+        WHEN p_expected_version IS NOT NULL AND v_version <> p_expected_version THEN 'conflict'
+        ELSE 'not_completed'
+      END,
+      v_version,
+      v_updated_at;
+    RETURN;
+  END IF;
+
+  IF p_segments IS NULL THEN
+    UPDATE public.transcription_segments s
+    SET version = v_version
+    WHERE s.transcription_id = p_transcription_id;
+  ELSE
+    INSERT INTO public.transcription_segments (
+      transcription_id, version, segment_count, starts, ends, text, text_offsets,
+      speaker_ids, speakers, confidences
+    )
+    VALUES (
+      p_transcription_id,
+      v_version,
+      (p_segments->>'segment_count')::INTEGER,
+      p_segments->>'starts',
+      p_segments->>'ends',
+      p_segments->>'text',
+      p_segments->>'text_offsets',
+      p_segments->>'speaker_ids',
+      p_segments->'speakers',
+      p_segments->>'confidences'
+    )
+    ON CONFLICT (transcription_id) DO UPDATE SET
+      version = EXCLUDED.version,
+      segment_count = EXCLUDED.segment_count,
+      starts = EXCLUDED.starts,
+      ends = EXCLUDED.ends,
+      text = EXCLUDED.text,
+      text_offsets = EXCLUDED.text_offsets,
+      speaker_ids = EXCLUDED.speaker_ids,
+      speakers = EXCLUDED.speakers,
+      confidences = EXCLUDED.confidences;
+  END IF;
+
+  RETURN QUERY SELECT 'ok'::TEXT, v_version, v_updated_at;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Only the backend (service role) may save edits, since it trusts p_user_id
+REVOKE EXECUTE ON FUNCTION public.save_transcript_edit(UUID, UUID, INTEGER, TEXT, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.save_transcript_edit(UUID, UUID, INTEGER, TEXT, JSONB) TO service_role;
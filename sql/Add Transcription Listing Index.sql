@@ -0,0 +1,10 @@
+-- Create index matching the keyset pagination order of GET /transcriptions
+CREATE INDEX IF NOT EXISTS transcriptions_user_id_created_at_id_idx
+  ON public.transcriptions(user_id, created_at DESC, id DESC);
+
+-- Create index for listings filtered by status
+CREATE INDEX IF NOT EXISTS transcriptions_user_id_status_created_at_id_idx
+  ON public.transcriptions(user_id, status, created_at DESC, id DESC);
+
+-- The composite indexes cover lookups by user_id alone
+DROP INDEX IF EXISTS public.transcriptions_user_id_idx;
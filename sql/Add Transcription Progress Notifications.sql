@@ -0,0 +1,25 @@
+-- Store how far a running transcription has got (0.0 to 1.0)
+ALTER TABLE public.transcriptions ADD COLUMN IF NOT EXISTS progress REAL;
+
+-- Notify listening API processes whenever a transcription's status or
+-- progress changes, whoever made the change
+CREATE OR REPLACE FUNCTION public.notify_transcription_progress()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT'
+     OR NEW.status IS DISTINCT FROM OLD.status
+     OR NEW.progress IS DISTINCT FROM OLD.progress THEN
+    PERFORM pg_notify('transcription_progress', json_build_object(
+      'id', NEW.id,
+      'status', NEW.status,
+      'progress', NEW.progress
+    )::TEXT);
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS on_transcription_progress ON public.transcriptions;
+CREATE TRIGGER on_transcription_progress
+  AFTER INSERT OR UPDATE OF status, progress ON public.transcriptions
+  FOR EACH ROW EXECUTE FUNCTION public.notify_transcription_progress();
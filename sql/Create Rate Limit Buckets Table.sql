@@ -0,0 +1,49 @@
+-- Create token buckets for API rate limits shared between API processes
+-- (RATE_LIMIT_STORE=postgres). Unlogged, since losing them in a crash only
+-- refills them; every request updates a row, and the spare room in each
+-- page lets those updates stay on the page.
+CREATE UNLOGGED TABLE IF NOT EXISTS public.rate_limit_buckets (
+  key TEXT PRIMARY KEY,  -- route group and client, e.g. "files:user:<id>"
+  tokens DOUBLE PRECISION NOT NULL,
+  updated_at TIMESTAMP WITH TIME ZONE NOT NULL
+) WITH (fillfactor = 70);
+
+-- Enable Row Level Security (no policies: only the service role uses the buckets)
+ALTER TABLE public.rate_limit_buckets ENABLE ROW LEVEL SECURITY;
+
+-- Take a token from bucket p_key, which holds up to p_burst tokens and
+-- refills at p_rate tokens per second. Returns 0 if a token was taken, or
+-- else the seconds until one will be available. The upsert locks the row,
+-- so concurrent requests for the same key are counted one after another.
+-- Now and then, buckets idle for an hour (long since full) are removed.
+CREATE OR REPLACE FUNCTION public.take_rate_limit_token(
+  p_key TEXT,
+  p_rate DOUBLE PRECISION,
+  p_burst DOUBLE PRECISION
+)
+RETURNS DOUBLE PRECISION AS $$
+DECLARE
+  v_now TIMESTAMP WITH TIME ZONE := clock_timestamp();
+  v_tokens DOUBLE PRECISION;
+BEGIN
+  INSERT INTO public.rate_limit_buckets AS b (key, tokens, updated_at)
+  VALUES (p_key, p_burst, v_now)
+  ON CONFLICT (key) DO UPDATE
+  SET tokens = least(p_burst, b.tokens + greatest(extract(epoch FROM v_now - b.updated_at), 0) * p_rate),
+      updated_at = v_now
+  RETURNING b.tokens INTO v_tokens;
+
+  IF random() < 0.001 THEN
+    DELETE FROM public.rate_limit_buckets WHERE updated_at < v_now - interval '1 hour';
+  END IF;
+
+  IF v_tokens < 1 THEN
+    RETURN (1 - v_tokens) / p_rate;
+  END IF;
+  UPDATE public.rate_limit_buckets SET tokens = v_tokens - 1 WHERE key = p_key;
+  RETURN 0;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+REVOKE EXECUTE ON FUNCTION public.take_rate_limit_token(TEXT, DOUBLE PRECISION, DOUBLE PRECISION) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.take_rate_limit_token(TEXT, DOUBLE PRECISION, DOUBLE PRECISION) TO service_role;
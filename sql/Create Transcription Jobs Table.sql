@@ -0,0 +1,123 @@
+-- Create transcription job queue (processed by `python -m app.worker`)
+CREATE TABLE IF NOT EXISTS public.transcription_jobs (
+  id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+  transcription_id UUID REFERENCES public.transcriptions(id) ON DELETE CASCADE NOT NULL,
+  file_id UUID REFERENCES public.files(id) ON DELETE CASCADE NOT NULL,
+  user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE NOT NULL,
+  status TEXT DEFAULT 'queued' NOT NULL,  -- queued, running, completed, failed
+  attempts INTEGER DEFAULT 0 NOT NULL,
+  max_attempts INTEGER DEFAULT 3 NOT NULL,
+  run_after TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL,
+  locked_by TEXT,
+  lease_expires_at TIMESTAMP WITH TIME ZONE,
+  heartbeat_at TIMESTAMP WITH TIME ZONE,
+  last_error TEXT,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL,
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+-- Create indexes for claiming ready jobs and reclaiming expired leases
+CREATE INDEX IF NOT EXISTS transcription_jobs_ready_idx
+  ON public.transcription_jobs(run_after) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS transcription_jobs_lease_idx
+  ON public.transcription_jobs(lease_expires_at) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS transcription_jobs_transcription_id_idx
+  ON public.transcription_jobs(transcription_id);
+
+-- Enable Row Level Security (no policies: only the service role uses the queue)
+ALTER TABLE public.transcription_jobs ENABLE ROW LEVEL SECURITY;
+
+-- Requeue jobs whose lease expired: their worker died, possibly killed by
+-- the job itself (out of memory, a crashed decoder). That counts as a
+-- failed attempt, so the job is retried with the same backoff as any
+-- failure (JOB_RETRY_BASE_SECONDS doubling per attempt up to
+-- JOB_RETRY_MAX_SECONDS, with jitter), and failed once it has used all
+-- its attempts.
+CREATE OR REPLACE FUNCTION public.expire_transcription_job_leases(
+  p_retry_base_seconds DOUBLE PRECISION,
+  p_retry_max_seconds DOUBLE PRECISION
+)
+RETURNS VOID AS $$
+BEGIN
+  WITH expired AS (
+    UPDATE public.transcription_jobs e
+    SET status = CASE WHEN e.attempts >= e.max_attempts THEN 'failed' ELSE 'queued' END,
+        run_after = CASE WHEN e.attempts >= e.max_attempts THEN e.run_after
+          ELSE now() + make_interval(secs =>
+            least(p_retry_max_seconds, p_retry_base_seconds * 2 ^ greatest(e.attempts - 1, 0))
+            * (0.5 + random() / 2))
+          END,
+        locked_by = NULL,
+        lease_expires_at = NULL,
+        last_error = 'Lease expired: the worker stopped responding',
+        updated_at = now()
+    WHERE e.status = 'running' AND e.lease_expires_at < now()
+    RETURNING e.transcription_id, e.status
+  )
+  UPDATE public.transcriptions t
+  SET status = CASE WHEN expired.status = 'failed' THEN 'failed' ELSE 'pending' END,
+      text = CASE WHEN expired.status = 'failed' THEN 'Error: the worker stopped responding' ELSE t.text END
+  FROM expired
+  WHERE t.id = expired.transcription_id;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+-- Claim up to p_limit ready jobs for a worker, after requeueing those whose
+-- lease expired. SKIP LOCKED lets many workers claim concurrently without
+-- blocking on each other.
+CREATE OR REPLACE FUNCTION public.claim_transcription_jobs(
+  p_worker_id TEXT,
+  p_limit INTEGER,
+  p_lease_seconds INTEGER,
+  p_retry_base_seconds DOUBLE PRECISION,
+  p_retry_max_seconds DOUBLE PRECISION
+)
+RETURNS SETOF public.transcription_jobs AS $$
+BEGIN
+  PERFORM public.expire_transcription_job_leases(p_retry_base_seconds, p_retry_max_seconds);
+
+  RETURN QUERY
+  WITH candidates AS (
+    SELECT c.id
+    FROM public.transcription_jobs c
+    WHERE c.status = 'queued' AND c.run_after <= now()
+    ORDER BY c.run_after
+    LIMIT p_limit
+    FOR UPDATE SKIP LOCKED
+  )
+  UPDATE public.transcription_jobs j
+  SET status = 'running',
+      locked_by = p_worker_id,
+      attempts = j.attempts + 1,
+      lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+      heartbeat_at = now(),
+      updated_at = now()
+  FROM candidates
+  WHERE j.id = candidates.id
+  RETURNING j.*;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+-- Extend a running job's lease; returns false if the worker no longer owns it
+CREATE OR REPLACE FUNCTION public.heartbeat_transcription_job(
+  p_job_id UUID,
+  p_worker_id TEXT,
+  p_lease_seconds INTEGER
+)
+RETURNS BOOLEAN AS $$
+BEGIN
+  UPDATE public.transcription_jobs
+  SET lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+      heartbeat_at = now(),
+      updated_at = now()
+  WHERE id = p_job_id AND locked_by = p_worker_id AND status = 'running';
+  RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+REVOKE EXECUTE ON FUNCTION public.expire_transcription_job_leases(DOUBLE PRECISION, DOUBLE PRECISION) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.claim_transcription_jobs(TEXT, INTEGER, INTEGER, DOUBLE PRECISION, DOUBLE PRECISION) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.heartbeat_transcription_job(UUID, TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.expire_transcription_job_leases(DOUBLE PRECISION, DOUBLE PRECISION) TO service_role;
+GRANT EXECUTE ON FUNCTION public.claim_transcription_jobs(TEXT, INTEGER, INTEGER, DOUBLE PRECISION, DOUBLE PRECISION) TO service_role;
+GRANT EXECUTE ON FUNCTION public.heartbeat_transcription_job(UUID, TEXT, INTEGER) TO service_role;
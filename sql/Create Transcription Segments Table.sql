@@ -0,0 +1,28 @@
+-- Create packed segment storage, one row per transcription. Times and
+-- offsets are base64-encoded little-endian arrays: starts/ends float64,
+-- text_offsets uint32 (segment_count + 1 character offsets into text),
+-- speaker_ids uint16 indexes into speakers, confidences float32.
+CREATE TABLE IF NOT EXISTS public.transcription_segments (
+  transcription_id UUID PRIMARY KEY REFERENCES public.transcriptions(id) ON DELETE CASCADE,
+  segment_count INTEGER NOT NULL,
+  starts TEXT NOT NULL,
+  ends TEXT NOT NULL,
+  text TEXT NOT NULL,
+  text_offsets TEXT NOT NULL,
+  speaker_ids TEXT,
+  speakers JSONB,
+  confidences TEXT,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+-- Enable Row Level Security
+ALTER TABLE public.transcription_segments ENABLE ROW LEVEL SECURITY;
+
+-- Create security policy
+CREATE POLICY "Users can only access segments of their own transcriptions"
+  ON public.transcription_segments
+  FOR ALL
+  USING (EXISTS (
+    SELECT 1 FROM public.transcriptions t
+    WHERE t.id = transcription_id AND t.user_id = auth.uid()
+  ));
@@ -0,0 +1,29 @@
+-- Allow uploads larger than 2 GB
+ALTER TABLE public.files ALTER COLUMN size TYPE BIGINT;
+
+-- Create upload sessions table for resumable, chunked uploads
+CREATE TABLE IF NOT EXISTS public.upload_sessions (
+  id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+  user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE NOT NULL,
+  original_filename TEXT NOT NULL,
+  content_type TEXT NOT NULL,
+  size BIGINT NOT NULL,
+  storage_path TEXT NOT NULL,
+  upload_url TEXT NOT NULL,  -- resumable (TUS) upload URL in Supabase Storage
+  status TEXT DEFAULT 'uploading' NOT NULL,  -- uploading, completed
+  file_id UUID REFERENCES public.files(id) ON DELETE SET NULL,
+  expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+-- Create index for faster queries
+CREATE INDEX IF NOT EXISTS upload_sessions_user_id_idx ON public.upload_sessions(user_id);
+
+-- Enable Row Level Security
+ALTER TABLE public.upload_sessions ENABLE ROW LEVEL SECURITY;
+
+-- Create security policy
+CREATE POLICY "Users can only access their own upload sessions"
+  ON public.upload_sessions
+  FOR ALL
+  USING (auth.uid() = user_id);
@@ -0,0 +1,17 @@
+-- Move updated_at on every update of a transcription, whoever makes it
+-- (status and progress from the workers, completion, edits), so that id
+-- and updated_at together identify a transcription's content. The API
+-- builds its ETags from them. The clock time rather than the transaction
+-- start keeps two updates in one transaction apart.
+CREATE OR REPLACE FUNCTION public.touch_transcription_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.updated_at = clock_timestamp();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS on_transcription_update ON public.transcriptions;
+CREATE TRIGGER on_transcription_update
+  BEFORE UPDATE ON public.transcriptions
+  FOR EACH ROW EXECUTE FUNCTION public.touch_transcription_updated_at();
@@ -0,0 +1,59 @@
+-- Benchmark search_transcriptions over a synthetic corpus of 100k transcripts
+-- for a single user (the worst case for the per-user index).
+--
+-- Run against a scratch database that has the full setup and migrations:
+--   psql "$DATABASE_URL" -f "sql/benchmarks/Search Transcriptions Benchmark.sql"
+-- Everything runs in one transaction and is rolled back at the end.
+
+\timing on
+BEGIN;
+
+-- Benchmark user and a file for the transcripts to point at
+INSERT INTO auth.users (id, email)
+VALUES ('00000000-0000-0000-0000-00000000b3c4', 'search-benchmark@example.com');
+
+INSERT INTO public.files (id, user_id, original_filename, size, storage_path)
+VALUES ('00000000-0000-0000-0000-00000000f11e', '00000000-0000-0000-0000-00000000b3c4',
+        'benchmark.mp3', 1, 'benchmark/benchmark.mp3');
+
+-- 100k transcripts of ~300 words drawn from a meeting-style vocabulary.
+-- Every 1000th transcript also mentions a rare term.
+INSERT INTO public.transcriptions (file_id, user_id, status, text, created_at)
+SELECT
+  '00000000-0000-0000-0000-00000000f11e',
+  '00000000-0000-0000-0000-00000000b3c4',
+  'completed',
+  (
+    SELECT string_agg(
+      (ARRAY[
+        'the', 'we', 'meeting', 'budget', 'quarter', 'revenue', 'customer', 'launch',
+        'roadmap', 'hiring', 'design', 'review', 'deadline', 'marketing', 'product',
+        'sales', 'support', 'release', 'feedback', 'team', 'project', 'plan', 'costs',
+        'travel', 'forecast', 'agenda', 'action', 'items', 'next', 'week', 'and', 'to'
+      ])[1 + floor(random() * 32)::int],
+      ' '
+    )
+    FROM generate_series(1, 300) AS w
+    WHERE n > 0  -- correlate with the outer row so each transcript differs
+  ) || CASE WHEN n % 1000 = 0 THEN ' zephyrine' ELSE '' END,
+  now() - (n || ' minutes')::interval
+FROM generate_series(1, 100000) AS n;
+
+ANALYZE public.transcriptions;
+
+-- Common term: matches almost every transcript, so ranking dominates
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT * FROM public.search_transcriptions('00000000-0000-0000-0000-00000000b3c4', 'budget', 20, 0);
+
+-- Phrase with an exclusion
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT * FROM public.search_transcriptions('00000000-0000-0000-0000-00000000b3c4', '"budget review" -travel', 20, 0);
+
+-- Rare term: 100 matches, answered from the GIN index
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT * FROM public.search_transcriptions('00000000-0000-0000-0000-00000000b3c4', 'zephyrine', 20, 0);
+
+-- Deep page of the rare term
+SELECT count(*) FROM public.search_transcriptions('00000000-0000-0000-0000-00000000b3c4', 'zephyrine', 20, 80);
+
+ROLLBACK;
@@ -0,0 +1,69 @@
+-- Benchmark what revalidating a cached transcription costs the database,
+-- compared with fetching it again: GET /transcriptions/{id} with a matching
+-- If-None-Match only reads id and updated_at.
+--
+-- Run against a scratch database that has the full setup and migrations:
+--   psql "$DATABASE_URL" -f "sql/benchmarks/Transcription Revalidation Benchmark.sql"
+-- Everything runs in one transaction and is rolled back at the end.
+
+\timing on
+BEGIN;
+
+-- Benchmark user and a file for the transcripts to point at
+INSERT INTO auth.users (id, email)
+VALUES ('00000000-0000-0000-0000-00000000e7a9', 'revalidation-benchmark@example.com');
+
+INSERT INTO public.files (id, user_id, original_filename, size, storage_path)
+VALUES ('00000000-0000-0000-0000-00000000f11e', '00000000-0000-0000-0000-00000000e7a9',
+        'benchmark.mp3', 1, 'benchmark/benchmark.mp3');
+
+-- 2000 transcripts of an hour of speech each (~9000 words, ~55 KB)
+INSERT INTO public.transcriptions (file_id, user_id, status, text)
+SELECT
+  '00000000-0000-0000-0000-00000000f11e',
+  '00000000-0000-0000-0000-00000000e7a9',
+  'completed',
+  (
+    SELECT string_agg(md5((n * 10000 + w)::TEXT), ' ')
+    FROM generate_series(1, 1700) AS w
+  )
+FROM generate_series(1, 2000) AS n;
+
+ANALYZE public.transcriptions;
+
+-- Updates move updated_at (the ETag) even when the caller does not set it
+SELECT updated_at AS before FROM public.transcriptions ORDER BY id LIMIT 1 \gset
+UPDATE public.transcriptions SET progress = 1.0
+WHERE id = (SELECT id FROM public.transcriptions ORDER BY id LIMIT 1);
+SELECT updated_at > :'before' AS updated_at_moved FROM public.transcriptions ORDER BY id LIMIT 1;
+
+-- Response size of each row as PostgREST renders it
+SELECT
+  pg_size_pretty(avg(octet_length(row_to_json(t)::TEXT))::BIGINT) AS full_row,
+  pg_size_pretty(avg(octet_length(json_build_object('id', t.id, 'updated_at', t.updated_at)::TEXT))::BIGINT) AS validator
+FROM public.transcriptions t;
+
+-- Every transcript fetched one at a time: full rows, then id and updated_at
+DO $$
+DECLARE
+  r RECORD;
+  v_json TEXT;
+BEGIN
+  FOR r IN SELECT id, user_id FROM public.transcriptions LOOP
+    SELECT row_to_json(t)::TEXT INTO v_json
+    FROM public.transcriptions t WHERE t.id = r.id AND t.user_id = r.user_id;
+  END LOOP;
+END $$;
+
+DO $$
+DECLARE
+  r RECORD;
+  v_json TEXT;
+BEGIN
+  FOR r IN SELECT id, user_id FROM public.transcriptions LOOP
+    SELECT json_build_object('id', t.id, 'updated_at', t.updated_at)::TEXT INTO v_json
+    FROM public.transcriptions t WHERE t.id = r.id AND t.user_id = r.user_id;
+  END LOOP;
+END $$;
+
+ROLLBACK;